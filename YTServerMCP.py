@@ -1,5 +1,5 @@
 from __future__ import annotations
-import json, os, sys
+import os, sys
 from typing import Any, Dict
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv 
@@ -13,54 +13,59 @@ except Exception as e:
 from YTtool import (
     yt_init, yt_list_regions, yt_list_categories, yt_fetch_most_popular,
     yt_register_keywords, yt_search_recent, yt_calc_trends, yt_trend_details,
-    yt_export_report,
+    yt_export_report, yt_quota_status, yt_restore_search, STATE_STORE,
 )
 
 
 mcp = FastMCP("youtube-mcp")
 
+# Estado persistente en STATE_STORE (SQLite, ver yt_state.py), con caché en memoria:
+#   keywords: keyword -> true
+#   search:   keyword -> resultados del último search (se reescribe solo la keyword que cambió y se borran
+#             las que ya no están); el fallback de export los restaura sin volver a gastar cuota
+#   meta:     last_search (parámetros) / last_calc (último cálculo + limit)
+# .yt_state/*.json de versiones anteriores se importan una sola vez.
 STATE_DIR = os.path.join(os.path.dirname(__file__), ".yt_state")
-os.makedirs(STATE_DIR, exist_ok=True)
 
 def _state_path(name: str) -> str:
     return os.path.join(STATE_DIR, name)
 
-def _load_json(name: str, default):
+def _migrate_json_state() -> None:
     try:
-        p = _state_path(name)
-        if os.path.isfile(p):
-            with open(p, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
-def _save_json(name: str, data):
-    try:
-        with open(_state_path(name), "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        STATE_STORE.import_json("keywords", _state_path("keywords.json"),
+                                lambda kws: {k: True for k in kws if isinstance(k, str) and k.strip()})
+        STATE_STORE.import_json("search", _state_path("last_search.json"), lambda d: d.get("results") or {})
+        STATE_STORE.import_json("meta", _state_path("last_calc.json"), lambda d: {"last_calc": d})
     except Exception as e:
-        print(f"[YTServerMCP] WARN save {name}: {e}", file=sys.stderr, flush=True)
+        print(f"[YTServerMCP] WARN migrate state: {e}", file=sys.stderr, flush=True)
+
+_migrate_json_state()
 
 def _get_saved_keywords() -> list[str]:
-    return _load_json("keywords.json", [])
+    return sorted(STATE_STORE.items("keywords"))
 
 def _set_saved_keywords(kws: list[str]) -> None:
-    # normaliza y ordena para evitar duplicados
-    norm = sorted({(k or "").strip() for k in kws if (k or "").strip()})
-    _save_json("keywords.json", norm)
+    # normaliza para evitar duplicados; solo se escriben las keywords nuevas
+    STATE_STORE.put_many("keywords", {(k or "").strip(): True for k in kws if (k or "").strip()})
+
+def _save_last_search(payload: dict, params: dict) -> None:
+    results = (payload or {}).get("results") or {}
+    STATE_STORE.put_many("search", results)
+    STATE_STORE.delete("search", [k for k in STATE_STORE.items("search") if k not in results])
+    STATE_STORE.put("meta", "last_search", params)
 
-def _save_last_search(payload: dict) -> None:
-    _save_json("last_search.json", payload or {})
+def _save_last_calc(payload: dict, limit: int) -> None:
+    STATE_STORE.put("meta", "last_calc", dict(payload or {}, limit=limit))
 
-def _save_last_calc(payload: dict) -> None:
-    _save_json("last_calc.json", payload or {})
+_REGISTERED: set[str] = set()  # keywords ya registradas en YTtool en este proceso
 
 async def _ensure_keywords_loaded_for_this_process():
     try:
         saved_kws = _get_saved_keywords()
-        if saved_kws:
-            await _wrap(yt_register_keywords)({"keywords": saved_kws})
+        if saved_kws and not _REGISTERED.issuperset(saved_kws):
+            res = await _wrap(yt_register_keywords)({"keywords": saved_kws})
+            if isinstance(res, dict) and not res.get("error"):
+                _REGISTERED.update(saved_kws)
     except Exception as e:
         print(f"[YTServerMCP] WARN ensure keywords: {e}", file=sys.stderr, flush=True)
 
@@ -80,7 +85,9 @@ def _wrap(fn):
 @mcp.tool("yt_init", description="Inicializa YouTube usando siempre la API key de .env (YOUTUBE_API_KEY).")
 async def tool_yt_init():
     api_key = os.getenv("YOUTUBE_API_KEY", "")
-    if not api_key:
+    # YT_FAKE=1: servicio sintético local (yt_fake.py), no requiere API key
+    fake = os.getenv("YT_FAKE", "").strip().lower() in ("1", "true", "yes")
+    if not api_key and not fake:
         return {"error": "No se encontró YOUTUBE_API_KEY en el .env"}
 
     res = await _wrap(yt_init)({"api_key": api_key})
@@ -90,6 +97,7 @@ async def tool_yt_init():
         saved_kws = _get_saved_keywords()
         if saved_kws:
             _ = await _wrap(yt_register_keywords)({"keywords": saved_kws})
+            _REGISTERED.update(saved_kws)
     except Exception as e:
         print(f"[YTServerMCP] WARN re-register keywords: {e}", file=sys.stderr, flush=True)
 
@@ -121,31 +129,38 @@ async def tool_yt_register_keywords(keywords: list[str] | str):
         kws = res.get("keywords") if isinstance(res, dict) else None
         if isinstance(kws, list) and kws:
             _set_saved_keywords(kws)
+            _REGISTERED.update(kws)
     except Exception as e:
         print(f"[YTServerMCP] WARN save keywords: {e}", file=sys.stderr, flush=True)
     return res
 
 
-@mcp.tool("yt_search_recent", description="Busca videos recientes por keywords registradas.")
-async def tool_yt_search_recent(days: int = 7, per_keyword: int = 10, order: str = "viewCount", region: str | None = None):
+@mcp.tool("yt_search_recent", description="Busca videos recientes por keywords registradas (incremental; full=true rehace la búsqueda completa).")
+async def tool_yt_search_recent(days: int = 7, per_keyword: int = 10, order: str = "viewCount", region: str | None = None,
+                                workers: int | None = None, full: bool = False):
     await _ensure_keywords_loaded_for_this_process()
     payload = {"days": days, "per_keyword": per_keyword, "order": order}
     if region: payload["region"] = region
+    if workers: payload["workers"] = workers
+    if full: payload["full"] = True
     res = await _wrap(yt_search_recent)(payload)
     try:
         if isinstance(res, dict) and not res.get("error"):
-            _save_last_search(res)
+            _save_last_search(res, payload)
     except Exception as e:
         print(f"[YTServerMCP] WARN save last_search: {e}", file=sys.stderr, flush=True)
     return res
 
-@mcp.tool("yt_calc_trends", description="Calcula score de tendencias desde último search/trending.")
-async def tool_yt_calc_trends(limit: int = 10):
+@mcp.tool("yt_calc_trends", description="Calcula score de tendencias desde último search/trending "
+                                         "(score='velocity' vistas/hora entre snapshots, o 'simple').")
+async def tool_yt_calc_trends(limit: int = 10, score: str | None = None):
     # asegurar keywords en el proceso actual
     await _ensure_keywords_loaded_for_this_process()
+    payload = {"limit": limit}
+    if score: payload["score"] = score
 
     # intento directo de cálculo
-    res = await _wrap(yt_calc_trends)({"limit": limit})
+    res = await _wrap(yt_calc_trends)(payload)
 
     # si no hay datos, hacer un search mínimo y reintentar
     try:
@@ -160,14 +175,14 @@ async def tool_yt_calc_trends(limit: int = 10):
                     "order": "viewCount"
                 })
                 # reintento
-                res = await _wrap(yt_calc_trends)({"limit": limit})
+                res = await _wrap(yt_calc_trends)(payload)
     except Exception as e:
         print(f"[YTServerMCP] WARN calc fallback: {e}", file=sys.stderr, flush=True)
 
     # guardar último cálculo si procede
     try:
         if isinstance(res, dict) and not res.get("error"):
-            _save_last_calc(res)
+            _save_last_calc(res, limit)
     except Exception as e:
         print(f"[YTServerMCP] WARN save last_calc: {e}", file=sys.stderr, flush=True)
 
@@ -196,39 +211,34 @@ async def tool_yt_trend_details(keyword: str, top: int = 10):
 
 
 
-@mcp.tool("yt_export_report", description="Exporta CSV del último cálculo.")
-async def tool_yt_export_report(path: str | None = None):
+@mcp.tool("yt_export_report", description="Exporta el último cálculo (format: csv, ndjson, parquet o arrow; gzip opcional).")
+async def tool_yt_export_report(path: str | None = None, format: str | None = None, gzip: bool | None = None):
     # asegurar keywords para este proceso
     await _ensure_keywords_loaded_for_this_process()
+    payload = {"path": path}
+    if format: payload["format"] = format
+    if gzip is not None: payload["gzip"] = gzip
 
     # intento directo de export
-    res = await _wrap(yt_export_report)({"path": path})
+    res = await _wrap(yt_export_report)(payload)
 
     # si el server dice que no hay cálculo previo, rehidratar y reintentar
     try:
         err = (isinstance(res, dict) and str(res.get("error", "")).lower()) or ""
         if "no hay cálculo previo" in err or "no hay c\u00e1lculo previo" in err:
 
-            # intentar rehidratar el último search 
-            try:
-                last_search = _load_json("last_search.json", {})
-            except Exception:
-                last_search = {}
+            # parámetros del último search
+            last_search = STATE_STORE.get("meta", "last_search") or {}
 
             # keywords guardadas
             saved_kws = _get_saved_keywords()
             if saved_kws:
                 await _wrap(yt_register_keywords)({"keywords": saved_kws})
 
-            # si no hay nada guardado, hace un search mínimo para poblar memoria
-            if not last_search or not last_search.get("results"):
-                await _wrap(yt_search_recent)({
-                    "days": 7,
-                    "per_keyword": 10,
-                    "order": "viewCount"
-                })
-            else:
-                # reproducir parámetros del último search
+            # primero los resultados guardados del último search (sin gastar cuota)
+            restored = await _wrap(yt_restore_search)({"results": STATE_STORE.items("search")})
+            if not (isinstance(restored, dict) and restored.get("total")):
+                # no hay nada guardado: search (mínimo o con los parámetros del último)
                 params = {
                     "days": last_search.get("days", 7),
                     "per_keyword": last_search.get("per_keyword", 10),
@@ -236,19 +246,21 @@ async def tool_yt_export_report(path: str | None = None):
                 }
                 if last_search.get("region"):
                     params["region"] = last_search["region"]
-                await _wrap(yt_search_recent)(params)
+                res_search = await _wrap(yt_search_recent)(params)
+                if isinstance(res_search, dict) and not res_search.get("error"):
+                    _save_last_search(res_search, params)
 
             # rehidratar el último cálculo si tienes límite guardado
             try:
-                last_calc = _load_json("last_calc.json", {})
-                limit = int(last_calc.get("limit", 10)) if isinstance(last_calc, dict) else 10
+                last_calc = STATE_STORE.get("meta", "last_calc") or {}
+                limit = int(last_calc.get("limit", 10))
             except Exception:
                 limit = 10
 
             await _wrap(yt_calc_trends)({"limit": max(10, limit)})
 
             # reintentar export ahora que hay cálculo en memoria
-            res = await _wrap(yt_export_report)({"path": path})
+            res = await _wrap(yt_export_report)(payload)
 
     except Exception as e:
         print(f"[YTServerMCP] WARN export fallback: {e}", file=sys.stderr, flush=True)
@@ -266,5 +278,10 @@ async def tool_yt_export_report(path: str | None = None):
     return res
 
 
+@mcp.tool("yt_quota_status", description="Cuota de la YouTube Data API usada hoy (por endpoint) y restante.")
+async def tool_yt_quota_status():
+    return await _wrap(yt_quota_status)({})
+
+
 if __name__ == "__main__":
     mcp.run()
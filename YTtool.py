@@ -1,5 +1,6 @@
 from __future__ import annotations
-import os, json, math, csv, sys
+import os, json, math, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta, timezone
 
@@ -8,16 +9,40 @@ try:
 except Exception:
     build = None
 
+try:
+    import httplib2
+except Exception:
+    httplib2 = None
+
+import yt_export
+from yt_scoring import TrendTable
+from yt_state import StateStore
+from yt_timeseries import SnapshotStore
+
+# búsquedas por keyword en paralelo (YT_SEARCH_WORKERS=1 vuelve al modo secuencial)
+SEARCH_WORKERS = int(os.getenv("YT_SEARCH_WORKERS", "4"))
+MAX_SEARCH_WORKERS = 16
+
+# caché en disco de catálogos (regiones/categorías), compartida entre procesos del servidor
+CACHE_DIR = os.getenv("YT_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yt_state", "cache")
+CATALOG_TTL = float(os.getenv("YT_CATALOG_TTL", str(7 * 24 * 3600)))  # segundos
+
+# score de tendencias: "velocity" (vistas/hora entre snapshots guardados) o "simple" (views / sqrt(horas+1))
+TREND_SCORE = (os.getenv("YT_TREND_SCORE") or "velocity").strip().lower()
+
 # cliente de YouTube
 _YT = None
+_BACKEND = "real"  # "real" | "fake" (yt_fake.py)
 _STATE = {
     "keywords": [],             # lista de keywords registradas
     "last_search": {},          # keyword -> [ {video...}, ... ]
     "last_calc": {              # resultados de cálculo de tendencias
         "keywords": [],         # ranking de keywords
-        "videos": []            # ranking de videos
+        "table": None           # TrendTable con el score de cada video
     },
     "last_fetch_popular": [],   # Ultimo fetch de trending 
+    "searched": {},             # keyword -> {"at": epoch, "sig": [days, order, region]} (frescura para la cuota)
+    "popular": {},              # "region|categoryId" -> {"at": epoch, "items": [...]}
     }
 
 
@@ -41,9 +66,6 @@ def _dt_iso_utc(d: datetime) -> str:
     # ISO 8601 con 'Z'
     return d.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def _published_after_iso(days: int) -> str:
-    return _dt_iso_utc(datetime.now(timezone.utc) - timedelta(days=max(0, days)))
-
 def _as_int(x, default: int = 0) -> int:
     try:
         return int(x)
@@ -53,9 +75,199 @@ def _as_int(x, default: int = 0) -> int:
 def _chunked(seq: List[str], n: int) -> List[List[str]]:
     return [seq[i:i+n] for i in range(0, len(seq), n)]
 
+def _http_status(ex: Exception) -> Optional[int]:
+    return _as_int(getattr(getattr(ex, "resp", None), "status", None), 0) or None
+
+def _read_tail(path: str, offset: int) -> tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Líneas JSON agregadas a `path` desde `offset` -> (entradas, nuevo offset, reset).
+    reset=True si el archivo se recreó (hay que descartar lo leído antes).
+    Ignora una última línea a medio escribir por otro proceso.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return [], 0, offset > 0
+    reset = size < offset
+    if reset:
+        offset = 0
+    if size == offset:
+        return [], offset, reset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    out = []
+    for raw in chunk[:end].splitlines():
+        try:
+            e = json.loads(raw)
+        except Exception:
+            continue
+        if isinstance(e, dict):
+            out.append(e)
+    return out, offset + end, reset
+
+#  Cuota
+# Cada request se cobra según el costo del endpoint en un JSONL append-only por día de cuota
+# (la cuota de YouTube se reinicia a medianoche hora del Pacífico), compartido entre procesos.
+# YT_QUOTA_BUDGET fija cuántas unidades diarias pueden usar las tools (default 10000, la cuota estándar).
+QUOTA_COST = {
+    "youtube.search.list": 100,
+    "youtube.videos.list": 1,
+    "youtube.i18nRegions.list": 1,
+    "youtube.videoCategories.list": 1,
+}
+QUOTA_BUDGET = int(os.getenv("YT_QUOTA_BUDGET", "10000"))
+# con poca cuota, las keywords buscadas hace menos de esto reutilizan sus resultados
+FRESH_SECONDS = float(os.getenv("YT_SEARCH_FRESH_MIN", "30")) * 60
+
+def _quota_day() -> str:
+    try:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo("America/Los_Angeles")
+    except Exception:  # sin tzdata (p.ej. Windows): PST fijo
+        tz = timezone(timedelta(hours=-8))
+    return datetime.now(tz).strftime("%Y-%m-%d")
+
+class _QuotaMeter:
+    def __init__(self, cache_dir: str):
+        self.dir = cache_dir
+        self.day: Optional[str] = None
+        self.used = 0
+        self.by_method: Dict[str, int] = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _path(self) -> str:
+        return os.path.join(self.dir, f"quota_{self.day}.jsonl")
+
+    def set_dir(self, cache_dir: str) -> None:
+        with self._lock:
+            self.dir, self.day = cache_dir, None  # el próximo _sync relee el ledger del nuevo dir
+
+    def _sync(self) -> None:
+        day = _quota_day()
+        if day != self.day:
+            self.day, self.used, self.by_method, self._offset = day, 0, {}, 0
+        entries, self._offset, reset = _read_tail(self._path(), self._offset)
+        if reset:
+            self.used, self.by_method = 0, {}
+        for e in entries:
+            u = _as_int(e.get("units"))
+            m = str(e.get("method") or "?")
+            self.used += u
+            self.by_method[m] = self.by_method.get(m, 0) + u
+
+    def charge(self, method: str, units: int) -> None:
+        line = json.dumps({"ts": round(time.time(), 3), "method": method, "units": units}) + "\n"
+        with self._lock:
+            self._sync()
+            try:
+                os.makedirs(self.dir, exist_ok=True)
+                with open(self._path(), "a", encoding="utf-8") as f:
+                    f.write(line)
+            except Exception as ex:
+                print(f"[YTtool] WARN quota: {ex}", file=sys.stderr)
+                self.used += units  # al menos en memoria
+                self.by_method[method] = self.by_method.get(method, 0) + units
+                return
+            self._sync()
+
+    def remaining(self) -> int:
+        with self._lock:
+            self._sync()
+            return max(0, QUOTA_BUDGET - self.used)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            return {"day": self.day, "used": self.used, "budget": QUOTA_BUDGET,
+                    "remaining": max(0, QUOTA_BUDGET - self.used), "by_method": dict(self.by_method)}
+
+_QUOTA = _QuotaMeter(CACHE_DIR)
+
+def _method_of(req) -> str:
+    return str(getattr(req, "methodId", "") or "")
+
+def _execute(req, *, threaded: bool = False):
+    """Ejecuta un request de la API y lo cobra en la cuota (también los 304; no los 403 de cuota)."""
+    method = _method_of(req)
+    http = _thread_http() if threaded else None
+    try:
+        resp = req.execute(http=http) if http is not None else req.execute()
+    except Exception as ex:
+        if not _is_quota_error(ex):
+            _QUOTA.charge(method, QUOTA_COST.get(method, 1))
+        raise
+    _QUOTA.charge(method, QUOTA_COST.get(method, 1))
+    return resp
+
+#  Caché de catálogos
+# Un archivo JSON por catálogo ({"fetched_at","etag","resp"}), escrito de forma atómica para
+# que varios procesos de YTServerMCP la compartan. Dentro del TTL se sirve sin tocar la API;
+# vencida, se revalida con If-None-Match (304 -> se renueva la entrada sin descargar de nuevo).
+# Si la API falla y hay una copia vieja, se sirve esa.
+
+def _cache_path(key: str) -> str:
+    # el backend va en el nombre: un catálogo sintético nunca es un hit para el cliente real
+    prefix = "catalog" if _BACKEND == "real" else f"catalog_{_BACKEND}"
+    return os.path.join(CACHE_DIR, f"{prefix}_{key}.json")
+
+def _cache_load(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            ent = json.load(f)
+        return ent if isinstance(ent, dict) and isinstance(ent.get("resp"), dict) else None
+    except Exception:
+        return None
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _cache_save(key: str, ent: Dict[str, Any]) -> None:
+    try:
+        _write_json_atomic(_cache_path(key), ent)
+    except Exception as ex:
+        print(f"[YTtool] WARN cache {key}: {ex}", file=sys.stderr)
+
+def _cached_catalog(key: str, make_req) -> tuple[Dict[str, Any], str]:
+    """Respuesta de la API para un catálogo y cómo se obtuvo: hit | revalidated | stale | miss."""
+    ent = _cache_load(key)
+    now = time.time()
+    if ent and now - float(ent.get("fetched_at") or 0) < CATALOG_TTL:
+        return ent["resp"], "hit"
+    req = make_req()
+    if ent and ent.get("etag") and isinstance(getattr(req, "headers", None), dict):
+        req.headers["If-None-Match"] = ent["etag"]
+    try:
+        resp = _execute(req)
+    except Exception as ex:
+        if ent and _http_status(ex) == 304:
+            ent["fetched_at"] = now
+            _cache_save(key, ent)
+            return ent["resp"], "revalidated"
+        if ent:
+            print(f"[YTtool] WARN {key}: sirviendo caché vencida ({ex})", file=sys.stderr)
+            return ent["resp"], "stale"
+        raise
+    if resp.get("items"):
+        _cache_save(key, {"fetched_at": now, "etag": resp.get("etag"), "resp": resp})
+    return resp, "miss"
+
 # Implementaciones de tools
 def yt_init(args: Dict[str, Any]) -> Dict[str, Any]:
-    global _YT
+    global _YT, _BACKEND
+    # servicio local sintético (yt_fake.py): sin red, API key ni cuota
+    if (args or {}).get("fake") or os.getenv("YT_FAKE", "").strip().lower() in ("1", "true", "yes"):
+        from yt_fake import FakeYouTube
+        _YT = FakeYouTube.from_env()
+        _BACKEND = "fake"
+        _use_state(fake=True)
+        return _ok("YouTube client listo (fake).", fake=True, state_dir=FAKE_STATE_DIR)
     if build is None:
         return _err("Falta dependencia: instala google-api-python-client")
     api_key = (args or {}).get("api_key") or os.getenv("YOUTUBE_API_KEY", "")
@@ -65,6 +277,8 @@ def yt_init(args: Dict[str, Any]) -> Dict[str, Any]:
         _YT = build("youtube", "v3", developerKey=api_key)
     except Exception as ex:
         return _err(f"Fallo creando cliente de YouTube: {ex}")
+    _BACKEND = "real"
+    _use_state(fake=False)
     return _ok("YouTube client listo.")
 
 
@@ -72,7 +286,7 @@ def yt_list_regions(args: Dict[str, Any]) -> Dict[str, Any]:
     e = _ensure_init()
     if e: return e
     try:
-        resp = _YT.i18nRegions().list(part="snippet").execute()
+        resp, cache = _cached_catalog("regions", lambda: _YT.i18nRegions().list(part="snippet"))
         items = resp.get("items", [])
         if not items:
             return _err(
@@ -81,7 +295,7 @@ def yt_list_regions(args: Dict[str, Any]) -> Dict[str, Any]:
                 "restricciones incompatibles (para scripts/servidor NO uses 'HTTP referrers')."
             )
         regions = [{"code": it.get("id"), "name": it.get("snippet", {}).get("name")} for it in items]
-        return _ok("regions", regions=regions, count=len(regions))
+        return _ok("regions", regions=regions, count=len(regions), cache=cache)
     except Exception as ex:
         return _err(f"yt_list_regions falló: {ex}")
 
@@ -91,12 +305,14 @@ def yt_list_categories(args: Dict[str, Any]) -> Dict[str, Any]:
     if e: return e
     region = (args or {}).get("region") or "US"
     try:
-        resp = _YT.videoCategories().list(part="snippet", regionCode=region).execute()
+        key = "categories_" + "".join(c for c in str(region) if c.isalnum())[:8]
+        resp, cache = _cached_catalog(key,
+                                      lambda: _YT.videoCategories().list(part="snippet", regionCode=region))
         cats = []
         for it in resp.get("items", []):
             if it.get("kind") == "youtube#videoCategory":
                 cats.append({"id": it.get("id"), "title": it.get("snippet", {}).get("title")})
-        return _ok("categories", region=region, categories=cats, count=len(cats))
+        return _ok("categories", region=region, categories=cats, count=len(cats), cache=cache)
     except Exception as ex:
         return _err(f"yt_list_categories falló: {ex}")
 
@@ -117,11 +333,24 @@ def yt_fetch_most_popular(args: Dict[str, Any]) -> Dict[str, Any]:
     if categoryId:
         req["videoCategoryId"] = categoryId
 
+    # cuota: 1 unidad por página; sin cuota suficiente se reutiliza un fetch fresco o se piden menos páginas
+    pkey = f"{region}|{categoryId or ''}"
+    remaining = _QUOTA.remaining()
+    prev = _STATE["popular"].get(pkey)
+    if remaining < max_pages and prev and time.time() - prev["at"] < FRESH_SECONDS:
+        out = prev["items"][:max(1, limit)]
+        _STATE["last_fetch_popular"] = out
+        return _ok("most_popular", region=region, count=len(out), items=out,
+                   quota=dict(_QUOTA.status(), reused_fresh=True))
+    if remaining <= 0:
+        return _err("Presupuesto de cuota de YouTube agotado por hoy (YT_QUOTA_BUDGET).", quota=_QUOTA.status())
+    max_pages = min(max_pages, remaining)
+
     out: List[Dict[str, Any]] = []
     page = 0
     try:
         while page < max_pages:
-            resp = _YT.videos().list(**req).execute()
+            resp = _execute(_YT.videos().list(**req))
             print(f"[yt_fetch_most_popular] API resp keys: {list(resp.keys())}", file=sys.stderr)
             items = resp.get("items", [])
             for it in items:
@@ -144,9 +373,11 @@ def yt_fetch_most_popular(args: Dict[str, Any]) -> Dict[str, Any]:
     if not out:
         return _err(f"No se recibieron videos en 'mostPopular' para region={region}")
 
+    _record_snapshots(out)
+    _STATE["popular"][pkey] = {"at": time.time(), "items": out}
     out = out[:max(1, limit)]
     _STATE["last_fetch_popular"] = out
-    return _ok("most_popular", region=region, count=len(out), items=out)
+    return _ok("most_popular", region=region, count=len(out), items=out, quota=_QUOTA.status())
 
 
 def yt_register_keywords(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -168,10 +399,276 @@ def yt_register_keywords(args: Dict[str, Any]) -> Dict[str, Any]:
     return _ok("keywords_registradas", keywords=_STATE["keywords"])
 
 
+class _Cancelled(Exception):
+    pass
+
+_QUOTA_REASONS = ("quotaExceeded", "dailyLimitExceeded", "rateLimitExceeded", "userRateLimitExceeded")
+
+def _is_quota_error(ex: Exception) -> bool:
+    status = getattr(getattr(ex, "resp", None), "status", None)
+    return str(status) == "403" and any(r in str(ex) for r in _QUOTA_REASONS)
+
+# httplib2.Http no es thread-safe: cada hilo del pool usa su propia conexión
+_TLS = threading.local()
+
+def _thread_http():
+    http = getattr(_TLS, "http", None)
+    if http is None and httplib2 is not None:
+        http = _TLS.http = httplib2.Http()
+    return http
+
+def _run_bounded(fn, items: List[Any], workers: int, **kwargs) -> List[Any]:
+    """
+    Ejecuta fn(item, **kwargs) para cada item con como mucho `workers` hilos.
+    Devuelve los resultados en el mismo orden que `items`; la primera falla
+    (p.ej. cuota) cancela lo pendiente y se relanza.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return [fn(it, **kwargs) for it in items]
+    stop = threading.Event()
+    results: List[Any] = [None] * len(items)
+    first_err: Optional[Exception] = None
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        futs = {pool.submit(fn, it, threaded=True, stop=stop, **kwargs): i for i, it in enumerate(items)}
+        for fut in as_completed(futs):
+            try:
+                results[futs[fut]] = fut.result()
+            except Exception as ex:
+                if first_err is None:
+                    first_err = ex
+                stop.set()
+                for f in futs:
+                    f.cancel()
+    if first_err is not None:
+        raise first_err
+    return results
+
+def _check_stop(stop: Optional[threading.Event]) -> None:
+    if stop is not None and stop.is_set():
+        raise _Cancelled("búsqueda cancelada tras un error previo")
+
+def _search_ids(job: tuple[str, str], *, per_keyword: int, order: str,
+                region: Optional[str], threaded: bool = False,
+                stop: Optional[threading.Event] = None) -> List[str]:
+    """ search.list para obtener los IDs de una keyword; job = (keyword, publishedAfter) """
+    _check_stop(stop)
+    kw, published_after = job
+    sreq = {
+        "part": "snippet",
+        "q": kw,
+        "type": "video",
+        "maxResults": min(50, per_keyword),
+        "order": order,
+        "publishedAfter": published_after,
+    }
+    if region:
+        sreq["regionCode"] = region
+    sresp = _execute(_YT.search().list(**sreq), threaded=threaded)
+    video_ids = [it.get("id", {}).get("videoId") for it in sresp.get("items", []) if it.get("id")]
+    return [vid for vid in video_ids if vid]
+
+#  Caché de videos
+# Metadatos inmutables por videoId (título, canal, publishedAt) en un JSONL append-only
+# compartido entre procesos; cada proceso lee solo lo que otros agregaron desde su última lectura.
+# Con esto los IDs ya vistos piden solo `statistics` (con proyección fields=) a videos.list.
+_META_FIELDS = ("title", "channelTitle", "publishedAt")
+_STATS_FIELDS = "items(id,statistics(viewCount,likeCount,commentCount))"
+
+class _VideoMetaCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.meta: Dict[str, Dict[str, Any]] = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        entries, self._offset, reset = _read_tail(self.path, self._offset)
+        if reset:
+            self.meta.clear()
+        for e in entries:
+            if e.get("videoId"):
+                self.meta[e["videoId"]] = {k: e.get(k) for k in _META_FIELDS}
+
+    def set_path(self, path: str) -> None:
+        with self._lock:
+            self.path, self._offset = path, 0
+            self.meta.clear()
+
+    def known(self, ids: List[str]) -> set:
+        with self._lock:
+            self._refresh()
+            return {v for v in ids if v in self.meta}
+
+    def get(self, vid: str) -> Optional[Dict[str, Any]]:
+        return self.meta.get(vid)
+
+    def add(self, videos: List[Dict[str, Any]]) -> None:
+        new = [v for v in videos if v.get("videoId") and v["videoId"] not in self.meta]
+        if not new:
+            return
+        lines = "".join(json.dumps({"videoId": v["videoId"], **{k: v.get(k) for k in _META_FIELDS}},
+                                   ensure_ascii=False) + "\n" for v in new)
+        with self._lock:
+            self._refresh()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except Exception as ex:
+                print(f"[YTtool] WARN cache videos: {ex}", file=sys.stderr)
+            for v in new:
+                self.meta[v["videoId"]] = {k: v.get(k) for k in _META_FIELDS}
+
+_VIDEO_META = _VideoMetaCache(os.path.join(CACHE_DIR, "videos.jsonl"))
+
+# snapshots de estadísticas (serie temporal en SQLite, ver yt_timeseries.py)
+_SNAPSHOTS = SnapshotStore()
+
+# estado persistente compartido con YTServerMCP (keywords, resultados, marcas de agua; ver yt_state.py)
+STATE_STORE = StateStore(_SNAPSHOTS.path)
+
+# El servicio sintético (yt_fake.py) usa su propio directorio: no cobra contra la cuota real ni
+# deja videos, snapshots, marcas de agua o catálogos falsos en las cachés reales.
+FAKE_STATE_DIR = os.getenv("YT_FAKE_STATE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".yt_state", "fake")
+_REAL_STATE = (CACHE_DIR, _SNAPSHOTS.path)
+
+def _use_state(fake: bool) -> None:
+    global CACHE_DIR
+    cache_dir, db = ((os.path.join(FAKE_STATE_DIR, "cache"), os.path.join(FAKE_STATE_DIR, "yt.sqlite3"))
+                     if fake else _REAL_STATE)
+    if cache_dir == CACHE_DIR:
+        return
+    CACHE_DIR = cache_dir
+    _QUOTA.set_dir(cache_dir)
+    _VIDEO_META.set_path(os.path.join(cache_dir, "videos.jsonl"))
+    _SNAPSHOTS.set_path(db)
+    STATE_STORE.set_path(db)
+    # frescura en memoria ligada al backend anterior
+    _STATE["searched"] = {}
+    _STATE["popular"] = {}
+
+def _record_snapshots(videos: List[Dict[str, Any]]) -> None:
+    try:
+        _SNAPSHOTS.record(videos)
+    except Exception as ex:
+        print(f"[YTtool] WARN snapshots: {ex}", file=sys.stderr)
+
+def _video_row(vid: str, meta: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "videoId": vid,
+        "title": meta.get("title"),
+        "channelTitle": meta.get("channelTitle"),
+        "publishedAt": meta.get("publishedAt"),
+        "views": _as_int(stats.get("viewCount")),
+        "likes": _as_int(stats.get("likeCount")),
+        "comments": _as_int(stats.get("commentCount")),
+    }
+
+def _fetch_videos(job: tuple[str, List[str]], *, threaded: bool = False,
+                  stop: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    """
+    videos.list (hasta 50 IDs) para estadísticas. job = ("full" | "stats", ids):
+    full pide snippet completo (IDs nuevos); stats solo las estadísticas de IDs ya cacheados.
+    """
+    _check_stop(stop)
+    mode, batch = job
+    if mode == "stats":
+        req = _YT.videos().list(part="statistics", id=",".join(batch), fields=_STATS_FIELDS)
+    else:
+        req = _YT.videos().list(part="snippet,statistics,contentDetails", id=",".join(batch))
+    vresp = _execute(req, threaded=threaded)
+    out: List[Dict[str, Any]] = []
+    for v in vresp.get("items", []):
+        stats = v.get("statistics", {}) or {}
+        meta = _VIDEO_META.get(v.get("id")) if mode == "stats" else (v.get("snippet", {}) or {})
+        if meta is None:
+            continue
+        out.append(_video_row(v.get("id"), meta, stats))
+    return out
+
+#  Búsqueda incremental
+# Por keyword se guarda una marca de agua (inicio de la última búsqueda) y los IDs del último
+# resultado. La siguiente búsqueda solo pide lo publicado desde la marca (menos un margen por la
+# demora de indexación), lo une con los IDs guardados que siguen dentro de la ventana de `days`,
+# refresca sus estadísticas (barato con la caché de videos) y vuelve a rankear.
+# Solo para order viewCount/date (los demás no se pueden re-rankear localmente: búsqueda completa).
+# Las marcas viven en STATE_STORE (namespace "watermark"), una fila por keyword|order|region.
+WATERMARK_OVERLAP = timedelta(hours=1)
+_MERGEABLE_ORDERS = ("viewCount", "date")
+
+def _load_search_store() -> Dict[str, Any]:
+    try:
+        # migración única del archivo JSON anterior
+        STATE_STORE.import_json("watermark", os.path.join(CACHE_DIR, "search_store.json"))
+        return STATE_STORE.items("watermark")
+    except Exception as ex:
+        print(f"[YTtool] WARN search store: {ex}", file=sys.stderr)
+        return {}
+
+def _store_key(kw: str, order: str, region: Optional[str]) -> str:
+    return f"{kw}|{order}|{region or ''}"
+
+def _search_window(kw: str, order: str, region: Optional[str], window_start: datetime, per_keyword: int,
+                   store: Dict[str, Any], full: bool) -> tuple[str, List[str]]:
+    """
+    (publishedAfter a pedir, IDs previos a unir) para una keyword. Búsqueda completa si la
+    ventana empieza antes que la guardada (más `days`) o si se piden más videos por keyword:
+    los IDs guardados no cubren ese rango.
+    """
+    ent = store.get(_store_key(kw, order, region))
+    if full or not ent or order not in _MERGEABLE_ORDERS:
+        return _dt_iso_utc(window_start), []
+    try:
+        wm = datetime.fromisoformat(str(ent.get("watermark")).replace("Z", "+00:00")) - WATERMARK_OVERLAP
+        covered = datetime.fromisoformat(str(ent.get("window_start")).replace("Z", "+00:00"))
+        if window_start < covered or per_keyword > _as_int(ent.get("per_keyword"), 0):
+            return _dt_iso_utc(window_start), []
+    except Exception:
+        return _dt_iso_utc(window_start), []
+    return _dt_iso_utc(max(window_start, wm)), list(ent.get("ids") or [])
+
+def _rank_key(order: str):
+    if order == "date":
+        return lambda v: v.get("publishedAt") or ""
+    return lambda v: v.get("views", 0)
+
+def _search_cost(n_keywords: int, per_keyword: int) -> int:
+    """Peor caso: un search.list por keyword + un videos.list por cada 50 IDs."""
+    return 100 * n_keywords + math.ceil(n_keywords * per_keyword / 50)
+
+def _plan_search(keywords: List[str], per_keyword: int, sig: List[Any],
+                 remaining: int) -> tuple[List[str], List[str], List[str], int]:
+    """
+    Ajusta la búsqueda al presupuesto restante -> (a buscar, frescas reutilizadas, omitidas, per_keyword).
+    1) si alcanza, se busca todo; 2) si no, las keywords buscadas hace poco con los mismos
+    parámetros reutilizan sus resultados; 3) si aún no alcanza, se buscan las menos recientes
+    que quepan y se reduce per_keyword para que sus lotes de videos.list también quepan.
+    """
+    if _search_cost(len(keywords), per_keyword) <= remaining:
+        return keywords, [], [], per_keyword
+    now = time.time()
+    searched = _STATE["searched"]
+    fresh = [kw for kw in keywords
+             if kw in _STATE["last_search"] and (searched.get(kw) or {}).get("sig") == sig
+             and now - searched[kw]["at"] < FRESH_SECONDS]
+    todo = sorted((kw for kw in keywords if kw not in fresh), key=lambda kw: (searched.get(kw) or {}).get("at", 0))
+    n = len(todo)
+    while n > 0 and _search_cost(n, 1) > remaining:
+        n -= 1
+    if n and _search_cost(n, per_keyword) > remaining:
+        per_keyword = max(1, min(per_keyword, 50 * (remaining - 100 * n) // n))
+    return todo[:n], fresh, todo[n:], per_keyword
+
 def yt_search_recent(args: Dict[str, Any]) -> Dict[str, Any]:
     """
     Busca videos recientes por cada keyword registrada.
-    params: days (int), order ('date'|'viewCount'|'rating'|'relevance'), per_keyword (int), region (opcional)
+    params: days (int), order ('date'|'viewCount'|'rating'|'relevance'), per_keyword (int), region (opcional),
+            workers (int, llamadas concurrentes; 1 = secuencial), full (bool, ignora las marcas de agua)
+    Es incremental: cada keyword solo busca lo publicado desde su última búsqueda (ver _search_window).
+    Los IDs de todas las keywords se deduplican y se piden en lotes llenos de 50 a videos.list;
+    los ya conocidos (caché de videos) solo piden statistics.
+    Respeta el presupuesto de cuota diario (ver _plan_search).
     """
     e = _ensure_init()
     if e: return e
@@ -181,119 +678,139 @@ def yt_search_recent(args: Dict[str, Any]) -> Dict[str, Any]:
     order = (args or {}).get("order") or "viewCount"
     per_keyword = _as_int((args or {}).get("per_keyword", 10), 10)
     region = (args or {}).get("region")
-
-    published_after = _published_after_iso(days)
+    workers = max(1, min(MAX_SEARCH_WORKERS, _as_int((args or {}).get("workers", SEARCH_WORKERS), SEARCH_WORKERS)))
+    full = bool((args or {}).get("full"))
+
+    sig = [days, order, region]
+    requested = per_keyword
+    keywords, fresh, skipped, per_keyword = _plan_search(list(_STATE["keywords"]), per_keyword, sig,
+                                                         _QUOTA.remaining())
+    if not keywords and not fresh:
+        return _err("Presupuesto de cuota de YouTube agotado por hoy (YT_QUOTA_BUDGET).", quota=_QUOTA.status())
+    started = datetime.now(timezone.utc)
+    window_start = started - timedelta(days=max(0, days))
+    cutoff = _dt_iso_utc(window_start)
+    store = _load_search_store()
+    windows = [_search_window(kw, order, region, window_start, per_keyword, store, full) for kw in keywords]
     all_results: Dict[str, List[Dict[str, Any]]] = {}
+    incremental: List[str] = []
+    updated: Dict[str, Any] = {}
     try:
-        for kw in _STATE["keywords"]:
-            # search.list para obtener IDs
-            sreq = {
-                "part": "snippet",
-                "q": kw,
-                "type": "video",
-                "maxResults": min(50, per_keyword),
-                "order": order,
-                "publishedAfter": published_after,
+        # 1) search.list por keyword (solo el delta desde la marca de agua)
+        ids_by_kw = _run_bounded(_search_ids, [(kw, after) for kw, (after, _) in zip(keywords, windows)], workers,
+                                 per_keyword=per_keyword, order=order, region=region)
+        # unir con los IDs previos que siguen dentro de la ventana (los demás envejecen y salen)
+        _VIDEO_META.known([v for _, prev in windows for v in prev])  # sincroniza con otros procesos
+        cand_by_kw = []
+        for kw, ids, (_, prev) in zip(keywords, ids_by_kw, windows):
+            if prev:
+                incremental.append(kw)
+            kept = [v for v in prev if ((_VIDEO_META.get(v) or {}).get("publishedAt") or "") >= cutoff]
+            cand_by_kw.append(list(dict.fromkeys(ids + kept)))
+        # 2) videos.list sobre los IDs únicos, en lotes de 50
+        #    (IDs con metadatos cacheados: solo statistics; nuevos: fetch completo)
+        unique_ids = list(dict.fromkeys(vid for ids in cand_by_kw for vid in ids))
+        known = _VIDEO_META.known(unique_ids)
+        jobs = [("full", b) for b in _chunked([v for v in unique_ids if v not in known], 50)]
+        jobs += [("stats", b) for b in _chunked([v for v in unique_ids if v in known], 50)]
+        batches = _run_bounded(_fetch_videos, jobs, workers)
+        by_id = {v["videoId"]: v for batch in batches for v in batch}
+        _record_snapshots(list(by_id.values()))
+        _VIDEO_META.add([v for batch, (mode, _) in zip(batches, jobs) if mode == "full" for v in batch])
+        # 3) unir estadísticas con cada keyword (orden del search; re-rankeado si hubo merge)
+        now = time.time()
+        for kw, ids in zip(keywords, cand_by_kw):
+            rows = [dict(by_id[vid], keyword=kw) for vid in ids if vid in by_id]
+            if kw in incremental:
+                rows.sort(key=_rank_key(order), reverse=True)
+            all_results[kw] = rows[:per_keyword]
+            _STATE["searched"][kw] = {"at": now, "sig": sig}
+            updated[_store_key(kw, order, region)] = {
+                "watermark": _dt_iso_utc(started), "ids": [v["videoId"] for v in all_results[kw]],
+                "window_start": cutoff, "per_keyword": per_keyword,
             }
-            if region:
-                sreq["regionCode"] = region
-            sresp = _YT.search().list(**sreq).execute()
-            video_ids = [it.get("id", {}).get("videoId") for it in sresp.get("items", []) if it.get("id")]
-            video_ids = [vid for vid in video_ids if vid]
-
-            #  videos.list para estadísticas
-            details: List[Dict[str, Any]] = []
-            for batch in _chunked(video_ids, 50):
-                if not batch:
-                    continue
-                vresp = _YT.videos().list(
-                    part="snippet,statistics,contentDetails",
-                    id=",".join(batch)
-                ).execute()
-                for v in vresp.get("items", []):
-                    stats = v.get("statistics", {}) or {}
-                    snip = v.get("snippet", {}) or {}
-                    details.append({
-                        "videoId": v.get("id"),
-                        "title": snip.get("title"),
-                        "channelTitle": snip.get("channelTitle"),
-                        "publishedAt": snip.get("publishedAt"),
-                        "views": _as_int(stats.get("viewCount")),
-                        "likes": _as_int(stats.get("likeCount")),
-                        "comments": _as_int(stats.get("commentCount")),
-                        "keyword": kw,
-                    })
-            all_results[kw] = details
     except Exception as ex:
+        if _is_quota_error(ex):
+            return _err(f"yt_search_recent detenido por cuota de YouTube: {ex}")
         return _err(f"yt_search_recent falló: {ex}")
+    try:
+        STATE_STORE.put_many("watermark", updated)  # solo las keywords buscadas
+    except Exception as ex:
+        print(f"[YTtool] WARN search store: {ex}", file=sys.stderr)
 
-    _STATE["last_search"] = all_results
+    # keywords no buscadas por cuota: se conservan sus últimos resultados (si los hay)
+    for kw in fresh + skipped:
+        if kw in _STATE["last_search"]:
+            all_results[kw] = _STATE["last_search"][kw][:requested]
+    _STATE["last_search"] = {kw: all_results[kw] for kw in _STATE["keywords"] if kw in all_results}
     total = sum(len(v) for v in all_results.values())
+    quota = dict(_QUOTA.status(), searched=len(keywords), reused_fresh=fresh, skipped_budget=skipped,
+                 per_keyword=per_keyword)
     return _ok("search_recent",
                keywords=_STATE["keywords"],
                total=total,
-               results=all_results)  
+               results=_STATE["last_search"],
+               incremental=incremental,
+               quota=quota)
+
 
+def yt_restore_search(args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Restaura last_search desde resultados guardados (keyword -> [videos]) sin llamar a la API.
+    Solo se cargan keywords registradas.
+    """
+    results = (args or {}).get("results") or {}
+    if not isinstance(results, dict):
+        return _err("Formato de 'results' inválido.")
+    kws = set(_STATE["keywords"])
+    _STATE["last_search"] = {kw: list(v) for kw, v in results.items() if kw in kws and isinstance(v, list)}
+    return _ok("search_restored",
+               keywords=sorted(_STATE["last_search"]),
+               total=sum(len(v) for v in _STATE["last_search"].values()))
 
 def yt_calc_trends(args: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Calcula score simple:
-      score_video = views / sqrt(horas_desde_publicacion + 1)
+    Calcula el score de cada video. params: limit (int), score ('velocity'|'simple', default YT_TREND_SCORE)
+      velocity: vistas/hora entre los dos últimos snapshots guardados (separados al menos
+                YT_VELOCITY_MIN_GAP_MIN); con un solo snapshot, views / horas_desde_publicacion,
+                que rankea después de los medidos (velocity_source: snapshots | lifetime)
+      simple:   views / sqrt(horas_desde_publicacion + 1)
     Primero intenta con resultados de keywords (last_search).
     Si no hay, y existe last_fetch_popular (trending), calcula sobre eso.
     """
     limit = _as_int((args or {}).get("limit", 10), 10)
+    mode = str((args or {}).get("score") or TREND_SCORE).strip().lower()
+    if mode not in ("velocity", "simple"):
+        return _err(f"score desconocido: {mode} (usa velocity o simple)")
 
     source = "keywords" if _STATE.get("last_search") else ("most_popular" if _STATE.get("last_fetch_popular") else None)
     if not source:
         return _err("No hay datos. Ejecuta primero 'yt_search_recent' o 'yt_fetch_most_popular'.")
 
-    now = datetime.now(timezone.utc)
-
-    def hours_since(published_iso: str) -> float:
-        try:
-            dt = datetime.fromisoformat(published_iso.replace("Z", "+00:00"))
-            return max(0.0, (now - dt).total_seconds() / 3600.0)
-        except Exception:
-            return 24.0
-
-    videos_scored: List[Dict[str, Any]] = []
-
     if source == "keywords":
-        for kw, vids in _STATE["last_search"].items():
-            for v in vids:
-                h = hours_since(v.get("publishedAt") or "")
-                score = float(v.get("views", 0)) / math.sqrt(h + 1.0)
-                vv = dict(v)
-                vv["score"] = round(score, 3)
-                videos_scored.append(vv)
+        vids = [v for vs in _STATE["last_search"].values() for v in vs]
     else:
-        for v in _STATE["last_fetch_popular"]:
-            h = hours_since(v.get("publishedAt") or "")
-            score = float(v.get("views", 0)) / math.sqrt(h + 1.0)
-            vv = dict(v)
-            vv["score"] = round(score, 3)
-            videos_scored.append(vv)
-
-    videos_scored.sort(key=lambda x: x["score"], reverse=True)
+        vids = list(_STATE["last_fetch_popular"])
 
-    # Scores por keyword
-    kw_scores: Dict[str, float] = {}
-    for v in videos_scored:
-        k = v.get("keyword")
-        if k:
-            kw_scores[k] = kw_scores.get(k, 0.0) + float(v["score"])
+    velocity: Dict[str, Dict[str, Any]] = {}
+    if mode == "velocity":
+        try:
+            velocity = _SNAPSHOTS.velocity([v.get("videoId") for v in vids if v.get("videoId")])
+        except Exception as ex:
+            print(f"[YTtool] WARN snapshots: {ex}", file=sys.stderr)
 
-    kw_rank = [{"keyword": k, "score": round(s, 3)} for k, s in kw_scores.items()]
-    kw_rank.sort(key=lambda x: x["score"], reverse=True)
+    # scores en columnas; solo se arman dicts para el top pedido (ver yt_scoring.py)
+    table = TrendTable(vids, now=time.time(), mode=mode, velocity=velocity)
+    kw_rank = table.keyword_totals()
 
-    _STATE["last_calc"] = {"keywords": kw_rank, "videos": videos_scored}
-    return _ok("calc_trends", keywords=kw_rank[:limit], top_videos=videos_scored[:limit])
+    _STATE["last_calc"] = {"keywords": kw_rank, "table": table}
+    return _ok("calc_trends", score=mode, keywords=kw_rank[:limit], top_videos=table.rows_at(table.top(limit)))
 
 
 def yt_trend_details(args: Dict[str, Any]) -> Dict[str, Any]:
     """ Devuelve detalle de una keyword (top N videos por score) """
-    if not _STATE["last_calc"].get("videos"):
+    table = _STATE["last_calc"].get("table")
+    if not table:
         return _err("No hay cálculo previo. Llama antes a yt_search_recent y yt_calc_trends.")
 
     kw = (args or {}).get("keyword")
@@ -301,41 +818,42 @@ def yt_trend_details(args: Dict[str, Any]) -> Dict[str, Any]:
     if not kw:
         return _err("Falta 'keyword'.")
 
-    kwn = str(kw).strip().lower()
-    filtered = [v for v in _STATE["last_calc"]["videos"] if str(v.get("keyword","")).strip().lower() == kwn]
-    filtered.sort(key=lambda x: x["score"], reverse=True)
-    return _ok("trend_details", keyword=kw, count=min(top, len(filtered)), items=filtered[:top])
+    code = table.keyword_index(kw)
+    items = table.rows_at(table.top(top, keyword=code)) if code is not None else []
+    return _ok("trend_details", keyword=kw, count=len(items), items=items)
 
 def yt_export_report(args: Dict[str, Any]) -> Dict[str, Any]:
-    """ Exporta CSV del último cálculo: columns = keyword, videoId, title, views, score """
-    if not _STATE["last_calc"].get("videos"):
+    """
+    Exporta el último cálculo: columns = keyword, videoId, title, channelTitle, publishedAt, views, score
+    params: path (opcional), format ('csv'|'ndjson'|'parquet'|'arrow'; si falta, por la extensión del path),
+            gzip (bool; también con path terminado en .gz)
+    Las filas se escriben en streaming y de forma atómica (ver yt_export.py).
+    """
+    table = _STATE["last_calc"].get("table")
+    if not table:
         return _err("No hay cálculo previo. Llama antes a yt_search_recent y yt_calc_trends.")
 
     path = (args or {}).get("path")
+    try:
+        fmt, compress = yt_export.resolve(path, (args or {}).get("format"), (args or {}).get("gzip"))
+    except ValueError as ex:
+        return _err(str(ex))
     if not path:
         base = os.path.splitext(os.path.abspath(__file__))[0]
-        path = base + "_trends_report.csv"
+        path = base + "_trends_report" + yt_export.default_name(fmt, compress)
 
-    rows = _STATE["last_calc"]["videos"]
     try:
-        with open(path, "w", encoding="utf-8", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["keyword", "videoId", "title", "channelTitle", "publishedAt", "views", "score"])
-            for r in rows:
-                w.writerow([
-                    r.get("keyword",""),
-                    r.get("videoId",""),
-                    r.get("title",""),
-                    r.get("channelTitle",""),
-                    r.get("publishedAt",""),
-                    r.get("views",0),
-                    r.get("score",0.0),
-                ])
-        return _ok("export_report", path=path, rows=len(rows))
+        out = yt_export.write_report(table.iter_rows(), path, fmt, compress)
+        return _ok("export_report", **out)
     except Exception as ex:
         return _err(f"yt_export_report falló: {ex}")
 
 
+def yt_quota_status(args: Dict[str, Any]) -> Dict[str, Any]:
+    """ Cuota usada hoy (por endpoint) y restante según YT_QUOTA_BUDGET """
+    return _ok("quota_status", **_QUOTA.status())
+
+
 # Enrutador 
 _TOOL_MAP = {
     "yt_init": yt_init,
@@ -347,6 +865,7 @@ _TOOL_MAP = {
     "yt_calc_trends": yt_calc_trends,
     "yt_trend_details": yt_trend_details,
     "yt_export_report": yt_export_report,
+    "yt_quota_status": yt_quota_status,
 }
 
 def execute_tool_sync(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Optional, Dict, Any, List
+import time
+from typing import Callable, Optional, Dict, Any, List
 
+import tracing
 from client import OpenAIResponsesClient
 from mcp_manager import MCPMultiplexer
 
@@ -12,6 +14,7 @@ DEFAULT_SYSTEM = (
     "Eres un agente que puede usar herramientas MCP.\n"
     "CUANDO NECESITES UNA HERRAMIENTA, EMITE **UN ÚNICO** OBJETO JSON EXACTO:\n"
     '{"action":"tool_call","server":"<nombre-del-servidor>","tool":"<tool>","args":{...}}\n'
+    "- Si necesitas VARIAS herramientas independientes, emite una LISTA JSON de esos objetos en un solo mensaje.\n"
     "- JSON válido: comillas dobles, claves entre comillas, sin comentarios.\n"
     "- No describas lo que vas a hacer; emite el tool_call directamente.\n"
     "- Tras la OBSERVACIÓN del resultado, responde con un resumen breve o emite el siguiente tool_call.\n"
@@ -132,6 +135,130 @@ def _extract_first_tool_call(text: str) -> Optional[Dict[str, Any]]:
 
     return None
 
+class _ToolCallAwareStream:
+    """
+    Reenvía deltas a on_delta salvo que la respuesta parezca un tool_call JSON.
+    Retiene el texto mientras empiece con '{', '[' o '`' (posible JSON/fence); en cuanto
+    queda claro que es prosa, suelta lo retenido y sigue en streaming.
+    """
+    def __init__(self, on_delta: Callable[[str], None]):
+        self.on_delta = on_delta
+        self.buf = ""
+        self.passthrough = False
+        self.emitted = False
+
+    def __call__(self, delta: str) -> None:
+        if self.passthrough:
+            self._emit(delta)
+            return
+        self.buf += delta
+        head = self.buf.lstrip()
+        if not head or head[0] in "{[`":
+            return
+        self.passthrough = True
+        self._emit(self.buf)
+        self.buf = ""
+
+    def _emit(self, text: str) -> None:
+        if text:
+            self.emitted = True
+            self.on_delta(text)
+
+#  Function calling nativo (Responses API "tools")
+
+NATIVE_SYSTEM = (
+    "Eres un agente que puede usar herramientas MCP mediante function calling.\n"
+    "Llama a las funciones directamente cuando las necesites; tras ver su resultado, "
+    "responde con un resumen breve o llama a la siguiente función.\n"
+)
+
+_FN_SEP = "__"
+
+def _fn_name(server: str, tool: str) -> str:
+    """Nombre de función válido para la API (^[a-zA-Z0-9_-]{1,64}$) a partir de server/tool."""
+    name = re.sub(r"[^a-zA-Z0-9_-]", "_", f"{server}{_FN_SEP}{tool}")
+    return name[:64]
+
+def _params_schema(schema: Any) -> Dict[str, Any]:
+    """Usa el inputSchema MCP como parameters; garantiza un objeto JSON Schema mínimo."""
+    sch = dict(schema) if isinstance(schema, dict) else {}
+    sch.setdefault("type", "object")
+    sch.setdefault("properties", {})
+    return sch
+
+def build_function_tools(specs: Dict[str, List[Dict[str, Any]]]) -> tuple[List[Dict[str, Any]], Dict[str, tuple[str, str]]]:
+    """
+    specs: {server: [{"name","description","inputSchema"}, ...]} (MCPMultiplexer.list_all_tool_specs_sync)
+    Devuelve (tools para la Responses API, mapa nombre_función -> (server, tool)).
+    """
+    tools: List[Dict[str, Any]] = []
+    fn_map: Dict[str, tuple[str, str]] = {}
+    for srv, items in specs.items():
+        for t in items:
+            fn = _fn_name(srv, t["name"])
+            if fn in fn_map:
+                continue
+            fn_map[fn] = (srv, t["name"])
+            tools.append({
+                "type": "function",
+                "name": fn,
+                "description": (t.get("description") or "")[:1024],
+                "parameters": _params_schema(t.get("inputSchema")),
+            })
+    return tools, fn_map
+
+def _function_calls(resp) -> List[Any]:
+    return [it for it in (getattr(resp, "output", None) or []) if getattr(it, "type", None) == "function_call"]
+
+def _iter_braced_blocks(s: str):
+    """Como _stack_extract_first_braced_block, pero recorre TODOS los bloques {...} de nivel superior."""
+    i = 0
+    while True:
+        start = s.find("{", i)
+        if start == -1:
+            return
+        block = _stack_extract_first_braced_block(s[start:])
+        if not block:
+            return
+        yield block
+        i = start + len(block)
+
+def _extract_tool_calls(text: str) -> List[Dict[str, Any]]:
+    """
+    Extrae uno o varios tool_call del texto:
+    1) lista JSON de tool_call (o {"action":"tool_calls","calls":[...]}).
+    2) varios objetos tool_call seguidos/incrustados en el texto.
+    3) si no, la cascada de _extract_first_tool_call.
+    """
+    if not text:
+        return []
+    s = _strip_fences(_normalize_quotes(text.strip()))
+
+    for cand in (s, _jsonish_to_json(s)):
+        try:
+            obj = json.loads(cand)
+        except Exception:
+            continue
+        if isinstance(obj, dict) and obj.get("action") == "tool_calls":
+            obj = obj.get("calls")
+        if isinstance(obj, list):
+            calls = [o for o in obj if isinstance(o, dict) and _looks_like_tool_call(o)]
+            if calls:
+                return calls
+
+    calls: List[Dict[str, Any]] = []
+    for block in _iter_braced_blocks(s):
+        for cand in (block, _jsonish_to_json(block)):
+            obj = _safe_json_load(cand)
+            if obj and _looks_like_tool_call(obj):
+                calls.append(obj)
+                break
+    if len(calls) > 1:
+        return calls
+
+    first = _extract_first_tool_call(text)
+    return [first] if first else []
+
 # ----------------------- Agente plan–act–observe -----------------------
 
 class MCPAgent:
@@ -142,12 +269,23 @@ class MCPAgent:
         *,
         max_steps: int = 4,
         system_prompt: str | None = None,
+        native_tools: bool = False,
+        on_llm: Optional[Callable[[Dict[str, Any]], None]] = None,
     ):
+        """
+        native_tools=True: el catálogo MCP se envía como `tools` de la Responses API y se leen
+        los items function_call estructurados, en vez de extraer el JSON del texto.
+        """
         self.llm = llm
         self.mcp = mcp
+        self.on_llm = on_llm  # hook opcional: {"id","duration_ms","usage","streamed"} por cada llamada al modelo
         self.max_steps = max_steps
         self.prev_response_id: Optional[str] = None
-        self.system_prompt = system_prompt or DEFAULT_SYSTEM
+        self.native_tools = native_tools
+        self.system_prompt = system_prompt or (NATIVE_SYSTEM if native_tools else DEFAULT_SYSTEM)
+        self._fn_tools: Optional[List[Dict[str, Any]]] = None
+        self._fn_map: Dict[str, tuple[str, str]] = {}
+        self.streamed = False  # True si la última respuesta final ya salió por on_delta
 
     def _build_input(self, user_msg: str, observation: Optional[str] = None) -> List[Dict[str, Any]]:
         parts: List[Dict[str, Any]] = [
@@ -161,40 +299,168 @@ class MCPAgent:
             })
         return parts
 
-    def run(self, user_msg: str, *, max_output_tokens: int = 700) -> str:
-        observation: Optional[str] = None
-        final_answer: Optional[str] = None
-        last_tool_result: Optional[dict] = None
+    def _llm_step(self, parts, *, max_output_tokens: int, on_delta, tools=None):
+        """Una llamada al modelo (streaming si hay on_delta). Devuelve (resp, sink)."""
+        with tracing.span("agent.llm_step", streaming=on_delta is not None):
+            return self._llm_call(parts, max_output_tokens=max_output_tokens, on_delta=on_delta, tools=tools)
 
-        for _ in range(self.max_steps):
-            parts = self._build_input(user_msg, observation)
+    def _llm_call(self, parts, *, max_output_tokens: int, on_delta, tools=None):
+        extra = {"tools": tools} if tools else {}
+        t0 = time.perf_counter()
+        if on_delta is not None:
+            sink = _ToolCallAwareStream(on_delta)
+            resp = self.llm.create_streaming(
+                parts,
+                previous_response_id=self.prev_response_id,
+                max_output_tokens=max_output_tokens,
+                on_delta=sink,
+                **extra,
+            )
+        else:
+            sink = None
             resp = self.llm.create(
                 parts,
                 previous_response_id=self.prev_response_id,
                 max_output_tokens=max_output_tokens,
+                **extra,
             )
             resp = self.llm.wait_until_ready(resp)
+        self.prev_response_id = resp.id
+        if self.on_llm:
+            try:
+                self.on_llm({
+                    "id": resp.id,
+                    "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                    "usage": getattr(resp, "usage", None),
+                    "streamed": on_delta is not None,
+                })
+            except Exception:
+                pass
+        return resp, sink
+
+    def _function_tools(self) -> List[Dict[str, Any]]:
+        # el multiplexer cachea el catálogo; se reconstruye en cada turno por si fue invalidado
+        self._fn_tools, self._fn_map = build_function_tools(self.mcp.list_all_tool_specs_sync())
+        return self._fn_tools
+
+    def _call_many(self, calls: List[tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Una tool: llamada directa. Varias: concurrentes vía MCPMultiplexer.call_tools_sync."""
+        with tracing.span("agent.tools", count=len(calls)):
+            try:
+                if len(calls) == 1:
+                    return [self.mcp.call_tool_sync(*calls[0])]
+                return self.mcp.call_tools_sync(calls)
+            except Exception as e:
+                return [{"error": str(e)} for _ in calls]
+
+    def _call_functions(self, fn_calls) -> List[Dict[str, Any]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(fn_calls)
+        pending: List[tuple[int, tuple[str, str, Dict[str, Any]]]] = []
+        for i, call in enumerate(fn_calls):
+            target = self._fn_map.get(getattr(call, "name", ""))
+            if not target:
+                results[i] = {"error": f"Función desconocida: {getattr(call, 'name', '')}"}
+                continue
+            try:
+                args = json.loads(getattr(call, "arguments", None) or "{}")
+            except Exception as e:
+                results[i] = {"error": f"Argumentos inválidos para {call.name}: {e}"}
+                continue
+            pending.append((i, (target[0], target[1], args if isinstance(args, dict) else {})))
+        if pending:
+            for (i, _), res in zip(pending, self._call_many([c for _, c in pending])):
+                results[i] = res
+        return results
+
+    def run(self, user_msg: str, *, max_output_tokens: int = 700,
+            on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        on_delta: si se pasa, la respuesta final se entrega token a token por streaming
+        (los tool_call JSON no se reenvían). Sin on_delta se usa create + polling.
+        """
+        self.streamed = False
+        with tracing.span("agent.run", native_tools=self.native_tools):
+            if self.native_tools:
+                return self._run_native(user_msg, max_output_tokens=max_output_tokens, on_delta=on_delta)
+            return self._run_text(user_msg, max_output_tokens=max_output_tokens, on_delta=on_delta)
+
+    def _run_text(self, user_msg: str, *, max_output_tokens: int,
+                  on_delta: Optional[Callable[[str], None]]) -> str:
+        observation: Optional[str] = None
+        final_answer: Optional[str] = None
+        last_tool_result: Optional[dict] = None
+
+        for _ in range(self.max_steps):
+            parts = self._build_input(user_msg, observation)
+            resp, sink = self._llm_step(parts, max_output_tokens=max_output_tokens, on_delta=on_delta)
             text = self.llm.collect_text(resp).strip()
-            self.prev_response_id = resp.id
 
-            tool_req = _extract_first_tool_call(text)
-            if not tool_req:
+            tool_reqs = _extract_tool_calls(text)
+            if not tool_reqs:
+                if sink is not None and not sink.emitted and text:
+                    # respuesta retenida (empezaba con '{', '[' o '`' pero no era tool_call)
+                    sink._emit(text)
+                self.streamed = bool(sink and sink.emitted)
                 final_answer = text
                 break
 
-            server = tool_req.get("server")
-            tool = tool_req.get("tool")
-            args = tool_req.get("args") or {}
+            # Ejecutar las tools del paso (en paralelo si son varias)
+            calls = [(r.get("server"), r.get("tool"), r.get("args") or {}) for r in tool_reqs]
+            results = self._call_many(calls)
 
-            # Ejecutar UNA tool
-            try:
-                tool_res = self.mcp.call_tool_sync(server, tool, args)
-            except Exception as e:
-                tool_res = {"error": str(e)}
+            if len(results) == 1:
+                last_tool_result = results[0]
+            else:
+                last_tool_result = {"results": [
+                    {"server": srv, "tool": tool, "result": res} for (srv, tool, _), res in zip(calls, results)
+                ]}
+            observation = json.dumps(last_tool_result, ensure_ascii=False)[:16000]
+
+        return self._finish(final_answer, last_tool_result)
+
+    def _run_native(self, user_msg: str, *, max_output_tokens: int,
+                    on_delta: Optional[Callable[[str], None]]) -> str:
+        tools = self._function_tools()
+        final_answer: Optional[str] = None
+        last_tool_result: Optional[dict] = None
+        # primer paso: system + user; luego solo los function_call_output (el contexto va por previous_response_id)
+        parts: List[Dict[str, Any]] = self._build_input(user_msg)
+
+        # pending: la última respuesta tiene function_call sin responder. Esa respuesta no sirve como
+        # previous_response_id (la API rechaza el siguiente turno con 400 "No tool output found"), así que
+        # si se sale del loop en ese estado (max_steps agotado o un paso que falla) se descarta.
+        pending = False
+        try:
+            for _ in range(self.max_steps):
+                resp, sink = self._llm_step(parts, max_output_tokens=max_output_tokens, on_delta=on_delta, tools=tools)
+                calls = _function_calls(resp)
+                pending = bool(calls)
+                if not calls:
+                    final_answer = self.llm.collect_text(resp).strip()
+                    if sink is not None and not sink.emitted and final_answer:
+                        sink._emit(final_answer)
+                    self.streamed = bool(sink and sink.emitted)
+                    break
+
+                # hay que responder a todos los call_id del paso; las tools corren en paralelo
+                results = self._call_functions(calls)
+                last_tool_result = results[0] if len(results) == 1 else {"results": results}
+                parts = [
+                    {
+                        "type": "function_call_output",
+                        "call_id": call.call_id,
+                        "output": json.dumps(res, ensure_ascii=False)[:16000],
+                    }
+                    for call, res in zip(calls, results)
+                ]
+        finally:
+            if pending:
+                self.prev_response_id = None
 
-            last_tool_result = tool_res
-            observation = json.dumps(tool_res, ensure_ascii=False)[:16000]
+        return self._finish(final_answer, last_tool_result)
 
+    @staticmethod
+    def _finish(final_answer: Optional[str], last_tool_result: Optional[dict]) -> str:
         if final_answer:
             return final_answer
         if last_tool_result is not None:
@@ -0,0 +1,288 @@
+# benchmark end-to-end: ChatService.ask con un LLM guionado y servidores MCP stub locales
+# (bench_stub_mcp.py para fs, git, yt y gram). No usa red: corre en un Linux sin API keys.
+# uso: python bench_e2e.py [--rounds 3] [--llm-ms 0] [--tool-ms 0] [--lazy] [--native] [--json]
+#
+# Reporta latencia por turno (p50/p95/p99 por escenario), procesos lanzados, round-trips MCP
+# por server:tool (de los eventos mcp/call del log) y RSS pico propio y de los hijos.
+# Los escenarios son los prompts de ejemplo del README (sin Zotero, que necesita red).
+import argparse
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from agent import _fn_name
+from chat_service import ChatService
+from log import JsonlLogger
+from log_stats import LatencyHist, analyze
+from mcp_manager import MCPServerConfig
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_stub_mcp.py")
+
+# (prompt, tool_calls que "decide" el LLM guionado; [] = lo resuelve el ruteo por regex o responde sin tools)
+SCENARIOS: List[tuple[str, List[Dict[str, Any]]]] = [
+    ("crea una carpteta que se llame HOLA en {base}",
+     [{"server": "fs", "tool": "create_directory", "args": {"path": "{base}/HOLA"}}]),
+    ("actualiza una carpeta que se llame HOLA en {base} y que tenga dentro un readme.md y diga hola",
+     [{"server": "fs", "tool": "write_file", "args": {"path": "{base}/HOLA/README.md", "content": "hola"}}]),
+    ("ahora puedes hacer que HOLA sea un repositorio?",
+     [{"server": "git", "tool": "git_set_working_dir", "args": {"path": "{base}/HOLA"}},
+      {"server": "git", "tool": "git_init", "args": {}}]),
+    ("puedes hacer el primer commit y que diga: initial commit?",
+     [{"server": "git", "tool": "git_add", "args": {"paths": ["."]}},
+      {"server": "git", "tool": "git_commit", "args": {"message": "initial commit"}}]),
+    ('repo create "{base}/HOLA2"', []),
+    ("puedes listar el contenido de la carpeta: {base}",
+     [{"server": "fs", "tool": "list_directory", "args": {"path": "{base}"}}]),
+    ("lista códigos de region de youtube", []),
+    ("dame el top de tendencias en youtube guatemala limite 15", []),
+    ("registra keywords: minecraft, marvel", []),
+    ("busca 10 videos por keyword de los ultimos 7 días en GT", []),
+    ("calcula tendencias top 5", []),
+    ("profundiza en marvel top 5", []),
+    ("exporta reporte csv", []),
+    ("dime el top de tendencias en youtube SV", []),
+    ('corrige "hola como estas"', []),
+    ("puedes corregir la siguiente oracion: hola como estas",
+     [{"server": "gram", "tool": "gram_fix", "args": {"text": "hola como estas", "lang": "es"}}]),
+    ("hola, ¿qué puedes hacer?", []),
+]
+
+
+#  LLM guionado
+
+def _fake_response(rid: str, text: str, n_in: int) -> SimpleNamespace:
+    n_out = max(1, len(text) // 4)
+    return SimpleNamespace(
+        id=rid, status="completed", output_text=text, output=[],
+        usage=SimpleNamespace(input_tokens=n_in, output_tokens=n_out, total_tokens=n_in + n_out),
+    )
+
+
+class ScriptedLLM:
+    """
+    Backend con la forma de openai.OpenAI (ver llm_replay.py). Para cada prompt devuelve, en orden,
+    los tool_call del guion (uno por paso del agente) y luego una respuesta final fija.
+    """
+    def __init__(self, scripts: Dict[str, List[Dict[str, Any]]], *, latency_ms: float = 0.0):
+        self.responses = self
+        self.scripts = scripts
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._step = 0
+        self._calls: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, SimpleNamespace] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _texts(parts) -> tuple[str, Optional[str]]:
+        user, obs = "", None
+        for p in parts or []:
+            if p.get("type") == "function_call_output":
+                obs = "OBSERVACIÓN: " + str(p.get("output"))
+                continue
+            txt = "".join(c.get("text", "") for c in p.get("content") or [] if isinstance(c, dict))
+            if p.get("role") == "user":
+                user = txt
+            elif txt.startswith("OBSERVACIÓN"):
+                obs = txt
+        return user, obs
+
+    def _next(self, parts) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """(tool_call del paso actual o None, observación recibida)."""
+        user, obs = self._texts(parts)
+        with self._lock:
+            if obs is None:
+                # turno nuevo (en modo nativo los pasos siguientes ya no traen el mensaje del usuario)
+                try:
+                    direct = json.loads(user)  # intents que llegan ya como tool_call (gram)
+                except Exception:
+                    direct = None
+                if isinstance(direct, dict) and direct.get("action") == "tool_call":
+                    self._calls = [direct]
+                else:
+                    self._calls = [dict(c, action="tool_call") for c in self.scripts.get(user, [])]
+                self._step = 0
+            else:
+                self._step += 1
+            call = self._calls[self._step] if self._step < len(self._calls) else None
+        return call, obs
+
+    def create(self, **kw):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        call, obs = self._next(kw.get("input"))
+        with self._lock:
+            self.calls += 1
+            rid = f"fake-{self.calls}"
+        n_in = sum(len(json.dumps(p, ensure_ascii=False)) for p in kw.get("input") or []) // 4
+        if call is not None and kw.get("tools"):
+            resp = _fake_response(rid, "", n_in)
+            resp.output = [SimpleNamespace(type="function_call", call_id=f"call-{self.calls}",
+                                           name=_fn_name(call["server"], call["tool"]),
+                                           arguments=json.dumps(call.get("args") or {}, ensure_ascii=False))]
+            text = ""
+        else:
+            if call is not None:
+                text = json.dumps(call, ensure_ascii=False)
+            elif obs:
+                text = "Listo. " + obs.split(":", 1)[-1].strip()[:160]
+            else:
+                text = "Puedo usar herramientas de archivos, git, YouTube y gramática."
+            resp = _fake_response(rid, text, n_in)
+        self._by_id[rid] = resp
+        if not kw.get("stream"):
+            return resp
+        return self._events(resp, text)
+
+    @staticmethod
+    def _events(resp, text: str):
+        yield SimpleNamespace(type="response.created", response=SimpleNamespace(id=resp.id, status="in_progress"))
+        for tok in re.findall(r"\S+\s*", text):
+            yield SimpleNamespace(type="response.output_text.delta", delta=tok)
+        yield SimpleNamespace(type="response.completed", response=resp)
+
+    def retrieve(self, rid: str):
+        return self._by_id[rid]
+
+
+#  conteo de procesos
+
+class _SpawnCounter:
+    """Cuenta los subprocess.Popen del proceso (servidores MCP vía asyncio y git CLI de intents)."""
+    def __init__(self):
+        self.by_cmd: Dict[str, int] = {}
+        self._orig = subprocess.Popen
+        counter = self
+
+        class _Popen(self._orig):
+            def __init__(self, args, *a, **kw):
+                argv = [args] if isinstance(args, (str, bytes)) else list(args)
+                name = os.path.basename(str(argv[0])) if argv else "?"
+                if name.startswith("python") and len(argv) > 2 and str(argv[1]).endswith("bench_stub_mcp.py"):
+                    name = f"stub:{argv[2]}"
+                counter.by_cmd[name] = counter.by_cmd.get(name, 0) + 1
+                super().__init__(args, *a, **kw)
+
+        self._cls = _Popen
+
+    def __enter__(self):
+        subprocess.Popen = self._cls
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen = self._orig
+
+
+def _stub_servers(root: str, tool_ms: float) -> List[MCPServerConfig]:
+    return [
+        MCPServerConfig(name=k, command=sys.executable, args=[STUB, k, "--root", root, "--delay-ms", str(tool_ms)])
+        for k in ("fs", "git", "yt", "gram")
+    ]
+
+
+def _rss_mb(who: int) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # Linux: KiB
+
+
+def run(*, rounds: int, llm_ms: float, tool_ms: float, lazy: bool, native: bool, root: str) -> Dict[str, Any]:
+    shutil.rmtree(root, ignore_errors=True)
+    base = os.path.join(root, "redes")
+    os.makedirs(base)
+    scenarios = [(p.replace("{base}", base), json.loads(json.dumps(c).replace("{base}", base))) for p, c in SCENARIOS]
+    log_path = os.path.join(root, "logs", "app.jsonl")
+    llm = ScriptedLLM({p: c for p, c in scenarios}, latency_ms=llm_ms)
+
+    with _SpawnCounter() as spawns:
+        t0 = time.perf_counter()
+        # catálogo propio: los esquemas de los stubs no deben reemplazar .mcp_cache/tools.json
+        svc = ChatService(servers=_stub_servers(root, tool_ms), llm_backend=llm, native_tools=native,
+                          lazy_servers=lazy, logger=JsonlLogger(log_path),
+                          catalog_path=os.path.join(root, ".mcp_cache", "tools.json"))
+        startup_ms = (time.perf_counter() - t0) * 1000
+
+        per_prompt: Dict[str, LatencyHist] = {}
+        total = LatencyHist()
+        errors = 0
+        t_run = time.perf_counter()
+        for _ in range(rounds):
+            for prompt, _calls in scenarios:
+                t0 = time.perf_counter()
+                out = svc.ask(prompt)
+                ms = (time.perf_counter() - t0) * 1000
+                per_prompt.setdefault(prompt, LatencyHist()).add(ms)
+                total.add(ms)
+                errors += str(out).startswith("ERROR")
+        wall_s = time.perf_counter() - t_run
+
+        svc.mcp.stop_sync()
+        svc.logger.close()
+
+    rep = analyze(log_path, top=3)
+    mcp_calls = {k[4:]: v["count"] for k, v in rep["stages"].items() if k.startswith("mcp:")}
+    return {
+        "rounds": rounds,
+        "turns": total.count,
+        "errors": errors,
+        "startup_ms": round(startup_ms, 1),
+        "wall_s": round(wall_s, 3),
+        "turns_per_s": round(total.count / wall_s, 1) if wall_s else 0.0,
+        "turn_ms": total.summary(),
+        "per_prompt": {p.replace(base, "{base}"): h.summary() for p, h in per_prompt.items()},
+        "llm_calls": llm.calls,
+        "mcp_round_trips": sum(mcp_calls.values()),
+        "mcp_calls": dict(sorted(mcp_calls.items())),
+        "spawns": dict(sorted(spawns.by_cmd.items())),
+        "peak_rss_mb": {"self": _rss_mb(resource.RUSAGE_SELF), "children": _rss_mb(resource.RUSAGE_CHILDREN)},
+    }
+
+
+def _print(rep: Dict[str, Any]):
+    t = rep["turn_ms"]
+    print(f"{rep['turns']} turnos ({rep['rounds']} rondas), {rep['errors']} errores, "
+          f"arranque {rep['startup_ms']:.0f} ms, {rep['wall_s']:.2f} s, {rep['turns_per_s']} turnos/s")
+    print(f"turno: p50 {t['p50']} ms  p95 {t['p95']} ms  p99 {t['p99']} ms  max {t['max']} ms")
+    print()
+    hdr = f"{'escenario':<60} {'p50':>8} {'p95':>8} {'max':>8}"
+    print(hdr)
+    print("-" * len(hdr))
+    for p, s in rep["per_prompt"].items():
+        print(f"{p[:60]:<60} {s['p50']:>8.1f} {s['p95']:>8.1f} {s['max']:>8.1f}")
+    print()
+    print(f"LLM: {rep['llm_calls']} llamadas   MCP: {rep['mcp_round_trips']} round-trips")
+    for k, n in rep["mcp_calls"].items():
+        print(f"  {k:<40} {n:>6}")
+    print("procesos lanzados: " + ", ".join(f"{k}={n}" for k, n in rep["spawns"].items()))
+    rss = rep["peak_rss_mb"]
+    print(f"RSS pico: {rss['self']} MB (proceso), {rss['children']} MB (hijo más grande)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark end-to-end de ChatService.ask sin red.")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--llm-ms", type=float, default=0.0, help="latencia simulada por llamada al LLM")
+    ap.add_argument("--tool-ms", type=float, default=0.0, help="latencia simulada por tool MCP")
+    ap.add_argument("--lazy", action="store_true", help="arranque perezoso de servidores (MCP_LAZY_START)")
+    ap.add_argument("--native", action="store_true", help="function calling nativo (MCP_NATIVE_TOOLS)")
+    ap.add_argument("--root", default=os.path.join(tempfile.gettempdir(), "bench_e2e"),
+                    help="directorio de trabajo (se borra al empezar)")
+    ap.add_argument("--json", action="store_true", help="salida JSON en vez de tabla")
+    a = ap.parse_args()
+
+    rep = run(rounds=a.rounds, llm_ms=a.llm_ms, tool_ms=a.tool_ms, lazy=a.lazy, native=a.native, root=a.root)
+    if a.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+    else:
+        _print(rep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# benchmark: chequeo en frío (LanguageTool nuevo por llamada) vs en caliente (pool)
+# uso: python bench_grammar.py [--lang es] [--runs 5]
+import argparse
+import time
+
+from grammarMCP import _POOL, _mk_tool, _close_tool
+
+SAMPLE = (
+    "hola como estas, yo estoy bien pero ayer fuimos a la tienda y compramos mucho cosas. "
+    "La reunion de mañana es a las 3 y no se si podre llegar a tiempo por el trafico. "
+)
+
+def _cold(text: str, lang: str) -> float:
+    t0 = time.perf_counter()
+    tool = _mk_tool(lang)
+    try:
+        tool.check(text)
+    finally:
+        _close_tool(tool)
+    return time.perf_counter() - t0
+
+def _warm(text: str, lang: str) -> float:
+    t0 = time.perf_counter()
+    with _POOL.borrow(lang) as tool:
+        tool.check(text)
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lang", default="es")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--repeat-text", type=int, default=10, help="veces que se repite el texto de ejemplo")
+    a = ap.parse_args()
+
+    text = SAMPLE * a.repeat_text
+    _POOL.prewarm([a.lang])
+
+    for label, fn in (("cold", _cold), ("warm", _warm)):
+        times = [fn(text, a.lang) for _ in range(a.runs)]
+        total = sum(times)
+        print(f"{label:>4}: {a.runs} runs, {len(text)} chars/run, "
+              f"avg {total / a.runs * 1000:.0f} ms, {len(text) * a.runs / total:,.0f} chars/s")
+
+    _POOL.close_all()
+
+if __name__ == "__main__":
+    main()
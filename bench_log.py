@@ -0,0 +1,63 @@
+# micro-benchmark: _to_jsonable(_redact(ev)) (dos pasadas) vs to_log_json(ev) (una pasada)
+# sobre eventos reales de logs/app.jsonl
+# uso: python bench_log.py [--path logs/app.jsonl] [--repeat 20]
+import argparse
+import json
+import time
+
+from log import _redact, _to_jsonable, to_log_json, iter_segments, open_segment
+
+
+class _FakeModel:
+    """Imita un objeto pydantic (p.ej. la respuesta completa de OpenAI) con model_dump()."""
+    def __init__(self, data):
+        self._data = data
+
+    def model_dump(self):
+        return json.loads(json.dumps(self._data))
+
+
+def _load_events(path: str):
+    evs = []
+    for seg in iter_segments(path):
+        with open_segment(seg) as f:
+            for raw in f:
+                try:
+                    evs.append(json.loads(raw))
+                except Exception:
+                    pass
+    return evs
+
+
+def _bench(fn, evs, repeat: int, dump: bool) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for ev in evs:
+            out = fn(ev)
+            if dump:
+                json.dumps(out, ensure_ascii=False)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--path", default="logs/app.jsonl")
+    ap.add_argument("--repeat", type=int, default=20)
+    a = ap.parse_args()
+
+    evs = _load_events(a.path)
+    # variante con "response" como objeto pydantic-like, como llega desde el SDK
+    evs_obj = [dict(ev, response=_FakeModel(ev["response"])) if isinstance(ev.get("response"), dict) else ev
+               for ev in evs]
+    n = len(evs) * a.repeat
+    print(f"{len(evs)} eventos x {a.repeat} repeticiones")
+    for label, data in (("dicts", evs), ("pydantic", evs_obj)):
+        for dump in (False, True):
+            old = _bench(lambda e: _to_jsonable(_redact(e)), data, a.repeat, dump)
+            new = _bench(to_log_json, data, a.repeat, dump)
+            print(f"{label:>9}{' +dumps' if dump else '       '}: redact+to_jsonable {old / n * 1e6:7.1f} us/ev | "
+                  f"to_log_json {new / n * 1e6:7.1f} us/ev | x{old / new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
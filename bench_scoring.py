@@ -0,0 +1,127 @@
+# benchmark del scoring de tendencias: yt_calc_trends actual (TrendTable, yt_scoring.py) contra la
+# implementación anterior (un dict por video + sort completo), sobre videos sintéticos en memoria
+# uso: python bench_scoring.py [--videos 100000] [--keywords 50] [--limit 10] [--repeat 5]
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import yt_scoring
+from yt_scoring import TrendTable
+
+
+def _videos(n: int, keywords: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    out = []
+    for i in range(n):
+        published = now - timedelta(seconds=rnd.randint(3600, 30 * 24 * 3600))
+        out.append({
+            "videoId": f"v{i:010d}",
+            "title": f"Video {i}",
+            "channelTitle": f"Canal {i % 997}",
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "views": int(rnd.paretovariate(1.2) * 1000),
+            "likes": rnd.randint(0, 10_000),
+            "comments": rnd.randint(0, 1_000),
+            "keyword": f"keyword {i % keywords}",
+        })
+    return out
+
+
+def legacy_calc(vids: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """yt_calc_trends antes de TrendTable (score simple)."""
+    now = datetime.now(timezone.utc)
+
+    def hours_since(published_iso: str) -> float:
+        try:
+            dt = datetime.fromisoformat(published_iso.replace("Z", "+00:00"))
+            return max(0.0, (now - dt).total_seconds() / 3600.0)
+        except Exception:
+            return 24.0
+
+    videos_scored: List[Dict[str, Any]] = []
+    for v in vids:
+        h = hours_since(v.get("publishedAt") or "")
+        vv = dict(v)
+        vv["score"] = round(float(v.get("views", 0)) / math.sqrt(h + 1.0), 3)
+        videos_scored.append(vv)
+    videos_scored.sort(key=lambda x: x["score"], reverse=True)
+
+    kw_scores: Dict[str, float] = {}
+    for v in videos_scored:
+        k = v.get("keyword")
+        if k:
+            kw_scores[k] = kw_scores.get(k, 0.0) + float(v["score"])
+    kw_rank = [{"keyword": k, "score": round(s, 3)} for k, s in kw_scores.items()]
+    kw_rank.sort(key=lambda x: x["score"], reverse=True)
+    return {"keywords": kw_rank[:limit], "top_videos": videos_scored[:limit]}
+
+
+def current_calc(vids: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    table = TrendTable(vids, now=time.time(), mode="simple")
+    return {"keywords": table.keyword_totals()[:limit], "top_videos": table.rows_at(table.top(limit))}
+
+
+def _time(fn, repeat: int) -> Dict[str, float]:
+    ms = []
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        ms.append((time.perf_counter() - t0) * 1000)
+    ms.sort()
+    return {"min": round(ms[0], 2), "median": round(ms[len(ms) // 2], 2), "out": out}
+
+
+def run(*, videos: int, keywords: int, limit: int, repeat: int) -> Dict[str, Any]:
+    vids = _videos(videos, keywords)
+    legacy = _time(lambda: legacy_calc(vids, limit), repeat)
+    current = _time(lambda: current_calc(vids, limit), repeat)
+    # consultas sobre una tabla ya construida (top-k + totales por keyword + detalle de una keyword)
+    table = TrendTable(vids, now=time.time(), mode="simple")
+    query = _time(lambda: (table.top(limit), table.keyword_totals(), table.top(limit, keyword=0)), repeat)
+    same_top = ([v["videoId"] for v in legacy["out"]["top_videos"]] ==
+                [v["videoId"] for v in current["out"]["top_videos"]])
+    same_kw = ([k["keyword"] for k in legacy["out"]["keywords"]] ==
+               [k["keyword"] for k in current["out"]["keywords"]])
+    return {
+        "videos": videos,
+        "keywords": keywords,
+        "limit": limit,
+        "numpy": yt_scoring.np is not None,
+        "legacy_ms": {k: v for k, v in legacy.items() if k != "out"},
+        "current_ms": {k: v for k, v in current.items() if k != "out"},
+        "query_ms": {k: v for k, v in query.items() if k != "out"},
+        "speedup": round(legacy["median"] / max(current["median"], 1e-6), 1),
+        "same_top": same_top,
+        "same_keywords": same_kw,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scoring de tendencias: TrendTable vs implementación anterior.")
+    ap.add_argument("--videos", type=int, default=100_000)
+    ap.add_argument("--keywords", type=int, default=50)
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="salida JSON en vez de texto")
+    a = ap.parse_args()
+
+    rep = run(videos=a.videos, keywords=a.keywords, limit=a.limit, repeat=a.repeat)
+    if a.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+        return
+    print(f"{rep['videos']} videos, {rep['keywords']} keywords, top {rep['limit']} "
+          f"({'numpy' if rep['numpy'] else 'python puro'})")
+    for name in ("legacy", "current", "query"):
+        t = rep[f"{name}_ms"]
+        print(f"  {name:<8} median {t['median']:>9.2f} ms   min {t['min']:>9.2f} ms")
+    print(f"  speedup x{rep['speedup']}  mismo top: {rep['same_top']}  mismas keywords: {rep['same_keywords']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# Servidores MCP stub (stdio) para bench_e2e.py: reemplazan fs, git, yt y gram sin red ni npx.
+# uso: python bench_stub_mcp.py fs|git|yt|gram [--root DIR] [--delay-ms N]
+#  - fs:   filesystem real pero confinado a --root
+#  - git:  git CLI sobre el directorio de trabajo (init/add/commit/status); el resto responde ok
+#  - yt:   datos sintéticos deterministas con las mismas claves que YTtool
+#  - gram: "corrige" sin LanguageTool (capitaliza y agrega punto final)
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from mcp.server.fastmcp import FastMCP
+
+_ap = argparse.ArgumentParser()
+_ap.add_argument("kind", choices=["fs", "git", "yt", "gram"])
+_ap.add_argument("--root", default=os.getcwd())
+_ap.add_argument("--delay-ms", type=float, default=0.0, help="latencia simulada por tool")
+A = _ap.parse_args()
+
+ROOT = os.path.realpath(A.root)
+mcp = FastMCP(f"stub-{A.kind}")
+
+
+def _delay():
+    if A.delay_ms > 0:
+        time.sleep(A.delay_ms / 1000.0)
+
+
+#  fs
+
+def _inside(path: str) -> str:
+    """Ruta real dentro de ROOT (las rutas absolutas de otro sistema se reubican bajo ROOT)."""
+    p = path.replace("\\", "/")
+    if len(p) > 1 and p[1] == ":":  # C:/...
+        p = p[2:]
+    full = os.path.realpath(p if p.startswith(ROOT) else os.path.join(ROOT, p.lstrip("/")))
+    if not (full == ROOT or full.startswith(ROOT + os.sep)):
+        raise ValueError(f"fuera de los directorios permitidos: {path}")
+    return full
+
+
+if A.kind == "fs":
+    @mcp.tool()
+    def list_allowed_directories() -> Dict[str, Any]:
+        _delay()
+        return {"directories": [ROOT]}
+
+    @mcp.tool()
+    def create_directory(path: str) -> Dict[str, Any]:
+        _delay()
+        try:
+            os.makedirs(_inside(path), exist_ok=True)
+        except Exception as e:
+            return {"error": str(e)}
+        return {"ok": True, "path": path}
+
+    @mcp.tool()
+    def write_file(path: str, content: str) -> Dict[str, Any]:
+        _delay()
+        try:
+            full = _inside(path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, "w", encoding="utf-8") as f:
+                f.write(content)
+        except Exception as e:
+            return {"error": str(e)}
+        return {"ok": True, "path": path, "bytes": len(content.encode("utf-8"))}
+
+    @mcp.tool()
+    def read_file(path: str) -> Dict[str, Any]:
+        _delay()
+        try:
+            with open(_inside(path), "r", encoding="utf-8") as f:
+                return {"path": path, "content": f.read()}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @mcp.tool()
+    def list_directory(path: str) -> Dict[str, Any]:
+        _delay()
+        try:
+            full = _inside(path)
+            entries = [("[DIR] " if os.path.isdir(os.path.join(full, n)) else "[FILE] ") + n
+                       for n in sorted(os.listdir(full))]
+        except Exception as e:
+            return {"error": str(e)}
+        return {"path": path, "entries": entries}
+
+
+#  git
+
+if A.kind == "git":
+    _WD = {"path": None}
+
+    def _git(*args: str) -> Dict[str, Any]:
+        _delay()
+        wd = _WD["path"]
+        if not wd:
+            return {"error": "no hay directorio de trabajo (usa git_set_working_dir)"}
+        p = subprocess.run(["git", "-C", wd, *args], capture_output=True, text=True)
+        if p.returncode != 0:
+            return {"error": (p.stderr or p.stdout or "git failed").strip()}
+        return {"ok": True, "output": (p.stdout or "").strip()}
+
+    @mcp.tool()
+    def git_set_working_dir(path: str) -> Dict[str, Any]:
+        _delay()
+        try:
+            _WD["path"] = _inside(path)
+        except Exception as e:
+            return {"error": str(e)}
+        return {"ok": True, "path": path}
+
+    @mcp.tool()
+    def git_init() -> Dict[str, Any]:
+        return _git("init", "-q")
+
+    @mcp.tool()
+    def git_add(paths: List[str]) -> Dict[str, Any]:
+        return _git("add", "--", *(paths or ["."]))
+
+    @mcp.tool()
+    def git_commit(message: str) -> Dict[str, Any]:
+        return _git("-c", "user.name=autobot", "-c", "user.email=autobot@example.com", "commit", "-q", "-m", message)
+
+    @mcp.tool()
+    def git_status() -> Dict[str, Any]:
+        return _git("status", "--porcelain=v1")
+
+    @mcp.tool()
+    def git_checkout(branchOrPath: str) -> Dict[str, Any]:
+        return _git("checkout", "-q", "-B", branchOrPath)
+
+
+#  yt
+
+def _h(*parts: Any) -> int:
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+
+def _video(seed: str, i: int, kw: str | None = None) -> Dict[str, Any]:
+    n = _h(seed, i)
+    v = {
+        "id": f"v{n:08x}",
+        "title": f"{(kw or seed).title()} video {i + 1}",
+        "channelTitle": f"canal {n % 97}",
+        "publishedAt": "2025-01-01T00:00:00Z",
+        "views": 1000 + n % 1_000_000,
+        "likes": n % 50_000,
+        "comments": n % 5_000,
+    }
+    if kw:
+        v["keyword"] = kw
+    return v
+
+
+if A.kind == "yt":
+    _KW: List[str] = []
+
+    @mcp.tool()
+    def yt_init() -> Dict[str, Any]:
+        _delay()
+        return {"ok": True}
+
+    @mcp.tool()
+    def yt_list_regions() -> Dict[str, Any]:
+        _delay()
+        return {"regions": [{"code": c, "name": c} for c in ("GT", "SV", "MX", "US", "ES", "AR", "CO")]}
+
+    @mcp.tool()
+    def yt_list_categories(region: str = "GT") -> Dict[str, Any]:
+        _delay()
+        return {"region": region, "categories": [{"id": str(i), "title": f"Categoría {i}"} for i in range(1, 16)]}
+
+    @mcp.tool()
+    def yt_fetch_most_popular(region: str = "GT", categoryId: str | None = None, max_pages: int = 1,
+                              limit: int = 10) -> Dict[str, Any]:
+        _delay()
+        return {"region": region, "items": [_video(region, i) for i in range(limit)]}
+
+    @mcp.tool()
+    def yt_register_keywords(keywords: List[str] | str) -> Dict[str, Any]:
+        _delay()
+        kws = [k.strip() for k in (keywords.split(",") if isinstance(keywords, str) else keywords) if k.strip()]
+        for k in kws:
+            if k not in _KW:
+                _KW.append(k)
+        return {"keywords": list(_KW)}
+
+    @mcp.tool()
+    def yt_search_recent(days: int = 7, per_keyword: int = 10, order: str = "viewCount",
+                         region: str | None = None, workers: int | None = None) -> Dict[str, Any]:
+        _delay()
+        results = {k: [_video(k, i, k) for i in range(per_keyword)] for k in _KW}
+        return {"keywords": list(_KW), "total": sum(len(v) for v in results.values()), "results": results}
+
+    @mcp.tool()
+    def yt_calc_trends(limit: int = 10) -> Dict[str, Any]:
+        _delay()
+        vids = sorted((_video(k, i, k) for k in _KW for i in range(10)), key=lambda v: -v["views"])[:limit]
+        for v in vids:
+            v["score"] = round(v["views"] / 1000.0, 2)
+        kws = [{"keyword": k, "score": round(sum(_video(k, i)["views"] for i in range(10)) / 1e4, 2)} for k in _KW]
+        return {"keywords": sorted(kws, key=lambda k: -k["score"])[:limit], "top_videos": vids}
+
+    @mcp.tool()
+    def yt_trend_details(keyword: str, top: int = 10) -> Dict[str, Any]:
+        _delay()
+        items = [dict(_video(keyword, i, keyword), score=round(i * 1.5, 2)) for i in range(top)]
+        return {"keyword": keyword, "items": items}
+
+    @mcp.tool()
+    def yt_quota_status() -> Dict[str, Any]:
+        _delay()
+        return {"day": time.strftime("%Y-%m-%d"), "used": 0, "budget": 10000, "remaining": 10000, "by_method": {}}
+
+    @mcp.tool()
+    def yt_export_report(path: str | None = None, format: str | None = None,
+                         gzip: bool | None = None) -> Dict[str, Any]:
+        _delay()
+        out = _inside(path or "YTtool_trends_report.csv")
+        rows = [_video(k, i, k) for k in _KW for i in range(10)]
+        with open(out, "w", encoding="utf-8") as f:
+            f.write("keyword,id,title,views\n")
+            for v in rows:
+                f.write(f"{v['keyword']},{v['id']},{v['title']},{v['views']}\n")
+        return {"path": out, "rows": len(rows)}
+
+
+#  gram
+
+def _fix(text: str) -> str:
+    t = " ".join((text or "").split())
+    if t:
+        t = t[0].upper() + t[1:]
+        if t[-1] not in ".!?":
+            t += "."
+    return t
+
+
+if A.kind == "gram":
+    @mcp.tool()
+    def gram_check(text: str, lang: str = "es") -> Dict[str, Any]:
+        _delay()
+        issues = [] if _fix(text) == text else [{"message": "estilo", "offset": 0, "length": len(text or "")}]
+        return {"lang": lang, "count": len(issues), "issues": issues}
+
+    @mcp.tool()
+    def gram_fix(text: str, lang: str = "es", aggressive: bool = False) -> Dict[str, Any]:
+        _delay()
+        fixed = _fix(text)
+        return {"lang": lang, "original_len": len(text or ""), "fixed_len": len(fixed),
+                "changes": int(fixed != text), "fixed_text": fixed}
+
+    @mcp.tool()
+    def gram_fix_file(path: str, lang: str = "es", backup: bool = True) -> Dict[str, Any]:
+        _delay()
+        try:
+            full = _inside(path)
+            with open(full, "r", encoding="utf-8") as f:
+                txt = f.read()
+            with open(full, "w", encoding="utf-8") as f:
+                f.write(_fix(txt))
+        except Exception as e:
+            return {"error": str(e)}
+        return {"path": path, "lang": lang, "changes": int(_fix(txt) != txt)}
+
+
+if __name__ == "__main__":
+    print(f"[stub-{A.kind}] root={ROOT}", file=sys.stderr)
+    mcp.run()
@@ -0,0 +1,107 @@
+# benchmark del pipeline de YouTube contra el servicio sintético local (yt_fake.py)
+# register -> search -> calc -> details -> export, en proceso y sin red ni cuota real
+# uso: python bench_yt.py [--keywords 8] [--per-keyword 25] [--latency-ms 40] [--workers 4] [--rounds 3]
+import argparse
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# estado aislado en un directorio temporal: la cuota, las cachés y la base reales (.yt_state) no se tocan
+_STATE_DIR = tempfile.mkdtemp(prefix="bench_yt_")
+atexit.register(shutil.rmtree, _STATE_DIR, ignore_errors=True)
+os.environ["YT_FAKE_STATE_DIR"] = _STATE_DIR
+os.environ["YT_CACHE_DIR"] = os.path.join(_STATE_DIR, "real", "cache")
+os.environ["YT_DB"] = os.path.join(_STATE_DIR, "real", "yt.sqlite3")
+
+import YTtool
+from yt_fake import FakeYouTube
+
+
+def _stage(name: str, fn, args: Dict[str, Any], timings: Dict[str, List[float]]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    r = fn(args)
+    timings.setdefault(name, []).append((time.perf_counter() - t0) * 1000)
+    if r.get("error"):
+        raise RuntimeError(f"{name}: {r['error']}")
+    return r
+
+
+def run(*, keywords: int, per_keyword: int, latency_ms: float, workers: int, rounds: int, scale: int,
+        top: int) -> Dict[str, Any]:
+    kws = [f"keyword {i}" for i in range(keywords)]
+    out_path = os.path.join(tempfile.gettempdir(), "bench_yt_report.csv")
+    timings: Dict[str, List[float]] = {}
+    walls: List[float] = []
+    stats: Dict[str, Any] = {}
+
+    for _ in range(rounds):
+        YTtool.yt_init({"fake": True})
+        svc: FakeYouTube = YTtool._YT
+        svc.scale, svc.latency_ms = scale, latency_ms
+        YTtool._STATE["keywords"] = []
+        YTtool._STATE["last_search"] = {}
+        YTtool._STATE["searched"] = {}
+
+        t0 = time.perf_counter()
+        _stage("register", YTtool.yt_register_keywords, {"keywords": kws}, timings)
+        r = _stage("search", YTtool.yt_search_recent,
+                   {"days": 30, "per_keyword": per_keyword, "order": "viewCount", "workers": workers,
+                    "full": True}, timings)  # sin marcas de agua: cada ronda mide el pipeline completo
+        _stage("calc", YTtool.yt_calc_trends, {"limit": top}, timings)
+        for kw in kws:
+            _stage("details", YTtool.yt_trend_details, {"keyword": kw, "top": top}, timings)
+        _stage("export", YTtool.yt_export_report, {"path": out_path}, timings)
+        walls.append((time.perf_counter() - t0) * 1000)
+        stats = dict(svc.stats(), videos=r.get("total", 0))
+
+    def _avg(xs: List[float]) -> float:
+        return round(sum(xs) / len(xs), 2) if xs else 0.0
+
+    return {
+        "keywords": keywords,
+        "per_keyword": per_keyword,
+        "workers": workers,
+        "latency_ms": latency_ms,
+        "rounds": rounds,
+        "wall_ms": {"avg": _avg(walls), "min": round(min(walls), 2), "max": round(max(walls), 2)},
+        "stage_ms": {k: _avg(v) for k, v in timings.items()},
+        "api": stats,  # de la última ronda
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pipeline YouTube contra yt_fake: llamadas a la API, cuota y tiempo.")
+    ap.add_argument("--keywords", type=int, default=8)
+    ap.add_argument("--per-keyword", type=int, default=25)
+    ap.add_argument("--latency-ms", type=float, default=40.0, help="latencia simulada por request a la API")
+    ap.add_argument("--workers", type=int, default=YTtool.SEARCH_WORKERS)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--scale", type=int, default=200, help="videos disponibles por búsqueda")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--json", action="store_true", help="salida JSON en vez de texto")
+    a = ap.parse_args()
+
+    rep = run(keywords=a.keywords, per_keyword=a.per_keyword, latency_ms=a.latency_ms, workers=a.workers,
+              rounds=a.rounds, scale=a.scale, top=a.top)
+    if a.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+        return
+    w = rep["wall_ms"]
+    print(f"{rep['keywords']} keywords x {rep['per_keyword']} videos, workers={rep['workers']}, "
+          f"latencia API {rep['latency_ms']:.0f} ms, {rep['rounds']} rondas")
+    print(f"pipeline: avg {w['avg']:.1f} ms (min {w['min']:.1f}, max {w['max']:.1f})")
+    for k, ms in rep["stage_ms"].items():
+        print(f"  {k:<10} {ms:>10.2f} ms")
+    api = rep["api"]
+    print(f"API: {api.get('requests', 0)} requests, {api.get('quota_units', 0)} unidades de cuota, "
+          f"{api.get('response_bytes', 0) / 1024:.1f} KiB, {api.get('videos', 0)} videos")
+    for m, n in sorted((api.get("calls") or {}).items()):
+        print(f"  {m:<22} {n:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,13 @@
 from mcp_manager import MCPMultiplexer, MCPServerConfig
 from client import OpenAIResponsesClient
 from agent import MCPAgent
-import shutil, os, re, json, sys
+import shutil, os, re, json, sys, time, uuid, weakref
 from agent import MCPAgent, DEFAULT_SYSTEM
 from intents import create_repo_hybrid
 from log import JsonlLogger
+import tracing
 from ZTRClient import ztr_execute_tool_http
-import anyio
-from mcp.client.stdio import stdio_client, StdioServerParameters
-from mcp import ClientSession
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any
 
 
 NPX = os.environ.get("NPX_CMD") or shutil.which("npx") or r"C:\Program Files\nodejs\npx.cmd"
@@ -43,7 +41,7 @@ ZTR_MCP_HTTP = "https://ztrmcp-990598886898.us-central1.run.app/mcp/sse?version=
 #-------------------------------------------------------------------------
 # trigger general de tema YouTubes
 _YT_TOPIC = re.compile(
-    r"(youtube|yt|tenden|trending|keywords?|palabras\s+clave|categor[ií]as|regiones?|regi[oó]n|exporta|profundiza|detalle|detalles|videos?)",
+    r"(youtube|yt|tenden|trending|keywords?|palabras\s+clave|categor[ií]as|regiones?|regi[oó]n|exporta|profundiza|detalle|detalles|videos?|quota\s+status)",
     re.I,
 )
 
@@ -124,79 +122,27 @@ def run_cite_intent(intent: dict) -> str:
 
 #-----------------------------------------------------------
 # MCP YouTube cliente
-async def _yt_call_mcp(tool: str, args: dict) -> dict:
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    server_path = os.path.join(base_dir, "YTServerMCP.py")
-    if not os.path.isfile(server_path):
-        return {"error": f"No encontré YTServerMCP.py en: {server_path}."}
-
-    errlog_path = os.path.join(base_dir, "youtube.mcp.err.log")
-    errlog = open(errlog_path, "ab")
-
-    yt_params = StdioServerParameters(
-        command=sys.executable,
-        args=[server_path],
-        cwd=base_dir,
-    )
+# Todas las llamadas van por la sesión "yt" que el MCPMultiplexer mantiene viva,
+# así el intérprete, el cliente de googleapiclient y el _STATE en memoria se
+# reutilizan entre intents. yt_init se hace una sola vez por multiplexer.
+_YT_READY: "weakref.WeakSet[MCPMultiplexer]" = weakref.WeakSet()
 
+def yt_execute_tool(mcp: MCPMultiplexer, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
     try:
-        async with stdio_client(yt_params, errlog=errlog) as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as sess:
-                await sess.initialize()
-
-                if tool != "yt_init":
-                    init_res = await sess.call_tool("yt_init", {})
-                    init_val = None
-                    for it in getattr(init_res, "content", []):
-                        if hasattr(it, "value"):
-                            init_val = it.value
-                            break
-                        if hasattr(it, "text"):
-                            init_val = {"msg": it.text}
-                            break
-                    if isinstance(init_val, dict) and init_val.get("error"):
-                        return {"error": f"No pude inicializar YouTube: {init_val['error']}"}
-
-                res = await sess.call_tool(tool, args or {})
-                # Normaliza la respuesta
-                for item in getattr(res, "content", []):
-                    if hasattr(item, "value") and isinstance(item.value, dict):
-                        return item.value
-                    if hasattr(item, "value") and isinstance(item.value, str):
-                        try:
-                            parsed = json.loads(item.value)
-                            if isinstance(parsed, dict):
-                                return parsed
-                            return {"value": parsed}
-                        except Exception:
-                            return {"msg": "non-json string from mcp", "value": item.value}
-                    if hasattr(item, "text") and item.text:
-                        try:
-                            parsed = json.loads(item.text)
-                            if isinstance(parsed, dict):
-                                return parsed
-                        except Exception:
-                            pass
-                        return {"msg": item.text}
-
-                return {"error": "Respuesta vacía del servidor MCP de YouTube"}
+        r = mcp.call_tool_sync("yt", name, args or {})
     except Exception as e:
-        try:
-            errlog.flush()
-            with open(errlog_path, "rb") as _fp:
-                tail = _fp.read()[-4096:]
-            hint = tail.decode("utf-8", errors="ignore")
-        except Exception:
-            hint = ""
-        return {"error": f"Fallo al iniciar/usar YTServerMCP.py: {e}\nÚltimas líneas de youtube.mcp.err.log:\n{hint}"}
-    finally:
-        try:
-            errlog.close()
-        except Exception:
-            pass
+        return {"error": f"Fallo llamando a YTServerMCP ({name}): {e}"}
+    return r if isinstance(r, dict) else {"value": r}
 
-def yt_execute_tool(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
-    return anyio.run(_yt_call_mcp, name, args)
+def _yt_ensure_init(mcp: MCPMultiplexer) -> Optional[str]:
+    """Inicializa YouTube en el servidor persistente si aún no se hizo. Devuelve error o None."""
+    if mcp in _YT_READY:
+        return None
+    r = _unwrap(yt_execute_tool(mcp, "yt_init", {}))
+    if r.get("error"):
+        return r["error"]
+    _YT_READY.add(mcp)
+    return None
 
 # helpers/intents YouTube 
 def _unwrap(r: dict | None) -> dict:
@@ -313,10 +259,17 @@ def _trigger_yt(text: str) -> dict | None:
 
     # exportar
     if re.search(r"exporta(r)?", tl):
-        fmt = "csv" if re.search(r"\bcsv\b", tl) else ("json" if re.search(r"\bjson\b", tl) else "csv")
+        m = re.search(r"\b(csv|ndjson|jsonl|json|parquet|arrow|feather)\b", tl)
+        fmt = m.group(1) if m else None  # sin formato: por la extensión del path (o csv)
+        gz = bool(re.search(r"\b(gz|gzip|comprimid[oa])\b", tl)) or None
         m = re.search(r'"([^"]+)"', t)
         out_path = m.group(1) if m else None
-        return {"action": "export", "format": fmt, "out_path": out_path}
+        return {"action": "export", "format": fmt, "gzip": gz, "out_path": out_path}
+
+    # cuota de la API: solo con una frase explícita ("cuota de youtube", "quota status")
+    if re.search(r"\b(cuota|quota)\s+(de\s+(la\s+)?(api\s+de\s+)?(youtube|yt)|(of\s+)?(youtube|yt)|status)\b", tl) \
+            or re.search(r"\b(youtube|yt)\s+quota\b", tl):
+        return {"action": "quota"}
     
     # fallback trending
     region = _pick_region(tl, default="US")
@@ -324,16 +277,15 @@ def _trigger_yt(text: str) -> dict | None:
     return {"action": "trending", "region": region, "limit": limit}
 
 # YouTube intent execution
-def run_yt_intent(intent: dict) -> str:
-    r = yt_execute_tool("yt_init", {})
-    r = _unwrap(r)
-    if r.get("error"):
-        return f"Error YouTube: {r['error']}"
+def run_yt_intent(mcp: MCPMultiplexer, intent: dict) -> str:
+    err = _yt_ensure_init(mcp)
+    if err:
+        return f"Error YouTube: {err}"
 
     act = intent.get("action")
 
     if act == "list_regions":
-        r = yt_execute_tool("yt_list_regions", {})
+        r = yt_execute_tool(mcp, "yt_list_regions", {})
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -343,9 +295,19 @@ def run_yt_intent(intent: dict) -> str:
         lines = [f"{reg.get('code')}: {reg.get('name')}" for reg in regions]
         return "Regiones disponibles:\n" + "\n".join(lines)
 
+    if act == "quota":
+        r = _unwrap(yt_execute_tool(mcp, "yt_quota_status", {}))
+        if r.get("error"):
+            return f"Error: {r['error']}"
+        lines = [f"Cuota YouTube {r.get('day')}: {r.get('used', 0)} usadas de {r.get('budget', 0)} "
+                 f"(restan {r.get('remaining', 0)})"]
+        for m, u in sorted((r.get("by_method") or {}).items()):
+            lines.append(f"- {m}: {u}")
+        return "\n".join(lines)
+
     if act == "list_categories":
         region = intent.get("region", "US")
-        r = yt_execute_tool("yt_list_categories", {"region": region})
+        r = yt_execute_tool(mcp, "yt_list_categories", {"region": region})
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -357,7 +319,7 @@ def run_yt_intent(intent: dict) -> str:
     if act == "trending":
         region = intent.get("region", "US")
         limit  = intent.get("limit", 10)
-        r = yt_execute_tool("yt_fetch_most_popular", {"region": region, "limit": limit})
+        r = yt_execute_tool(mcp, "yt_fetch_most_popular", {"region": region, "limit": limit})
         r = _unwrap(r)
 
         if r.get("error"):
@@ -376,7 +338,7 @@ def run_yt_intent(intent: dict) -> str:
         kws = intent.get("keywords", [])
         if not kws:
             return "Dime las keywords: p.ej. 'registra keywords: minecraft, free fire'"
-        r = yt_execute_tool("yt_register_keywords", {"keywords": kws})
+        r = yt_execute_tool(mcp, "yt_register_keywords", {"keywords": kws})
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -390,7 +352,7 @@ def run_yt_intent(intent: dict) -> str:
         if intent.get("region"):
             args["region"] = intent["region"]
 
-        r = yt_execute_tool("yt_search_recent", args)
+        r = yt_execute_tool(mcp, "yt_search_recent", args)
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -408,7 +370,7 @@ def run_yt_intent(intent: dict) -> str:
         return "\n".join(lines)
 
     if act == "calc":
-        r = yt_execute_tool("yt_calc_trends", {"limit": intent.get("limit", 10)})
+        r = yt_execute_tool(mcp, "yt_calc_trends", {"limit": intent.get("limit", 10)})
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -430,17 +392,17 @@ def run_yt_intent(intent: dict) -> str:
         if not kw:
             return "¿De qué keyword quieres detalles?"
 
-        r = yt_execute_tool("yt_trend_details", {"keyword": kw, "top": top})
+        r = yt_execute_tool(mcp, "yt_trend_details", {"keyword": kw, "top": top})
         r = _unwrap(r)
         items = (r or {}).get("items") or []
         if r.get("error") or not items:
-            _ = yt_execute_tool("yt_register_keywords", {"keywords": [kw]})
+            _ = yt_execute_tool(mcp, "yt_register_keywords", {"keywords": [kw]})
             search_args = {"days": 7, "per_keyword": max(10, top), "order": "viewCount"}
             if region:
                 search_args["region"] = region
-            _ = yt_execute_tool("yt_search_recent", search_args)
-            _ = yt_execute_tool("yt_calc_trends", {"limit": max(20, top)})
-            r = yt_execute_tool("yt_trend_details", {"keyword": kw, "top": top})
+            _ = yt_execute_tool(mcp, "yt_search_recent", search_args)
+            _ = yt_execute_tool(mcp, "yt_calc_trends", {"limit": max(20, top)})
+            r = yt_execute_tool(mcp, "yt_trend_details", {"keyword": kw, "top": top})
             r = _unwrap(r)
             items = (r or {}).get("items") or []
         if r.get("error"):
@@ -458,7 +420,11 @@ def run_yt_intent(intent: dict) -> str:
 
     if act == "export":
         args = {"path": intent.get("out_path")}
-        r = yt_execute_tool("yt_export_report", args)
+        if intent.get("format"):
+            args["format"] = intent["format"]
+        if intent.get("gzip"):
+            args["gzip"] = True
+        r = yt_execute_tool(mcp, "yt_export_report", args)
         r = _unwrap(r)
         if r.get("error"):
             return f"Error: {r['error']}"
@@ -469,10 +435,53 @@ def run_yt_intent(intent: dict) -> str:
     
 
 
+_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mcp_cache", "tools.json")
+
+
 class ChatService:
-    def __init__(self, *, model: str = "gpt-4o-mini", fs_dirs: List[str] | None = None, logger: JsonlLogger | None = None ):
-        self.llm = OpenAIResponsesClient(model=model)
-        servers = []
+    def __init__(self, *, model: str = "gpt-4o-mini", fs_dirs: List[str] | None = None, logger: JsonlLogger | None = None,
+                 native_tools: bool | None = None, lazy_servers: bool | None = None,
+                 servers: List[MCPServerConfig] | None = None, llm_backend=None,
+                 catalog_path: str | None = None):
+        # servers / llm_backend: reemplazan los servidores MCP y el backend del LLM (p.ej. bench_e2e.py)
+        # catalog_path: snapshot del catálogo de tools (default .mcp_cache/tools.json); con servidores
+        # de prueba conviene otro archivo para no pisar el de la sesión real
+        self.session_id = f"svc-{uuid.uuid4().hex[:12]}"
+        self.turn = 0
+        # native_tools: function calling de la Responses API (MCP_NATIVE_TOOLS=1) en vez de JSON en texto
+        if native_tools is None:
+            native_tools = os.getenv("MCP_NATIVE_TOOLS", "").strip().lower() in ("1", "true", "yes")
+        # lazy_servers: cada servidor MCP arranca en su primer call_tool (MCP_LAZY_START=1)
+        if lazy_servers is None:
+            lazy_servers = os.getenv("MCP_LAZY_START", "").strip().lower() in ("1", "true", "yes")
+        # LOG_ASYNC=1: los eventos se escriben desde un hilo de fondo (ver JsonlLogger)
+        # LOG_ROTATE_MB / LOG_COMPRESS=1: rota logs/app.jsonl en segmentos indexados (opcionalmente .gz)
+        self.logger = logger or JsonlLogger(
+            async_mode=os.getenv("LOG_ASYNC", "").strip().lower() in ("1", "true", "yes"),
+            rotate_bytes=int(float(os.getenv("LOG_ROTATE_MB", "0") or 0) * 1024 * 1024),
+            compress=os.getenv("LOG_COMPRESS", "").strip().lower() in ("1", "true", "yes"),
+        )
+        # TRACE=0 desactiva los spans (channel="trace"); ver tracing.py para convertirlos
+        if os.getenv("TRACE", "1").strip().lower() not in ("0", "false", "no"):
+            tracing.set_exporter(self._on_span)
+        self.llm = OpenAIResponsesClient(model=model, backend=llm_backend)
+        self.mcp = MCPMultiplexer(servers or self._default_servers(fs_dirs), lazy=lazy_servers,
+                                  catalog_path=catalog_path or _CATALOG_PATH, on_call=self._on_mcp_call)
+        self.mcp.start_sync() 
+        if not lazy_servers:
+            self.logger.event("mcp", "startup", servers=self.mcp.startup_report())
+        
+        if native_tools:
+            # el catálogo viaja como `tools`; el prompt de sistema queda corto
+            self.agent = MCPAgent(self.llm, self.mcp, native_tools=True, on_llm=self._on_llm_response)
+        else:
+            tools_text = _catalog_for_prompt(self.mcp)
+            # self.agent = MCPAgent(self.llm, self.mcp)
+            system_msg = tools_text + "\n\n" + DEFAULT_SYSTEM
+            self.agent = MCPAgent(self.llm, self.mcp, system_prompt=system_msg, on_llm=self._on_llm_response)
+
+    @staticmethod
+    def _default_servers(fs_dirs: List[str] | None) -> List[MCPServerConfig]:
         # filesystem
         dirs = fs_dirs or [
             r"C:\\Users\\angel\\Projects",
@@ -503,17 +512,26 @@ class ChatService:
         if os.path.isfile(GRAM_PATH):
             servers.append(MCPServerConfig(name="gram", command=sys.executable, args=[GRAM_PATH]))
 
-        self.mcp = MCPMultiplexer(servers)
-        self.mcp.start_sync() 
-        
-        tools_text = _catalog_for_prompt(self.mcp)
-        # self.agent = MCPAgent(self.llm, self.mcp)
-        system_msg = tools_text + "\n\n" + DEFAULT_SYSTEM
-        self.agent = MCPAgent(self.llm, self.mcp, system_prompt=system_msg)
-        self.logger = logger or JsonlLogger()
-    
+        return servers
 
 
+
+    # eventos con session_id/turn del turno actual (los hooks pueden llamarse desde otros hilos)
+    def _event(self, channel: str, kind: str, **kwargs):
+        self.logger.event(channel, kind, session_id=self.session_id, turn=self.turn, **kwargs)
+
+    def _on_mcp_call(self, info: Dict[str, Any]):
+        self._event("mcp", "call", **info)
+
+    def _on_llm_response(self, info: Dict[str, Any]):
+        self._event("llm", "response", response={
+            "id": info.get("id"), "duration_ms": info.get("duration_ms"),
+            "usage": info.get("usage"), "streamed": info.get("streamed"),
+        })
+
+    def _on_span(self, info: Dict[str, Any]):
+        self._event("trace", "span", **info)
+
     def list_tools(self) -> str:
         catalog = self.mcp.list_all_tools_sync()
         lines = []
@@ -523,8 +541,16 @@ class ChatService:
                 lines.append(f"- {n}: {d}")
         return "\n".join(lines)
 
-    def ask(self, user_msg: str) -> str:
-        self.logger.event(
+    def ask(self, user_msg: str, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """on_delta: callback para recibir la respuesta del agente en streaming (ver MCPAgent.run)."""
+        self.turn += 1
+        # un trace_id por turno; agente, LLM y MCP cuelgan de este span
+        with tracing.span("chat.ask", root=True, session_id=self.session_id, turn=self.turn):
+            return self._ask(user_msg, on_delta)
+
+    def _ask(self, user_msg: str, on_delta: Optional[Callable[[str], None]]) -> str:
+        t_turn = time.perf_counter()
+        self._event(
             channel="system",
             kind="info",
             info="User message",
@@ -532,63 +558,92 @@ class ChatService:
         )
 
         out = None
+        route = None
+
+        def _ms(t0: float) -> float:
+            return round((time.perf_counter() - t0) * 1000, 1)
 
         try:
             # list tools
             if re.search(r'\b(list|lista)\s+(tools|herramientas)\b', user_msg, re.I):
+                route = "list_tools"
                 out = self.list_tools()
 
             if out is None:
                 m = re.match(r'^\s*repo\s+create\s+"?([^"]+)"?(?:\s+remote=(\S+))?', user_msg.strip(), re.I)
                 if m:
+                    route = "git"
                     repo_path = m.group(1)
                     remote = m.group(2)
-                    out = create_repo_hybrid(
-                        self.mcp,
-                        repo_path=repo_path,
-                        readme_text="# README\n",
-                        commit_msg="initial commit",
-                        remote_url=remote,
-                        default_branch="main",
-                        private_remote=True,
-                    )
+                    t0 = time.perf_counter()
+                    with tracing.span("intent.git", action="repo_create"):
+                        out = create_repo_hybrid(
+                            self.mcp,
+                            repo_path=repo_path,
+                            readme_text="# README\n",
+                            commit_msg="initial commit",
+                            remote_url=remote,
+                            default_branch="main",
+                            private_remote=True,
+                        )
+                    self._event("git", "intent", intent={"action": "repo_create", "path": repo_path},
+                                result_preview=str(out)[:400], duration_ms=_ms(t0))
             
             # YouTube
             if out is None:
-                yt_int = _trigger_yt(_norm_text(user_msg))
+                t0 = time.perf_counter()
+                with tracing.span("chat.route", trigger="yt"):
+                    yt_int = _trigger_yt(_norm_text(user_msg))
                 if yt_int:
+                    route = "yt"
+                    self._event("chat", "route", route=route, duration_ms=_ms(t0))
                     print("[MCP] calling yt")
-                    out = run_yt_intent(yt_int)
-                    self.logger.event("yt", "intent", intent=yt_int, result_preview=str(out)[:400])
+                    t0 = time.perf_counter()
+                    with tracing.span("intent.yt", action=yt_int.get("action")):
+                        out = run_yt_intent(self.mcp, yt_int)
+                    self._event("yt", "intent", intent=yt_int, result_preview=str(out)[:400], duration_ms=_ms(t0))
             
 
             # zotero
             if out is None:
-                cite_int = _trigger_zotero_apa(_norm_text(user_msg))
+                t0 = time.perf_counter()
+                with tracing.span("chat.route", trigger="ztr"):
+                    cite_int = _trigger_zotero_apa(_norm_text(user_msg))
                 if cite_int:
+                    route = "ztr"
+                    self._event("chat", "route", route=route, duration_ms=_ms(t0))
                     print("[MCP] calling zotero")
-                    out = run_cite_intent(cite_int)
-                    self.logger.event("ztr", "intent", intent=cite_int, result_preview=str(out)[:400])
+                    t0 = time.perf_counter()
+                    with tracing.span("intent.ztr", action=cite_int.get("action")):
+                        out = run_cite_intent(cite_int)
+                    self._event("ztr", "intent", intent=cite_int, result_preview=str(out)[:400], duration_ms=_ms(t0))
 
 
             #grammar
             if out is None:
-                tc = _trigger_gram(user_msg)
+                t0 = time.perf_counter()
+                with tracing.span("chat.route", trigger="gram"):
+                    tc = _trigger_gram(user_msg)
                 if tc:
+                    route = "gram"
+                    self._event("chat", "route", route=route, duration_ms=_ms(t0))
                     print("[MCP] calling gram")
-                    self.logger.event("gram", "intent", intent=tc)
-                    out = self.agent.run(json.dumps(tc, ensure_ascii=False))
+                    t0 = time.perf_counter()
+                    with tracing.span("intent.gram", tool=tc.get("tool")):
+                        out = self.agent.run(json.dumps(tc, ensure_ascii=False), on_delta=on_delta)
+                    self._event("gram", "intent", intent=tc, duration_ms=_ms(t0))
             
             # Agente normal
             if out is None:
                 # print("[MCP] calling agent")
-                out = self.agent.run(user_msg)
+                route = "agent"
+                out = self.agent.run(user_msg, on_delta=on_delta)
 
             return out
 
         except Exception as e:
             out = f"ERROR: {e}"
-            self.logger.event(
+            self._event(
                 channel="chat",
                 kind="response_error",
                 error=str(e),
@@ -596,10 +651,13 @@ class ChatService:
 
         finally:
             # log de response final
-            self.logger.event(
+            self._event(
                 channel="chat",
                 kind="response",
                 answer=str(out)[:4000],
+                route=route,
+                user_message=user_msg[:200],
+                duration_ms=_ms(t_turn),
             )
 
             return out
@@ -1,9 +1,12 @@
 from __future__ import annotations
-import os, time
+import os, sys, time
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Callable, Iterator, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, OpenAI
+
+import tracing
+from llm_replay import backend_from_env
 
 load_dotenv()
 
@@ -12,19 +15,108 @@ class LlmUsage:
     input_tokens: int | None = None
     output_tokens: int | None = None
 
+def _is_transport_error(ex: BaseException) -> bool:
+    # red/timeout antes de que el servidor creara la respuesta (APITimeoutError hereda de APIConnectionError)
+    return isinstance(ex, (APIConnectionError, ConnectionError, TimeoutError))
+
+def _openai_client() -> OpenAI:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Falta OPENAI_API_KEY en el entorno")
+    return OpenAI(api_key=api_key)
+
 class OpenAIResponsesClient:
-    def __init__(self, model: str = "gpt-4o-mini"):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("Falta OPENAI_API_KEY en el entorno")
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, model: str = "gpt-4o-mini", *, backend=None):
+        """
+        backend: objeto con la forma de openai.OpenAI (.responses.create/.retrieve).
+        Por defecto se elige con LLM_BACKEND=openai|record|replay (ver llm_replay.py).
+        """
+        self.client = backend if backend is not None else backend_from_env(_openai_client)
         self.model = model
 
-    def create(self, input_parts, *, previous_response_id: Optional[str] = None, max_output_tokens: int = 700):
+    def create(self, input_parts, *, previous_response_id: Optional[str] = None, max_output_tokens: int = 700,
+               tools: Optional[list] = None):
         kwargs = dict(model=self.model, input=input_parts, max_output_tokens=max_output_tokens, store=True)
         if previous_response_id:
             kwargs["previous_response_id"] = previous_response_id
-        return self.client.responses.create(**kwargs)
+        if tools:
+            kwargs["tools"] = tools
+        with tracing.span("llm.create", model=self.model):
+            return self.client.responses.create(**kwargs)
+
+    def stream(self, input_parts, *, previous_response_id: Optional[str] = None, max_output_tokens: int = 700,
+               tools: Optional[list] = None) -> Iterator[str]:
+        """
+        Generador de deltas de texto (Responses API con stream=True).
+        Al terminar devuelve (StopIteration.value) la respuesta completa.
+        Si el streaming falla después de response.created se recupera esa misma respuesta por polling.
+        Sin id solo se reintenta con create si fue un error de transporte y aún no se emitió texto
+        (si no, el reintento cobraría dos veces y podría mostrar una segunda respuesta distinta).
+        """
+        kwargs = dict(model=self.model, input=input_parts, max_output_tokens=max_output_tokens, store=True, stream=True)
+        if previous_response_id:
+            kwargs["previous_response_id"] = previous_response_id
+        if tools:
+            kwargs["tools"] = tools
+
+        rid: Optional[str] = None
+        emitted = ""
+        final = None
+        err: Optional[Exception] = None
+        try:
+            for ev in self.client.responses.create(**kwargs):
+                et = getattr(ev, "type", "")
+                if et == "response.created":
+                    rid = getattr(getattr(ev, "response", None), "id", None)
+                elif et == "response.output_text.delta":
+                    delta = getattr(ev, "delta", "") or ""
+                    if delta:
+                        emitted += delta
+                        yield delta
+                elif et in ("response.completed", "response.incomplete", "response.failed"):
+                    final = getattr(ev, "response", None)
+                elif et == "error":
+                    raise RuntimeError(getattr(ev, "message", None) or "stream error")
+        except Exception as ex:
+            err, final = ex, None
+            print(f"[client] WARN stream falló ({type(ex).__name__}: {ex}); "
+                  f"{'recuperando ' + rid if rid else 'sin id de respuesta'}", file=sys.stderr)
+
+        if final is None:
+            # respaldo: polling sobre la respuesta ya creada, o una nueva solo si es seguro repetirla
+            if rid:
+                resp = self.retrieve(rid)
+            elif emitted or (err is not None and not _is_transport_error(err)):
+                raise err or RuntimeError("stream interrumpido sin respuesta")
+            else:
+                resp = self.create(input_parts, previous_response_id=previous_response_id,
+                                   max_output_tokens=max_output_tokens, tools=tools)
+            final = self.wait_until_ready(resp)
+            text = self.collect_text(final)
+            if text.startswith(emitted) and len(text) > len(emitted):
+                yield text[len(emitted):]
+            elif not emitted and text:
+                yield text
+        return final
+
+    def create_streaming(self, input_parts, *, previous_response_id: Optional[str] = None, max_output_tokens: int = 700,
+                         on_delta: Optional[Callable[[str], None]] = None, tools: Optional[list] = None):
+        """Igual que create + wait_until_ready, pero entrega cada delta a on_delta mientras llega."""
+        gen = self.stream(input_parts, previous_response_id=previous_response_id, max_output_tokens=max_output_tokens,
+                          tools=tools)
+        with tracing.span("llm.stream", model=self.model) as sp:
+            t0 = time.perf_counter()
+            first = True
+            while True:
+                try:
+                    delta = next(gen)
+                except StopIteration as stop:
+                    return stop.value
+                if first:
+                    sp.set(ttft_ms=round((time.perf_counter() - t0) * 1000, 1))
+                    first = False
+                if on_delta:
+                    on_delta(delta)
 
     def retrieve(self, rid: str):
         return self.client.responses.retrieve(rid)
@@ -33,12 +125,16 @@ class OpenAIResponsesClient:
         rid = resp.id
         t0 = time.time()
         status = getattr(resp, "status", None)
-        while status in ("in_progress", "queued") or status is None:
-            if time.time() - t0 > timeout:
-                break
-            time.sleep(poll_interval)
-            resp = self.client.responses.retrieve(rid)
-            status = getattr(resp, "status", None)
+        with tracing.span("llm.wait_until_ready") as sp:
+            polls = 0
+            while status in ("in_progress", "queued") or status is None:
+                if time.time() - t0 > timeout:
+                    break
+                time.sleep(poll_interval)
+                resp = self.client.responses.retrieve(rid)
+                status = getattr(resp, "status", None)
+                polls += 1
+            sp.set(polls=polls, status=status)
         return resp
 
     @staticmethod
@@ -1,7 +1,12 @@
 import asyncio
+import atexit
 import json
 import os
-from typing import List, Dict, Any
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
 
 import language_tool_python
 import mcp
@@ -18,18 +23,123 @@ class Issue:
     rule: str
     replacements: List[str]
 
-def _mk_tool(lang: str) -> language_tool_python.LanguageTool:
+def _norm_lang(lang: str) -> str:
     lang = (lang or "es").lower()
     if lang not in SUPPORTED:
         # fallback: es/en
         lang = "es" if lang.startswith("es") else "en"
+    return lang
+
+def _mk_tool(lang: str) -> language_tool_python.LanguageTool:
     #api pagada
     # return language_tool_python.LanguageToolPublicAPI(lang)
-    return language_tool_python.LanguageTool(lang)  #local
+    return language_tool_python.LanguageTool(_norm_lang(lang))  #local
+
+#  Pool de LanguageTool
+# Cada LanguageTool levanta su propio servidor Java (varios segundos), así que
+# se mantienen instancias vivas por idioma y se reutilizan entre llamadas.
+IDLE_TTL = float(os.getenv("GRAM_IDLE_TTL", "600"))      # segundos sin uso antes de cerrar
+MAX_PER_LANG = int(os.getenv("GRAM_MAX_PER_LANG", "2"))  # instancias ociosas máximas por idioma
+
+class LanguageToolPool:
+    """
+    Pool por idioma de instancias LanguageTool.
+    - acquire()/release() prestan una instancia (se crea si no hay ociosas).
+    - Las instancias ociosas más de idle_ttl segundos se cierran (hilo reaper).
+    - close_all() detiene todas las JVM; se registra con atexit.
+    """
+    def __init__(self, idle_ttl: float = IDLE_TTL, max_per_lang: int = MAX_PER_LANG):
+        self.idle_ttl = idle_ttl
+        self.max_per_lang = max(1, max_per_lang)
+        self._idle: Dict[str, List[Tuple[language_tool_python.LanguageTool, float]]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reaper: Optional[threading.Thread] = None
+        if idle_ttl > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+            self._reaper.start()
+
+    def acquire(self, lang: str) -> language_tool_python.LanguageTool:
+        lang = _norm_lang(lang)
+        with self._lock:
+            idle = self._idle.get(lang)
+            if idle:
+                tool, _ = idle.pop()
+                return tool
+        return _mk_tool(lang)
+
+    def release(self, lang: str, tool: language_tool_python.LanguageTool) -> None:
+        lang = _norm_lang(lang)
+        with self._lock:
+            idle = self._idle.setdefault(lang, [])
+            if not self._closed and len(idle) < self.max_per_lang:
+                idle.append((tool, time.monotonic()))
+                return
+        _close_tool(tool)
+
+    @contextmanager
+    def borrow(self, lang: str):
+        tool = self.acquire(lang)
+        try:
+            yield tool
+        except Exception:
+            # la instancia puede haber quedado en mal estado; no se devuelve al pool
+            _close_tool(tool)
+            raise
+        else:
+            self.release(lang, tool)
+
+    def prewarm(self, langs: List[str]) -> None:
+        for lang in langs:
+            lang = _norm_lang(lang)
+            with self._lock:
+                if self._idle.get(lang):
+                    continue
+            t0 = time.perf_counter()
+            self.release(lang, _mk_tool(lang))
+            print(f"[grammarMCP] LanguageTool '{lang}' listo en {time.perf_counter() - t0:.1f}s", file=sys.stderr, flush=True)
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        stale: List[language_tool_python.LanguageTool] = []
+        with self._lock:
+            for lang, idle in self._idle.items():
+                keep = [(t, ts) for (t, ts) in idle if now - ts < self.idle_ttl]
+                stale.extend(t for (t, ts) in idle if now - ts >= self.idle_ttl)
+                self._idle[lang] = keep
+        for t in stale:
+            _close_tool(t)
+        return len(stale)
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._closed = True
+            tools = [t for idle in self._idle.values() for (t, _) in idle]
+            self._idle.clear()
+        for t in tools:
+            _close_tool(t)
+
+    def _reap_loop(self) -> None:
+        interval = max(1.0, min(60.0, self.idle_ttl / 2))
+        while not self._closed:
+            time.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"[grammarMCP] WARN evict: {e}", file=sys.stderr, flush=True)
+
+def _close_tool(tool) -> None:
+    try:
+        tool.close()
+    except Exception:
+        pass
+
+_POOL = LanguageToolPool()
+atexit.register(_POOL.close_all)
 
 def _check_text(text: str, lang: str) -> List[Issue]:
-    tool = _mk_tool(lang)
-    matches = tool.check(text or "")
+    with _POOL.borrow(lang) as tool:
+        matches = tool.check(text or "")
     out: List[Issue] = []
     for m in matches:
         out.append(Issue(
@@ -109,5 +219,12 @@ def gram_fix_file(path: str, lang: str = "es", backup: bool = True) -> Dict[str,
     }
 
 if __name__ == "__main__":
+    # GRAM_PREWARM="es,en" levanta esas JVM antes de atender la primera llamada
+    prewarm = [l.strip() for l in os.getenv("GRAM_PREWARM", "").split(",") if l.strip()]
+    if prewarm:
+        _POOL.prewarm(prewarm)
     # stdio server
-    APPmcp.run()
+    try:
+        APPmcp.run()
+    finally:
+        _POOL.close_all()
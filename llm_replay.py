@@ -0,0 +1,213 @@
+# Backends grabar/reproducir para OpenAIResponsesClient (benchmarks y pruebas sin red)
+#   LLM_BACKEND=record  -> llama a OpenAI y guarda cada request/response en LLM_CASSETTE
+#   LLM_BACKEND=replay  -> sirve las respuestas grabadas desde disco, sin red ni API key
+#   LLM_CASSETTE=logs/llm_cassette.jsonl
+#   LLM_REPLAY_LATENCY_MS=<ms>      latencia fija por llamada (si no, la grabada)
+#   LLM_REPLAY_LATENCY_SCALE=<f>    factor sobre la latencia grabada (0 = sin esperas)
+#
+# Un backend expone la misma forma que openai.OpenAI: .responses.create(**kw) / .responses.retrieve(id).
+# Cada línea del cassette es {"key","request","response"|"events","duration_ms"}; la key es un hash
+# del request sin `store`, así que el mismo turno repetido produce la misma key.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+DEFAULT_CASSETTE = os.path.join("logs", "llm_cassette.jsonl")
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    req = {k: v for k, v in kwargs.items() if k != "store"}
+    raw = json.dumps(req, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _dump(obj: Any) -> Any:
+    """Objeto del SDK (pydantic) -> dict JSON; conserva output_text, que es una propiedad."""
+    if hasattr(obj, "model_dump"):
+        try:
+            d = obj.model_dump(mode="json")
+        except TypeError:
+            d = obj.model_dump()
+    elif isinstance(obj, dict):
+        d = dict(obj)
+    else:
+        d = {k: v for k, v in vars(obj).items() if not k.startswith("_")}
+    txt = getattr(obj, "output_text", None)
+    if isinstance(txt, str) and "output_text" not in d:
+        d["output_text"] = txt
+    return d
+
+
+def _obj(x: Any) -> Any:
+    """dict grabado -> objeto con acceso por atributo (lo que esperan agent.py y client.py)."""
+    if isinstance(x, dict):
+        return SimpleNamespace(**{k: _obj(v) for k, v in x.items()})
+    if isinstance(x, list):
+        return [_obj(v) for v in x]
+    return x
+
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+class _Backend:
+    """Envoltorio con la forma de openai.OpenAI (client.responses.create / retrieve)."""
+    def __init__(self):
+        self.responses = self
+
+
+#  record
+
+class RecordingBackend(_Backend):
+    def __init__(self, client, path: str = DEFAULT_CASSETTE):
+        super().__init__()
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def _save(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def create(self, **kwargs):
+        t0 = time.perf_counter()
+        out = self.client.responses.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(kwargs, out, t0)
+        self._save({"key": request_key(kwargs), "request": kwargs, "response": _dump(out), "duration_ms": _ms(t0)})
+        return out
+
+    def _record_stream(self, kwargs: Dict[str, Any], stream, t0: float) -> Iterator[Any]:
+        events: List[Dict[str, Any]] = []
+        for ev in stream:
+            events.append({"t_ms": _ms(t0), "event": _dump(ev)})
+            yield ev
+        self._save({"key": request_key(kwargs), "request": kwargs, "events": events, "duration_ms": _ms(t0)})
+
+    def retrieve(self, rid: str):
+        t0 = time.perf_counter()
+        out = self.client.responses.retrieve(rid)
+        self._save({"key": f"retrieve:{rid}", "response": _dump(out), "duration_ms": _ms(t0)})
+        return out
+
+
+#  replay
+
+class ReplayBackend(_Backend):
+    """
+    Sirve las respuestas grabadas en orden por key; si un mismo request se grabó varias veces
+    se devuelven en secuencia (la última se repite al agotarse). Un request no grabado es error.
+    """
+    def __init__(self, path: str = DEFAULT_CASSETTE, *, latency_ms: Optional[float] = None,
+                 latency_scale: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.latency_ms = latency_ms
+        self.latency_scale = max(0.0, float(latency_scale))
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"No existe el cassette de LLM: {self.path}")
+        with open(self.path, "r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    e = json.loads(raw)
+                except Exception:
+                    continue
+                key = e.get("key")
+                if not key:
+                    continue
+                self._entries.setdefault(key, deque()).append(e)
+                resp = e.get("response")
+                if resp is None:
+                    # respuesta final del stream (response.completed)
+                    for ev in reversed(e.get("events") or []):
+                        r = (ev.get("event") or {}).get("response")
+                        if isinstance(r, dict) and r.get("status") not in ("in_progress", "queued"):
+                            resp = r
+                            break
+                if isinstance(resp, dict) and resp.get("id"):
+                    self._by_id[resp["id"]] = resp
+
+    def _next(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            q = self._entries.get(key)
+            if not q:
+                raise RuntimeError(f"replay: no hay respuesta grabada para el request {key} ({self.path})")
+            self.calls += 1
+            return q.popleft() if len(q) > 1 else q[0]
+
+    def _delay(self, recorded_ms: Optional[float]) -> float:
+        if self.latency_ms is not None:
+            return max(0.0, self.latency_ms) / 1000.0
+        return float(recorded_ms or 0) * self.latency_scale / 1000.0
+
+    def create(self, **kwargs):
+        e = self._next(request_key(kwargs))
+        if kwargs.get("stream"):
+            return self._replay_stream(e)
+        time.sleep(self._delay(e.get("duration_ms")))
+        return _obj(e.get("response") or {})
+
+    def _replay_stream(self, e: Dict[str, Any]) -> Iterator[Any]:
+        events = e.get("events") or []
+        total = self._delay(e.get("duration_ms"))
+        recorded = float(e.get("duration_ms") or 0)
+        t0 = time.perf_counter()
+        for i, ev in enumerate(events):
+            # reproduce el ritmo grabado (ttft + deltas), reescalado a la latencia total pedida
+            if recorded > 0:
+                at = total * float(ev.get("t_ms") or 0) / recorded
+            else:
+                at = total * (i + 1) / max(1, len(events))
+            wait = at - (time.perf_counter() - t0)
+            if wait > 0:
+                time.sleep(wait)
+            yield _obj(ev.get("event") or {})
+
+    def retrieve(self, rid: str):
+        key = f"retrieve:{rid}"
+        if key in self._entries:
+            e = self._next(key)
+            time.sleep(self._delay(e.get("duration_ms")))
+            return _obj(e.get("response") or {})
+        resp = self._by_id.get(rid)
+        if resp is None:
+            raise RuntimeError(f"replay: no hay respuesta grabada con id {rid}")
+        return _obj(resp)
+
+
+def backend_from_env(make_client) -> Any:
+    """
+    Backend según LLM_BACKEND (openai | record | replay). make_client() construye el
+    cliente real de OpenAI; en replay no se llama (no hace falta red ni API key).
+    """
+    mode = (os.getenv("LLM_BACKEND") or "openai").strip().lower()
+    path = os.getenv("LLM_CASSETTE") or DEFAULT_CASSETTE
+    if mode == "replay":
+        lat = os.getenv("LLM_REPLAY_LATENCY_MS")
+        return ReplayBackend(
+            path,
+            latency_ms=float(lat) if lat not in (None, "") else None,
+            latency_scale=float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1") or 1),
+        )
+    if mode == "record":
+        return RecordingBackend(make_client(), path)
+    if mode not in ("openai", ""):
+        raise ValueError(f"LLM_BACKEND desconocido: {mode} (usa openai, record o replay)")
+    return make_client()
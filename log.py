@@ -1,11 +1,14 @@
 # logs que se encuentran en la carpeta logs como app.jsonl
-import os, json, uuid, datetime as dt
-from typing import Any, Dict, Optional
+import os, sys, json, uuid, queue, threading, time, atexit, gzip, shutil, datetime as dt
+from typing import Any, Dict, List, Optional
 
 def _utcnow():
     return dt.datetime.utcnow().isoformat() + "Z"
 
 
+_STOP = object()  # centinela para el hilo de escritura
+
+
 def _redact(x: Any):
     if isinstance(x, dict):
         return {k: ("***" if k.lower() in {"api_key","authorization","developerkey","token"} else _redact(v))
@@ -43,22 +46,279 @@ def _to_jsonable(x: Any):
     # Fallback: string
     return str(x)
 
+
+#  Redacción + conversión en una sola pasada
+# Equivale a _to_jsonable(_redact(x)), pero recorre cada evento una sola vez (también redacta
+# dentro de objetos pydantic), elige el handler por tipo desde una caché y corta por
+# profundidad / tamaño para que una observación enorme no se copie entera.
+_REDACT_KEYS = frozenset({"api_key", "authorization", "developerkey", "token"})
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+class _Caps:
+    __slots__ = ("max_depth", "max_items", "max_str")
+
+    def __init__(self, max_depth: int = 32, max_items: int = 5000, max_str: int = 200_000):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_str = max_str
+
+def _j_prim(x, caps: _Caps, depth: int):
+    return x
+
+def _j_str(x, caps: _Caps, depth: int):
+    if len(x) > caps.max_str:
+        return x[:caps.max_str] + f"...<+{len(x) - caps.max_str} chars>"
+    return x
+
+_SCALARS = frozenset({int, float, bool, type(None)})  # se copian tal cual, sin pasar por el dispatch
+
+def _j_items(items, caps: _Caps, depth: int) -> Dict[Any, Any]:
+    out = {}
+    max_items = caps.max_items
+    for i, (k, v) in enumerate(items):
+        if i >= max_items:
+            out["<truncated>"] = True
+            break
+        if k.__class__ is str and k.lower() in _REDACT_KEYS:
+            out[k] = "***"
+        elif v.__class__ in _SCALARS:
+            out[k] = v
+        else:
+            out[k] = _jsonable(v, caps, depth + 1)
+    return out
+
+def _j_dict(x, caps: _Caps, depth: int):
+    return _j_items(x.items(), caps, depth)
+
+def _j_seq(x, caps: _Caps, depth: int):
+    out = []
+    max_items = caps.max_items
+    for i, v in enumerate(x):
+        if i >= max_items:
+            out.append(f"<+{len(x) - max_items} items>")
+            break
+        out.append(v if v.__class__ in _SCALARS else _jsonable(v, caps, depth + 1))
+    return out
+
+def _j_model(x, caps: _Caps, depth: int):
+    try:
+        return _j_items(x.model_dump().items(), caps, depth)
+    except Exception:
+        return _j_obj(x, caps, depth)
+
+def _j_obj(x, caps: _Caps, depth: int):
+    if hasattr(x, "__dict__"):
+        try:
+            return _j_items(((k, v) for k, v in vars(x).items() if not k.startswith("_")), caps, depth)
+        except Exception:
+            pass
+    return _j_str(str(x), caps, depth)
+
+_HANDLERS: Dict[type, Any] = {}
+
+def _handler_for(tp: type):
+    h = _HANDLERS.get(tp)
+    if h is None:
+        if issubclass(tp, str):
+            h = _j_str
+        elif issubclass(tp, _PRIMITIVES):
+            h = _j_prim
+        elif issubclass(tp, dict):
+            h = _j_dict
+        elif issubclass(tp, (list, tuple, set, frozenset)):
+            h = _j_seq
+        elif callable(getattr(tp, "model_dump", None)):
+            h = _j_model
+        else:
+            h = _j_obj
+        _HANDLERS[tp] = h
+    return h
+
+def _jsonable(x: Any, caps: _Caps, depth: int = 0):
+    if depth > caps.max_depth:
+        return "<max depth>"
+    return _handler_for(type(x))(x, caps, depth)
+
+_DEFAULT_CAPS = _Caps()
+
+def to_log_json(x: Any, caps: Optional[_Caps] = None):
+    """Redacta y convierte a tipos JSON en una sola pasada."""
+    return _jsonable(x, caps or _DEFAULT_CAPS)
+
 class JsonlLogger:
-    def __init__(self, path: str = "logs/app.jsonl", log_text: bool = True):
+    """
+    Logger JSONL. Modo síncrono (por defecto): cada write serializa, escribe y hace flush.
+    Modo async_mode=True: write solo encola; un hilo de fondo serializa y escribe en lotes.
+      - queue_size: tamaño máximo de la cola.
+      - on_full: "drop" descarta el evento (cuenta en self.dropped) o "block" espera lugar.
+      - si escribir un lote falla, sus eventos se pierden: se cuentan en self.write_failed y se avisa por stderr.
+      - flush_interval: segundos máximos entre flush (0 = flush por cada lote).
+      - fsync: además de flush, os.fsync tras cada flush.
+    close() (también registrado con atexit) vacía la cola antes de cerrar el archivo.
+    Cada evento se redacta y convierte en una sola pasada (max_depth / max_items / max_str la acotan).
+    Rotación: con rotate_bytes y/o rotate_seconds el archivo activo se cierra como segmento
+    (app.<fecha>.jsonl, o .jsonl.gz con compress=True) con un índice sidecar .idx.json
+    (ver build_segment_index / read_session).
+    """
+    def __init__(self, path: str = "logs/app.jsonl", log_text: bool = True, *,
+                 async_mode: bool = False, queue_size: int = 10000, on_full: str = "drop",
+                 flush_interval: float = 0.5, fsync: bool = False, batch_size: int = 256,
+                 rotate_bytes: int = 0, rotate_seconds: float = 0, compress: bool = False,
+                 max_depth: int = 32, max_items: int = 5000, max_str: int = 200_000):
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
         self.f = open(path, "a", encoding="utf-8")
+        self.caps = _Caps(max_depth, max_items, max_str)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self._size = os.path.getsize(path)
+        self._opened_at = time.time()
+        self._finalizers: List[threading.Thread] = []
         self.log_text = log_text
+        self.async_mode = async_mode
+        self.on_full = on_full
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+        self.write_failed = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._q: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        if async_mode:
+            self._q = queue.Queue(maxsize=max(1, queue_size))
+            self._worker = threading.Thread(target=self._drain_loop, name="jsonl-logger", daemon=True)
+            self._worker.start()
+        atexit.register(self.close)
 
-    def write(self, event: Dict[str, Any]):
-        ev = _redact(event)
+    def _serialize(self, event: Dict[str, Any]) -> str:
+        ev = _jsonable(event, self.caps)
         if not self.log_text:
             if "request" in ev and isinstance(ev["request"], dict):
                 ev["request"]["text"] = "<omitted>"
             if "response" in ev and isinstance(ev["response"], dict):
                 ev["response"]["text"] = "<omitted>"
-        json.dump(_to_jsonable(ev), self.f, ensure_ascii=False)
-        self.f.write("\n")
+        return json.dumps(ev, ensure_ascii=False)
+
+    def _flush(self):
         self.f.flush()
+        if self.fsync:
+            os.fsync(self.f.fileno())
+
+    def write(self, event: Dict[str, Any]):
+        if self._closed:
+            return
+        if self._q is None:
+            line = self._serialize(event)
+            with self._lock:
+                self._append(line + "\n")
+                self._flush()
+            return
+        if self.on_full == "block":
+            self._q.put(event)
+            return
+        try:
+            self._q.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        lines = []
+        for ev in batch:
+            try:
+                lines.append(self._serialize(ev))
+            except Exception as e:
+                lines.append(json.dumps({"ts": _utcnow(), "channel": "system", "kind": "error",
+                                         "error": f"log serialize failed: {e}"}))
+        with self._lock:
+            self._append("\n".join(lines) + "\n")
+
+    def _append(self, text: str):
+        """Escribe en el segmento activo y rota si corresponde (llamar con self._lock tomado)."""
+        self.f.write(text)
+        self._size += len(text.encode("utf-8"))
+        if (self.rotate_bytes and self._size >= self.rotate_bytes) or \
+                (self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds):
+            self._rotate()
+
+    def _rotate(self):
+        self._flush()
+        self.f.close()
+        base, ext = os.path.splitext(self.path)
+        stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        seg = f"{base}.{stamp}{ext}"
+        n = 1
+        while os.path.exists(seg) or os.path.exists(seg + ".gz"):
+            seg = f"{base}.{stamp}-{n}{ext}"
+            n += 1
+        os.replace(self.path, seg)
+        self.f = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+        self._opened_at = time.time()
+        # índice (+ gzip) fuera del camino de escritura
+        t = threading.Thread(target=finalize_segment, args=(seg, self.compress), name="jsonl-segment")
+        t.start()
+        self._finalizers = [f for f in self._finalizers if f.is_alive()] + [t]
+
+    def _drain_loop(self):
+        last_flush = time.monotonic()
+        pending = False
+        while True:
+            timeout = self.flush_interval if pending and self.flush_interval > 0 else None
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            batch = [] if item is None or stop else [item]
+            # juntar lo que ya esté encolado
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    nxt = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                    pending = True
+                except Exception as e:
+                    self.write_failed += len(batch)
+                    print(f"[log] WARN no se pudo escribir un lote de {len(batch)} eventos en {self.path}: {e} "
+                          f"(perdidos en total: {self.write_failed})", file=sys.stderr)
+            now = time.monotonic()
+            if pending and (stop or self.flush_interval <= 0 or now - last_flush >= self.flush_interval):
+                try:
+                    with self._lock:
+                        self._flush()
+                except Exception as e:
+                    print(f"[log] WARN flush falló en {self.path}: {e}", file=sys.stderr)
+                pending = False
+                last_flush = now
+            if stop:
+                return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)  # si no, atexit retiene el logger (y su archivo) hasta salir
+        if self._q is not None and self._worker is not None:
+            self._q.put(_STOP)  # bloquea si está llena: garantiza el drenaje
+            self._worker.join()
+        try:
+            with self._lock:
+                self._flush()
+                self.f.close()
+        except Exception:
+            pass
+        for t in self._finalizers:
+            t.join()
 
     def event(self, channel: str, kind: str, session_id: Optional[str] = None,
               turn: Optional[int] = None, **kwargs):
@@ -72,3 +332,132 @@ class JsonlLogger:
         }
         e.update(kwargs)
         self.write(e)
+
+
+#  Segmentos e índices
+# Índice sidecar <segmento>.idx.json:
+#   {"segment": nombre, "compressed": bool, "bytes": n, "lines": n, "ts": [primero, último],
+#    "sessions": {session_id: {"ts": [..], "turns": [min, max], "ranges": [[ini, fin), ...]}}}
+# Los offsets son del JSONL sin comprimir (con .gz, gzip.seek los resuelve descomprimiendo hacia adelante).
+
+def _session_key(sid: Any) -> str:
+    return "" if sid is None else str(sid)
+
+def build_segment_index(seg_path: str) -> Dict[str, Any]:
+    """Recorre un segmento JSONL (sin comprimir) una vez y arma su índice por session_id."""
+    sessions: Dict[str, Dict[str, Any]] = {}
+    first_ts = last_ts = None
+    offset = lines = 0
+    with open(seg_path, "rb") as f:
+        for raw in f:
+            start, offset = offset, offset + len(raw)
+            lines += 1
+            try:
+                ev = json.loads(raw)
+            except Exception:
+                continue
+            if not isinstance(ev, dict):
+                continue
+            ts = ev.get("ts")
+            if ts:
+                first_ts = first_ts or ts
+                last_ts = ts
+            info = sessions.setdefault(_session_key(ev.get("session_id")), {"ts": [ts, ts], "turns": [None, None], "ranges": []})
+            if ts:
+                info["ts"][0] = info["ts"][0] or ts
+                info["ts"][1] = ts
+            turn = ev.get("turn")
+            if isinstance(turn, int):
+                lo, hi = info["turns"]
+                info["turns"] = [turn if lo is None else min(lo, turn), turn if hi is None else max(hi, turn)]
+            rng = info["ranges"]
+            if rng and rng[-1][1] == start:
+                rng[-1][1] = offset
+            else:
+                rng.append([start, offset])
+    return {"segment": os.path.basename(seg_path), "compressed": False, "bytes": offset,
+            "lines": lines, "ts": [first_ts, last_ts], "sessions": sessions}
+
+def finalize_segment(seg_path: str, compress: bool = False) -> str:
+    """Indexa un segmento cerrado y opcionalmente lo comprime. Devuelve la ruta final del segmento."""
+    try:
+        idx = build_segment_index(seg_path)
+        final = seg_path
+        if compress:
+            final = seg_path + ".gz"
+            with open(seg_path, "rb") as src, gzip.open(final + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(final + ".tmp", final)
+            os.remove(seg_path)
+            idx["segment"] = os.path.basename(final)
+            idx["compressed"] = True
+        tmp = final + ".idx.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(idx, f, ensure_ascii=False)
+        os.replace(tmp, final + ".idx.json")
+        return final
+    except Exception as e:
+        print(f"[log] WARN no se pudo finalizar el segmento {seg_path}: {e}", file=sys.stderr)
+        return seg_path
+
+def iter_segments(path: str = "logs/app.jsonl") -> List[str]:
+    """Segmentos rotados (en orden cronológico) seguidos del archivo activo."""
+    d = os.path.dirname(path) or "."
+    base, ext = os.path.splitext(os.path.basename(path))
+    segs = []
+    if os.path.isdir(d):
+        for name in os.listdir(d):
+            if name.startswith(base + ".") and (name.endswith(ext) or name.endswith(ext + ".gz")) \
+                    and name != os.path.basename(path):
+                segs.append(os.path.join(d, name))
+    segs.sort()
+    if os.path.isfile(path):
+        segs.append(path)
+    return segs
+
+def open_segment(seg: str):
+    return gzip.open(seg, "rb") if seg.endswith(".gz") else open(seg, "rb")
+
+def read_session(path: str = "logs/app.jsonl", session_id: Optional[str] = None, *,
+                 turn: Optional[int] = None):
+    """
+    Genera los eventos de una sesión (y opcionalmente un turno) leyendo solo los rangos del índice.
+    Segmentos sin índice (p.ej. el activo) se recorren completos.
+    """
+    key = _session_key(session_id)
+    for seg in iter_segments(path):
+        idx = None
+        if os.path.isfile(seg + ".idx.json"):
+            try:
+                with open(seg + ".idx.json", "r", encoding="utf-8") as f:
+                    idx = json.load(f)
+            except Exception:
+                idx = None
+        if idx is not None:
+            info = idx.get("sessions", {}).get(key)
+            if not info:
+                continue
+            lo, hi = info.get("turns") or [None, None]
+            if turn is not None and lo is not None and not (lo <= turn <= hi):
+                continue
+            ranges = info.get("ranges", [])
+        else:
+            ranges = None
+        with open_segment(seg) as f:
+            chunks = ((s, e) for s, e in ranges) if ranges is not None else [(0, None)]
+            for start, end in chunks:
+                f.seek(start)
+                pos = start
+                for raw in f:
+                    if end is not None and pos >= end:
+                        break
+                    pos += len(raw)
+                    try:
+                        ev = json.loads(raw)
+                    except Exception:
+                        continue
+                    if not isinstance(ev, dict) or _session_key(ev.get("session_id")) != key:
+                        continue
+                    if turn is not None and ev.get("turn") != turn:
+                        continue
+                    yield ev
@@ -0,0 +1,168 @@
+# Analítica de latencia por etapa sobre los logs JSONL (logs/app.jsonl + segmentos rotados)
+# uso: python log_stats.py [--path logs/app.jsonl] [--json] [--top 10] [--session ID]
+#
+# Recorre los eventos en streaming con memoria constante: los percentiles salen de un
+# histograma logarítmico (error relativo ~2.5%) y los turnos más lentos de un heap de tamaño fijo.
+import argparse
+import heapq
+import json
+import math
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from log import iter_segments, open_segment
+
+_GROWTH = 1.05  # ancho relativo de cada bucket
+
+
+class LatencyHist:
+    """Histograma logarítmico de latencias (ms): count/sum/min/max exactos, percentiles aproximados."""
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, ms: float):
+        ms = max(0.0, float(ms))
+        b = -1 if ms < 1.0 else int(math.log(ms, _GROWTH))
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen > rank:
+                if b < 0:
+                    return min(self.max, 1.0)
+                # punto medio geométrico del bucket, acotado al rango observado
+                mid = _GROWTH ** (b + 0.5)
+                return max(self.min, min(self.max, mid))
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "p50": round(self.quantile(0.50), 1),
+            "p95": round(self.quantile(0.95), 1),
+            "p99": round(self.quantile(0.99), 1),
+            "max": round(self.max, 1) if self.count else 0.0,
+            "mean": round(self.total / self.count, 1) if self.count else 0.0,
+        }
+
+
+def iter_events(path: str) -> Iterator[Dict[str, Any]]:
+    for seg in iter_segments(path):
+        with open_segment(seg) as f:
+            for raw in f:
+                try:
+                    ev = json.loads(raw)
+                except Exception:
+                    continue
+                if isinstance(ev, dict):
+                    yield ev
+
+
+def _stage_of(ev: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    """(etapa, duration_ms) para los eventos que traen latencia."""
+    ch, kind = ev.get("channel"), ev.get("kind")
+    if ch == "llm" and kind == "response":
+        resp = ev.get("response") or {}
+        return "llm", resp.get("duration_ms")
+    if ch == "mcp" and kind == "call":
+        return f"mcp:{ev.get('server')}:{ev.get('tool')}", ev.get("duration_ms")
+    if kind == "intent":
+        return f"intent:{ch}", ev.get("duration_ms")
+    if ch == "chat" and kind == "route":
+        return "routing", ev.get("duration_ms")
+    if ch == "chat" and kind == "response":
+        return "turn", ev.get("duration_ms")
+    return None
+
+
+def analyze(path: str, *, top: int = 10, session_id: Optional[str] = None) -> Dict[str, Any]:
+    stages: Dict[str, LatencyHist] = {}
+    tokens = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "responses": 0}
+    slow: List[Tuple[float, int, Dict[str, Any]]] = []  # min-heap de tamaño `top`
+    events = 0
+
+    for n, ev in enumerate(iter_events(path)):
+        if session_id is not None and ev.get("session_id") != session_id:
+            continue
+        events += 1
+        st = _stage_of(ev)
+        if st is None:
+            continue
+        stage, ms = st
+        if isinstance(ms, (int, float)):
+            stages.setdefault(stage, LatencyHist()).add(ms)
+        if stage == "llm":
+            usage = (ev.get("response") or {}).get("usage") or {}
+            if isinstance(usage, dict):
+                tokens["responses"] += 1
+                for k in ("input_tokens", "output_tokens", "total_tokens"):
+                    if isinstance(usage.get(k), int):
+                        tokens[k] += usage[k]
+        if stage == "turn" and isinstance(ms, (int, float)):
+            item = (float(ms), n, {
+                "ts": ev.get("ts"), "session_id": ev.get("session_id"), "turn": ev.get("turn"),
+                "route": ev.get("route"), "duration_ms": ms,
+                "user_message": (ev.get("user_message") or "")[:80],
+            })
+            if len(slow) < top:
+                heapq.heappush(slow, item)
+            elif item[0] > slow[0][0]:
+                heapq.heapreplace(slow, item)
+
+    return {
+        "events": events,
+        "stages": {k: stages[k].summary() for k in sorted(stages)},
+        "tokens": tokens,
+        "slowest_turns": [it[2] for it in sorted(slow, key=lambda x: -x[0])],
+    }
+
+
+def _print_table(rep: Dict[str, Any]):
+    print(f"eventos: {rep['events']}")
+    print()
+    hdr = f"{'etapa':<42} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(hdr)
+    print("-" * len(hdr))
+    for stage, s in rep["stages"].items():
+        print(f"{stage[:42]:<42} {s['count']:>6} {s['p50']:>9.1f} {s['p95']:>9.1f} {s['p99']:>9.1f} {s['max']:>9.1f}")
+    t = rep["tokens"]
+    print()
+    print(f"tokens: input={t['input_tokens']} output={t['output_tokens']} total={t['total_tokens']} "
+          f"(respuestas LLM: {t['responses']})")
+    if rep["slowest_turns"]:
+        print()
+        print("turnos más lentos:")
+        for it in rep["slowest_turns"]:
+            print(f"  {it['duration_ms']:>9.1f} ms  {it['ts']}  {it['session_id']}#{it['turn']}  "
+                  f"[{it['route']}] {it['user_message']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencias por etapa (p50/p95/p99), tokens y turnos más lentos.")
+    ap.add_argument("--path", default="logs/app.jsonl")
+    ap.add_argument("--top", type=int, default=10, help="cantidad de turnos lentos a mostrar")
+    ap.add_argument("--session", default=None, help="filtrar por session_id")
+    ap.add_argument("--json", action="store_true", help="salida JSON en vez de tabla")
+    a = ap.parse_args()
+
+    rep = analyze(a.path, top=a.top, session_id=a.session)
+    if a.json:
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+    else:
+        _print_table(rep)
+
+
+if __name__ == "__main__":
+    main()
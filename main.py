@@ -15,8 +15,16 @@ def main():
             if q.upper() in ("SALIR", "QUIT", "EXIT"):
                 break
             try:
-                ans = svc.ask(q)
-                print(ans)
+                streamed = []
+                def _on_delta(d: str):
+                    streamed.append(d)
+                    print(d, end="", flush=True)
+                ans = svc.ask(q, on_delta=_on_delta)
+                if streamed:
+                    print()
+                # si lo que salió en streaming no es la respuesta final (p.ej. resultado de tool), imprimirla
+                if "".join(streamed).strip() != str(ans).strip():
+                    print(ans)
             except Exception as e:
                 print("Error:", e)
 
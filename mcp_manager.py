@@ -1,12 +1,13 @@
 from __future__ import annotations
-import os, json, asyncio, threading
-from contextlib import AsyncExitStack
+import os, json, asyncio, threading, time, shutil, hashlib, inspect, contextvars
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Callable, Dict, List, Tuple, Optional, Any
 
 from mcp.client.stdio import stdio_client, StdioServerParameters
 from mcp import ClientSession
 
+import tracing
+
 @dataclass
 class MCPServerConfig:
     name: str
@@ -112,6 +113,8 @@ def _normalize_yt_args(tool: str, args: dict) -> tuple[str, dict]:
             a["order"] = "viewCount"
         if "region" in a and a["region"]:
             a["region"] = _upper_region(a["region"]) or "US"
+        if a.get("workers") is not None:
+            a["workers"] = max(1, min(16, int(a["workers"])))
         return tool, a
 
     if tool in ("yt_calc_trends", "yt:yt_calc_trends"):
@@ -133,18 +136,108 @@ def _normalize_yt_args(tool: str, args: dict) -> tuple[str, dict]:
     # Por defecto, pásalo tal cual
     return tool, a
 
+#  Catálogo de tools (memoria + snapshot en disco)
+def _server_fingerprint(cfg: MCPServerConfig) -> str:
+    """Clave del servidor: comando + args + (mtime, tamaño) de los archivos que aparezcan en ellos."""
+    parts = [cfg.command, *cfg.args, cfg.cwd or ""]
+    for p in [shutil.which(cfg.command) or cfg.command, *cfg.args]:
+        try:
+            if os.path.isfile(p):
+                st = os.stat(p)
+                parts.append(f"{p}:{st.st_mtime_ns}:{st.st_size}")
+        except Exception:
+            pass
+    return hashlib.sha1("\x00".join(parts).encode("utf-8", "ignore")).hexdigest()
+
+class ToolCatalogCache:
+    """
+    Catálogo por servidor {name: {"key", "version", "tools"}} en memoria, con snapshot JSON en disco.
+    Una entrada vale si coincide la huella del servidor (y la versión que reporta, cuando ya se conoce).
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._entries = data
+            except Exception as e:
+                print(f"[MCP] WARN catálogo en disco ilegible ({path}): {e}")
+
+    def get(self, name: str, key: str, version: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        e = self._entries.get(name)
+        if not e or e.get("key") != key:
+            return None
+        if version is not None and e.get("version") != version:
+            return None
+        return e.get("tools")
+
+    def put(self, name: str, key: str, version: Optional[str], tools: List[Dict[str, Any]]) -> None:
+        self._entries[name] = {"key": key, "version": version, "tools": tools, "ts": time.time()}
+        self._save()
+
+    def check_version(self, name: str, version: Optional[str]) -> None:
+        e = self._entries.get(name)
+        if e and version is not None and e.get("version") not in (None, version):
+            self.invalidate(name)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+        self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[MCP] WARN no se pudo guardar el catálogo ({self.path}): {e}")
+
+async def _with_context(ctx: contextvars.Context, coro):
+    """El loop vive en otro hilo: copia los contextvars del llamador (traza/span actual) a la tarea."""
+    for var, val in ctx.items():
+        var.set(val)
+    return await coro
+
+_TOOLS_CHANGED = "notifications/tools/list_changed"
+_SESSION_HAS_MESSAGE_HANDLER = "message_handler" in inspect.signature(ClientSession.__init__).parameters
+
 #  Multiplexer
 class MCPMultiplexer:
     """
     Arranca cada servidor MCP una sola vez.
-    Mantiene ClientSession y procesos vivos en un AsyncExitStack.
-    todos los llamados a async corren en un loop dedicado en un hilo.
+    Cada servidor vive en su propia tarea (stdio_client + ClientSession) dentro de un
+    loop dedicado en un hilo; los servidores arrancan en paralelo y, con lazy=True,
+    recién en su primer call_tool. Un servidor que falla no bloquea a los demás.
+    El catálogo de tools se cachea (ToolCatalogCache); con catalog_path se guarda en disco
+    y se invalida con notifications/tools/list_changed o si cambia el binario/versión.
     Los wrappers sync envían corutinas a ese loop (sin abrir loops nuevos).
     """
-    def __init__(self, servers: List[MCPServerConfig]):
+    def __init__(self, servers: List[MCPServerConfig], *, lazy: bool = False, catalog_path: Optional[str] = None,
+                 on_call: Optional[Callable[[Dict[str, Any]], None]] = None):
         self.servers = servers
-        self._stack: Optional[AsyncExitStack] = None
+        self.lazy = lazy
+        # on_call: hook opcional con {"server","tool","duration_ms","ok"} tras cada call_tool
+        self.on_call = on_call
+        self.catalog = ToolCatalogCache(catalog_path)
+        self._fingerprints: Dict[str, str] = {}
+        self._versions: Dict[str, Optional[str]] = {}
+        self._configs: Dict[str, MCPServerConfig] = {cfg.name: cfg for cfg in servers}
         self._sessions: Dict[str, ClientSession] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stops: Dict[str, asyncio.Event] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._failed: Dict[str, str] = {}
+        self.startup_ms: Dict[str, float] = {}   # tiempo de arranque por servidor
         self._started = False
 
         # event loop dedicado en hilo
@@ -159,57 +252,166 @@ class MCPMultiplexer:
 
     def _submit(self, coro):
         """Ejecuta una corutina en el loop dedicado y espera el resultado."""
-        fut = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        fut = asyncio.run_coroutine_threadsafe(_with_context(contextvars.copy_context(), coro), self._loop)
         return fut.result()
 
     #  lifecycle
+    async def _serve(self, cfg: MCPServerConfig, ready: asyncio.Future, stop: asyncio.Event):
+        """Mantiene abierto el contexto del servidor (en una sola tarea) hasta que se pide stop."""
+        try:
+            params = StdioServerParameters(command=cfg.command, args=cfg.args, cwd=cfg.cwd)
+            extra = {"message_handler": self._message_handler(cfg.name)} if _SESSION_HAS_MESSAGE_HANDLER else {}
+            async with stdio_client(params) as (r, w):
+                async with ClientSession(r, w, **extra) as sess:
+                    init = await sess.initialize()
+                    info = getattr(init, "serverInfo", None)
+                    self._versions[cfg.name] = getattr(info, "version", None)
+                    ready.set_result(sess)
+                    await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e if isinstance(e, Exception) else RuntimeError(repr(e)))
+            if not isinstance(e, Exception):
+                raise
+
+    async def _start_server(self, name: str) -> Optional[ClientSession]:
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self._sessions:
+                return self._sessions[name]
+            if name in self._failed:
+                return None
+            cfg = self._configs[name]
+            ready: asyncio.Future = self._loop.create_future()
+            stop = asyncio.Event()
+            t0 = time.perf_counter()
+            self._stops[name] = stop
+            self._tasks[name] = asyncio.create_task(self._serve(cfg, ready, stop))
+            try:
+                sess = await ready
+            except Exception as e:
+                self.startup_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+                self._failed[name] = str(e) or type(e).__name__
+                print(f"[MCP] FAILED '{name}' after {self.startup_ms[name]:.0f} ms: {self._failed[name]}")
+                return None
+            self.startup_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+            self._sessions[name] = sess
+            self.catalog.check_version(name, self._versions.get(name))
+            print(f"[MCP] started '{cfg.name}' in {self.startup_ms[name]:.0f} ms -> {cfg.command} {' '.join(cfg.args) if cfg.args else ''}")
+            return sess
+
+    async def _ensure_all_started(self):
+        pending = [n for n in self._configs if n not in self._sessions and n not in self._failed]
+        if pending:
+            await asyncio.gather(*(self._start_server(n) for n in pending))
+
     async def start(self):
         if self._started:
             return
-        self._stack = AsyncExitStack()
-        await self._stack.__aenter__()
-        # entrar a cada servidor y mantener su contexto
-        for cfg in self.servers:
-            params = StdioServerParameters(command=cfg.command, args=cfg.args, cwd=cfg.cwd)
-            r, w = await self._stack.enter_async_context(stdio_client(params))
-            sess = ClientSession(r, w)
-            sess = await self._stack.enter_async_context(sess)
-            await sess.initialize()
-            self._sessions[cfg.name] = sess
-            print(f"[MCP] started '{cfg.name}' -> {cfg.command} {' '.join(cfg.args) if cfg.args else ''}")
         self._started = True
+        if not self.lazy:
+            await self._ensure_all_started()
 
     async def stop(self):
         if not self._started:
             return
         try:
-            if self._stack:
-                await self._stack.aclose()
+            for ev in self._stops.values():
+                ev.set()
+            if self._tasks:
+                await asyncio.gather(*self._tasks.values(), return_exceptions=True)
         finally:
-            self._stack = None
+            self._tasks.clear()
+            self._stops.clear()
             self._sessions.clear()
+            self._failed.clear()
             self._started = False
-        # cerrar el loop/hilo
-        self._loop.call_soon_threadsafe(self._loop.stop)
-        self._thread.join(timeout=1)
 
     async def _ensure_started(self):
         if not self._started:
             await self.start()
 
-    #  API async
-    async def list_all_tools(self) -> Dict[str, Dict[str, str]]:
+    async def _session(self, name: str) -> Optional[ClientSession]:
         await self._ensure_started()
-        out: Dict[str, Dict[str, str]] = {}
-        for name, sess in self._sessions.items():
+        sess = self._sessions.get(name)
+        if sess is None and name in self._configs:
+            sess = await self._start_server(name)
+        return sess
+
+    def startup_report(self) -> Dict[str, Dict[str, Any]]:
+        """{server: {"ms": float | None, "ok": bool, "error": str | None}}"""
+        return {
+            name: {
+                "ms": self.startup_ms.get(name),
+                "ok": name in self._sessions,
+                "error": self._failed.get(name),
+            }
+            for name in self._configs
+        }
+
+    #  API async
+    def _message_handler(self, name: str):
+        async def _on_message(msg):
+            root = getattr(msg, "root", msg)
+            if getattr(root, "method", None) == _TOOLS_CHANGED:
+                print(f"[MCP] '{name}' cambió su lista de tools; invalidando catálogo")
+                self.catalog.invalidate(name)
+        return _on_message
+
+    def _fingerprint(self, name: str) -> str:
+        if name not in self._fingerprints:
+            self._fingerprints[name] = _server_fingerprint(self._configs[name])
+        return self._fingerprints[name]
+
+    async def _tool_specs(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Specs de un servidor: desde el catálogo si es válido; si no, list_tools (arrancándolo si hace falta)."""
+        if name in self._failed:
+            # no anunciar tools cacheadas de un servidor que no arrancó: sus llamadas fallarían
+            return None
+        key = self._fingerprint(name)
+        cached = self.catalog.get(name, key, self._versions.get(name))
+        if cached is not None:
+            return cached
+        sess = await self._session(name)
+        if sess is None:
+            return None
+        try:
             resp = await sess.list_tools()
-            out[name] = {t.name: getattr(t, "description", "") for t in resp.tools}
-        return out
+        except Exception as e:
+            print(f"[MCP] list_tools '{name}' falló: {e}")
+            return None
+        specs = [
+            {
+                "name": t.name,
+                "description": getattr(t, "description", "") or "",
+                "inputSchema": getattr(t, "inputSchema", None) or {"type": "object", "properties": {}},
+            }
+            for t in resp.tools
+        ]
+        self.catalog.put(name, key, self._versions.get(name), specs)
+        return specs
+
+    async def list_all_tool_specs(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Catálogo completo por servidor: nombre, descripción e inputSchema (JSON Schema) de cada tool."""
+        await self._ensure_started()
+        names = list(self._configs)
+        specs = await asyncio.gather(*(self._tool_specs(n) for n in names))
+        return {n: sp for n, sp in zip(names, specs) if sp is not None and n not in self._failed}
+
+    async def list_all_tools(self) -> Dict[str, Dict[str, str]]:
+        return {
+            name: {t["name"]: t["description"] for t in specs}
+            for name, specs in (await self.list_all_tool_specs()).items()
+        }
+
+    def invalidate_tools(self, name: Optional[str] = None) -> None:
+        self._loop.call_soon_threadsafe(self.catalog.invalidate, name)
 
     async def call_tool(self, server_name: str, tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
-        await self._ensure_started()
-        sess = self._sessions.get(server_name)
+        sess = await self._session(server_name)
         if not sess:
+            if server_name in self._failed:
+                return {"error": f"Servidor '{server_name}' no disponible: {self._failed[server_name]}"}
             return {"error": f"Servidor desconocido: {server_name}"}
 
         tool_to_call = tool
@@ -226,26 +428,72 @@ class MCPMultiplexer:
         print(f"[MCP] calling '{server_name}'")
 
 
-        res = await sess.call_tool(tool_to_call, call_args)
-        for item in getattr(res, "content", []) or []:
-            if hasattr(item, "value") and isinstance(item.value, (dict, list, str)):
-                return {"value": item.value} if not isinstance(item.value, dict) else item.value
-            if hasattr(item, "text") and item.text:
-                try:
-                    return json.loads(item.text)
-                except Exception:
-                    return {"text": item.text[:4000]}
-        return {"error": "Respuesta vacía del servidor MCP"}
+        t0 = time.perf_counter()
+        out: Dict[str, Any] = {"error": "Respuesta vacía del servidor MCP"}
+        try:
+            with tracing.span("mcp.call_tool", server=server_name, tool=tool_to_call):
+                res = await sess.call_tool(tool_to_call, call_args)
+            for item in getattr(res, "content", []) or []:
+                if hasattr(item, "value") and isinstance(item.value, (dict, list, str)):
+                    out = {"value": item.value} if not isinstance(item.value, dict) else item.value
+                    break
+                if hasattr(item, "text") and item.text:
+                    try:
+                        out = json.loads(item.text)
+                    except Exception:
+                        out = {"text": item.text[:4000]}
+                    break
+        except Exception as e:
+            out = {"error": str(e)}
+            raise
+        finally:
+            self._report_call(server_name, tool_to_call, t0, out)
+        return out
+
+    def _report_call(self, server: str, tool: str, t0: float, out: Any) -> None:
+        if not self.on_call:
+            return
+        try:
+            self.on_call({
+                "server": server,
+                "tool": tool,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "ok": not (isinstance(out, dict) and out.get("error")),
+            })
+        except Exception:
+            pass
+
+    async def call_tools(self, calls: List[Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Ejecuta varias tools a la vez (pueden ser de servidores distintos).
+        Devuelve los resultados en el mismo orden que `calls`; una excepción se vuelve {"error": ...}.
+        """
+        results = await asyncio.gather(
+            *(self.call_tool(srv, tool, args) for (srv, tool, args) in calls),
+            return_exceptions=True,
+        )
+        return [{"error": str(r)} if isinstance(r, BaseException) else r for r in results]
 
     #  API sync (thread-safe)
     def start_sync(self):
         return self._submit(self.start())
 
     def stop_sync(self):
-        return self._submit(self.stop())
+        try:
+            return self._submit(self.stop())
+        finally:
+            # cerrar el loop/hilo (fuera del propio loop para poder hacer join)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=1)
 
     def list_all_tools_sync(self):
         return self._submit(self.list_all_tools())
 
+    def list_all_tool_specs_sync(self):
+        return self._submit(self.list_all_tool_specs())
+
     def call_tool_sync(self, server_name: str, tool: str, args: Dict[str, Any]):
         return self._submit(self.call_tool(server_name, tool, args))
+
+    def call_tools_sync(self, calls: List[Tuple[str, str, Dict[str, Any]]]):
+        return self._submit(self.call_tools(calls))
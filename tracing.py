@@ -0,0 +1,201 @@
+# Trazas por turno: ask -> ruteo/intents -> pasos del agente -> LLM -> MCP
+# Cada span se exporta (por defecto al JsonlLogger, channel="trace", kind="span") con
+# trace_id, span_id, parent_id, inicio (epoch us) y duración. Se pueden convertir a
+# Chrome trace JSON (chrome://tracing, Perfetto, speedscope) o a OTLP/JSON de OpenTelemetry:
+#   python tracing.py --chrome trace.json [--path logs/app.jsonl] [--trace-id ID]
+#   python tracing.py --otlp otlp.json
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_TRACE_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_SPAN_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_id", default=None)
+
+_EXPORTER: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def set_exporter(fn: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """Destino de los spans terminados (None desactiva el trazado)."""
+    global _EXPORTER
+    _EXPORTER = fn
+
+
+def current_trace_id() -> Optional[str]:
+    return _TRACE_ID.get()
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "status")
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.status = "ok"
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, *, root: bool = False, **attrs):
+    """
+    Abre un span hijo del span actual. Con root=True inicia una traza nueva (un turno).
+    Fuera de una traza, o sin exporter, no hace nada.
+    """
+    if _EXPORTER is None or (not root and _TRACE_ID.get() is None):
+        yield _NOOP
+        return
+    trace_id = _new_id(16) if root else _TRACE_ID.get()
+    parent_id = None if root else _SPAN_ID.get()
+    sp = Span(name, trace_id, _new_id(8), parent_id, dict(attrs))
+    tok_t = _TRACE_ID.set(trace_id)
+    tok_s = _SPAN_ID.set(sp.span_id)
+    start_us = time.time_ns() // 1000
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        sp.status = "error"
+        sp.attrs.setdefault("error", str(e)[:400])
+        raise
+    finally:
+        dur_ms = round((time.perf_counter() - t0) * 1000, 3)
+        _SPAN_ID.reset(tok_s)
+        _TRACE_ID.reset(tok_t)
+        exporter = _EXPORTER
+        if exporter is not None:
+            try:
+                exporter({
+                    "trace_id": sp.trace_id,
+                    "span_id": sp.span_id,
+                    "parent_id": sp.parent_id,
+                    "name": sp.name,
+                    "start_us": start_us,
+                    "duration_ms": dur_ms,
+                    "thread": threading.current_thread().name,
+                    "status": sp.status,
+                    "attrs": sp.attrs,
+                })
+            except Exception:
+                pass
+
+
+#  Conversión
+
+def iter_spans(path: str, trace_id: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+    from log import iter_segments, open_segment
+    for seg in iter_segments(path):
+        with open_segment(seg) as f:
+            for raw in f:
+                try:
+                    ev = json.loads(raw)
+                except Exception:
+                    continue
+                if not isinstance(ev, dict) or ev.get("channel") != "trace" or ev.get("kind") != "span":
+                    continue
+                if trace_id and ev.get("trace_id") != trace_id:
+                    continue
+                yield ev
+
+
+def to_chrome_trace(spans: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chrome trace event format: un evento completo ("ph": "X") por span, una fila por hilo."""
+    tids: Dict[str, int] = {}
+    events: List[Dict[str, Any]] = []
+    for sp in spans:
+        tid = tids.setdefault(sp.get("thread") or "main", len(tids) + 1)
+        args = dict(sp.get("attrs") or {})
+        args.update(trace_id=sp.get("trace_id"), span_id=sp.get("span_id"), parent_id=sp.get("parent_id"),
+                    status=sp.get("status"))
+        events.append({
+            "name": sp.get("name"),
+            "cat": (sp.get("name") or "").split(".")[0],
+            "ph": "X",
+            "ts": sp.get("start_us", 0),
+            "dur": round(float(sp.get("duration_ms") or 0) * 1000, 1),
+            "pid": 1,
+            "tid": tid,
+            "args": args,
+        })
+    for name, tid in tids.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)}
+
+
+def to_otlp(spans: Iterable[Dict[str, Any]], service_name: str = "proyecto1-redes") -> Dict[str, Any]:
+    """OTLP/JSON (ExportTraceServiceRequest) listo para un collector de OpenTelemetry."""
+    out = []
+    for sp in spans:
+        start_ns = int(sp.get("start_us", 0)) * 1000
+        end_ns = start_ns + int(float(sp.get("duration_ms") or 0) * 1_000_000)
+        item = {
+            "traceId": sp.get("trace_id"),
+            "spanId": sp.get("span_id"),
+            "name": sp.get("name"),
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in (sp.get("attrs") or {}).items()]
+                          + [{"key": "thread.name", "value": _otlp_value(sp.get("thread") or "")}],
+            "status": {"code": 2 if sp.get("status") == "error" else 1},
+        }
+        if sp.get("parent_id"):
+            item["parentSpanId"] = sp["parent_id"]
+        out.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": out}],
+    }]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convierte los spans de los logs a Chrome trace JSON u OTLP/JSON.")
+    ap.add_argument("--path", default="logs/app.jsonl")
+    ap.add_argument("--trace-id", default=None, help="solo esta traza (un turno)")
+    ap.add_argument("--chrome", default=None, help="archivo de salida Chrome trace JSON")
+    ap.add_argument("--otlp", default=None, help="archivo de salida OTLP/JSON")
+    a = ap.parse_args()
+    if not a.chrome and not a.otlp:
+        ap.error("indica --chrome y/o --otlp")
+    spans = list(iter_spans(a.path, a.trace_id))
+    if a.chrome:
+        with open(a.chrome, "w", encoding="utf-8") as f:
+            json.dump(to_chrome_trace(spans), f, ensure_ascii=False)
+    if a.otlp:
+        with open(a.otlp, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(spans), f, ensure_ascii=False)
+    print(f"{len(spans)} spans exportados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Exportación en streaming del reporte de tendencias (usado por YTtool.yt_export_report)
+# Formatos: csv, ndjson (json/jsonl), parquet y arrow (IPC/feather; requieren pyarrow), con gzip opcional.
+# Las filas llegan de un iterable y se escriben por bloques: la memoria no crece con el tamaño del
+# reporte. Se escribe a un archivo temporal en el mismo directorio y se renombra al terminar
+# (os.replace), así que un corte nunca deja un reporte a medias.
+import csv
+import gzip
+import io
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+COLUMNS = ["keyword", "videoId", "title", "channelTitle", "publishedAt", "views", "score"]
+FORMATS = ("csv", "ndjson", "parquet", "arrow")
+CHUNK_ROWS = 5000
+
+_ALIASES = {"json": "ndjson", "jsonl": "ndjson", "feather": "arrow", "ipc": "arrow"}
+_EXT = {"csv": ".csv", "ndjson": ".ndjson", "parquet": ".parquet", "arrow": ".arrow"}
+_EXT_FORMAT = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson",
+               ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+def resolve(path: Optional[str], fmt: Optional[str], compress: Optional[bool]) -> tuple[str, bool]:
+    """(formato, gzip) a partir de los parámetros o, si faltan, de la extensión del path."""
+    base, gz = (path or ""), False
+    if base.lower().endswith(".gz"):
+        base, gz = base[:-3], True
+    if fmt:
+        f = _ALIASES.get(fmt.strip().lower(), fmt.strip().lower())
+    else:
+        f = _EXT_FORMAT.get(os.path.splitext(base)[1].lower(), "csv")
+    if f not in FORMATS:
+        raise ValueError(f"formato no soportado: {fmt} (usa {', '.join(FORMATS)})")
+    return f, (gz if compress is None else bool(compress))
+
+
+def default_name(fmt: str, compress: bool) -> str:
+    """Sufijo de archivo: '.csv', '.ndjson.gz', ... (parquet comprime por dentro)."""
+    gz = compress and fmt in ("csv", "ndjson")
+    return _EXT[fmt] + (".gz" if gz else "")
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _open_text(tmp: str, compress: bool):
+    if compress:
+        return io.TextIOWrapper(gzip.open(tmp, "wb", compresslevel=6), encoding="utf-8", newline="")
+    return open(tmp, "w", encoding="utf-8", newline="")
+
+
+def _write_csv(f, chunks) -> int:
+    w = csv.writer(f)
+    w.writerow(COLUMNS)
+    n = 0
+    for chunk in chunks:
+        w.writerows([[r.get(c, "") for c in COLUMNS] for r in chunk])
+        n += len(chunk)
+    return n
+
+
+def _write_ndjson(f, chunks) -> int:
+    n = 0
+    for chunk in chunks:
+        f.write("".join(json.dumps({c: r.get(c) for c in COLUMNS}, ensure_ascii=False) + "\n" for r in chunk))
+        n += len(chunk)
+    return n
+
+
+def _arrow_schema():
+    return pa.schema([("keyword", pa.string()), ("videoId", pa.string()), ("title", pa.string()),
+                      ("channelTitle", pa.string()), ("publishedAt", pa.string()),
+                      ("views", pa.int64()), ("score", pa.float64())])
+
+
+def _batch(schema, chunk: List[Dict[str, Any]]):
+    return pa.RecordBatch.from_pylist([{c: r.get(c) for c in COLUMNS} for r in chunk], schema=schema)
+
+
+def _write_parquet(tmp: str, chunks, compress: bool) -> int:
+    schema = _arrow_schema()
+    n = 0
+    with pq.ParquetWriter(tmp, schema, compression="gzip" if compress else "snappy") as w:
+        for chunk in chunks:
+            w.write_batch(_batch(schema, chunk))
+            n += len(chunk)
+    return n
+
+
+def _write_arrow(tmp: str, chunks) -> int:
+    schema = _arrow_schema()
+    n = 0
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as w:
+        for chunk in chunks:
+            w.write_batch(_batch(schema, chunk))
+            n += len(chunk)
+    return n
+
+
+def write_report(rows: Iterable[Dict[str, Any]], path: str, fmt: str = "csv", compress: bool = False,
+                 chunk_rows: int = CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Escribe `rows` (dicts con COLUMNS) en `path`; devuelve {"path","format","gzip","rows","bytes"}.
+    csv/ndjson con gzip agregan .gz al path si falta (el "path" devuelto es el archivo escrito).
+    """
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise RuntimeError(f"el formato {fmt} requiere pyarrow (pip install pyarrow)")
+    if fmt == "arrow" and compress:
+        raise ValueError("arrow no admite gzip; usa parquet o csv/ndjson")
+    if compress and fmt in ("csv", "ndjson") and not path.lower().endswith(".gz"):
+        path += ".gz"  # bytes gzip con nombre sin .gz: el path devuelto lleva la extensión real
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    tmp = os.path.join(d, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    chunks = _chunks(rows, max(1, chunk_rows))
+    try:
+        if fmt == "parquet":
+            n = _write_parquet(tmp, chunks, compress)
+        elif fmt == "arrow":
+            n = _write_arrow(tmp, chunks)
+        else:
+            with _open_text(tmp, compress) as f:
+                n = _write_csv(f, chunks) if fmt == "csv" else _write_ndjson(f, chunks)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return {"path": path, "format": fmt, "gzip": bool(compress), "rows": n, "bytes": os.path.getsize(path)}
@@ -0,0 +1,273 @@
+# Servicio local que imita la YouTube Data API v3 (googleapiclient) con datos sintéticos
+# Se activa con yt_init({"fake": true}) o YT_FAKE=1; no necesita red, API key ni cuota.
+#   YT_FAKE_SCALE=<n>        videos disponibles por búsqueda (default 200)
+#   YT_FAKE_LATENCY_MS=<ms>  latencia simulada por request (default 0)
+#   YT_FAKE_QUOTA=<units>    cuota diaria; al agotarse responde 403 quotaExceeded (default sin límite)
+#   YT_FAKE_STATE_DIR=<dir>  cachés, ledger de cuota y base SQLite propios del modo fake
+#                            (default .yt_state/fake; ver YTtool._use_state)
+#
+# Soporta i18nRegions.list, videoCategories.list, search.list y videos.list (por id o chart=mostPopular),
+# con la misma forma de respuesta que la API real (incluido etag / If-None-Match -> 304), y cuenta
+# requests y unidades de cuota por método.
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+# costo en unidades de cuota por método (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COST = {
+    "i18nRegions.list": 1,
+    "videoCategories.list": 1,
+    "search.list": 100,
+    "videos.list": 1,
+}
+
+_REGIONS = ["AR", "BO", "BR", "CA", "CL", "CO", "ES", "GT", "MX", "PE", "PY", "SV", "US", "UY"]
+_CATEGORIES = ["Film & Animation", "Autos & Vehicles", "Music", "Pets & Animals", "Sports", "Travel & Events",
+               "Gaming", "People & Blogs", "Comedy", "Entertainment", "News & Politics", "Howto & Style",
+               "Education", "Science & Technology", "Nonprofits & Activism"]
+_CATEGORY_IDS = ["1", "2", "10", "15", "17", "19", "20", "22", "23", "24", "25", "26", "27", "28", "29"]
+
+
+def _h(*parts: Any) -> int:
+    return int(hashlib.md5("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:12], 16)
+
+
+def _iso(d: datetime) -> str:
+    return d.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_fields(spec: str) -> Dict[str, Any]:
+    """'items(id,statistics(viewCount))' -> {"items": {"id": {}, "statistics": {"viewCount": {}}}}"""
+    def parse(i: int) -> tuple[Dict[str, Any], int]:
+        out: Dict[str, Any] = {}
+        name = ""
+        while i < len(spec):
+            ch = spec[i]
+            if ch == "(":
+                out[name.strip()], i = parse(i + 1)
+                name = ""
+            elif ch == ")":
+                break
+            elif ch == ",":
+                if name.strip():
+                    out[name.strip()] = {}
+                name = ""
+            else:
+                name += ch
+            i += 1
+        if name.strip():
+            out[name.strip()] = {}
+        return out, i
+    return parse(0)[0]
+
+
+def _project(x: Any, sel: Dict[str, Any]) -> Any:
+    """Proyección estilo `fields=` de las APIs de Google."""
+    if not sel:
+        return x
+    if isinstance(x, list):
+        return [_project(v, sel) for v in x]
+    if isinstance(x, dict):
+        return {k: _project(x[k], sub) for k, sub in sel.items() if k in x}
+    return x
+
+
+class FakeHttpError(Exception):
+    """Imita googleapiclient.errors.HttpError (resp.status + motivo en el texto)."""
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(f"<HttpError {status}: {message} (reason: {reason})>")
+        self.resp = type("Resp", (), {"status": status, "reason": reason})()
+        self.reason = reason
+
+
+class _Request:
+    def __init__(self, svc: "FakeYouTube", method: str, params: Dict[str, Any]):
+        self._svc = svc
+        self._method = method
+        self._params = params
+        self.methodId = f"youtube.{method}"
+        self.headers: Dict[str, str] = {}
+
+    def execute(self, http=None, num_retries: int = 0) -> Dict[str, Any]:
+        return self._svc._serve(self._method, self._params, self.headers)
+
+
+class _Resource:
+    def __init__(self, svc: "FakeYouTube", name: str):
+        self._svc = svc
+        self._name = name
+
+    def list(self, **params) -> _Request:
+        return _Request(self._svc, f"{self._name}.list", params)
+
+
+class FakeYouTube:
+    """
+    Reemplazo de build("youtube", "v3", ...). Determinista: el mismo request devuelve los mismos
+    videos (IDs, títulos, fechas y estadísticas fijos para una instancia).
+    """
+    def __init__(self, *, scale: int = 200, latency_ms: float = 0.0, quota: Optional[int] = None, seed: int = 0):
+        self.scale = max(1, int(scale))
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.quota = quota
+        self.seed = seed
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.units = 0
+        self.bytes = 0  # tamaño de las respuestas servidas (JSON)
+
+    @classmethod
+    def from_env(cls) -> "FakeYouTube":
+        quota = os.getenv("YT_FAKE_QUOTA")
+        return cls(
+            scale=int(os.getenv("YT_FAKE_SCALE", "200") or 200),
+            latency_ms=float(os.getenv("YT_FAKE_LATENCY_MS", "0") or 0),
+            quota=int(quota) if quota else None,
+        )
+
+    # recursos (misma forma que el cliente de googleapiclient)
+    def i18nRegions(self) -> _Resource:
+        return _Resource(self, "i18nRegions")
+
+    def videoCategories(self) -> _Resource:
+        return _Resource(self, "videoCategories")
+
+    def search(self) -> _Resource:
+        return _Resource(self, "search")
+
+    def videos(self) -> _Resource:
+        return _Resource(self, "videos")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self.calls), "requests": sum(self.calls.values()), "quota_units": self.units,
+                    "response_bytes": self.bytes}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.units = 0
+            self.bytes = 0
+
+    #  despacho
+
+    def _serve(self, method: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        cost = QUOTA_COST.get(method, 1)
+        with self._lock:
+            if self.quota is not None and self.units + cost > self.quota:
+                raise FakeHttpError(403, "quotaExceeded",
+                                    "The request cannot be completed because you have exceeded your quota.")
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.units += cost
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        handler = {
+            "i18nRegions.list": self._regions,
+            "videoCategories.list": self._categories,
+            "search.list": self._search,
+            "videos.list": self._videos,
+        }.get(method)
+        if handler is None:
+            raise FakeHttpError(400, "badRequest", f"método no soportado: {method}")
+        resp = handler(params)
+        if params.get("fields"):
+            resp = _project(resp, _parse_fields(str(params["fields"])))
+        body = json.dumps(resp, sort_keys=True).encode("utf-8")
+        resp["etag"] = hashlib.md5(body).hexdigest()
+        with self._lock:
+            self.bytes += len(body)
+        if (headers or {}).get("If-None-Match") == resp["etag"]:
+            raise FakeHttpError(304, "notModified", "Not Modified")
+        return resp
+
+    def _regions(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "kind": "youtube#i18nRegionListResponse",
+            "items": [{"kind": "youtube#i18nRegion", "id": c, "snippet": {"gl": c, "name": f"Region {c}"}}
+                      for c in _REGIONS],
+        }
+
+    def _categories(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        region = params.get("regionCode") or "US"
+        return {
+            "kind": "youtube#videoCategoryListResponse",
+            "items": [{"kind": "youtube#videoCategory", "id": cid,
+                       "snippet": {"title": title, "assignable": True, "channelId": f"UC{region}"}}
+                      for cid, title in zip(_CATEGORY_IDS, _CATEGORIES)],
+        }
+
+    #  videos sintéticos
+
+    def _video_id(self, pool: str, i: int) -> str:
+        return f"{_h(self.seed, pool, i):011x}"[-11:]
+
+    def _video(self, vid: str, parts: str) -> Dict[str, Any]:
+        n = _h(self.seed, vid)
+        published = self.now - timedelta(hours=1 + n % (24 * 60))
+        age_h = max(1.0, (self.now - published).total_seconds() / 3600.0)
+        views = int((500 + n % 20_000) * age_h ** 0.8)
+        out: Dict[str, Any] = {"kind": "youtube#video", "id": vid}
+        if "snippet" in parts:
+            out["snippet"] = {
+                "publishedAt": _iso(published),
+                "channelId": f"UC{n % 5000:06d}",
+                "channelTitle": f"Canal {n % 5000}",
+                "title": f"Video {vid}",
+                "categoryId": _CATEGORY_IDS[n % len(_CATEGORY_IDS)],
+            }
+        if "statistics" in parts:
+            out["statistics"] = {
+                "viewCount": str(views),
+                "likeCount": str(views // (20 + n % 30)),
+                "commentCount": str(views // (200 + n % 300)),
+            }
+        if "contentDetails" in parts:
+            out["contentDetails"] = {"duration": f"PT{1 + n % 59}M{n % 60}S"}
+        return out
+
+    @staticmethod
+    def _page(params: Dict[str, Any], total: int) -> tuple[int, int, Optional[str]]:
+        size = max(1, min(50, int(params.get("maxResults") or 5)))
+        start = int(params.get("pageToken") or 0)
+        end = min(total, start + size)
+        return start, end, (str(end) if end < total else None)
+
+    def _search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        q = str(params.get("q") or "")
+        pool = f"q:{q.lower()}:{params.get('regionCode') or ''}"
+        after = params.get("publishedAfter")
+        snips = {v: self._video(v, "snippet")["snippet"] for v in (self._video_id(pool, i) for i in range(self.scale))}
+        ids = list(snips)
+        if after:
+            cutoff = _iso(datetime.fromisoformat(str(after).replace("Z", "+00:00")))
+            ids = [v for v in ids if snips[v]["publishedAt"] >= cutoff]
+        if params.get("order") == "date":
+            ids.sort(key=lambda v: snips[v]["publishedAt"], reverse=True)
+        start, end, nxt = self._page(params, len(ids))
+        items = [{"kind": "youtube#searchResult", "id": {"kind": "youtube#video", "videoId": vid}, "snippet": snips[vid]}
+                 for vid in ids[start:end]]
+        resp = {"kind": "youtube#searchListResponse", "pageInfo": {"totalResults": len(ids)}, "items": items}
+        if nxt:
+            resp["nextPageToken"] = nxt
+        return resp
+
+    def _videos(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        parts = str(params.get("part") or "snippet")
+        if params.get("chart") == "mostPopular":
+            pool = f"popular:{params.get('regionCode') or 'US'}:{params.get('videoCategoryId') or ''}"
+            start, end, nxt = self._page(params, min(self.scale, 200))
+            items = [self._video(self._video_id(pool, i), parts) for i in range(start, end)]
+            items.sort(key=lambda v: -int(v.get("statistics", {}).get("viewCount", 0)))
+            resp = {"kind": "youtube#videoListResponse", "items": items}
+            if nxt:
+                resp["nextPageToken"] = nxt
+            return resp
+        ids = [v for v in str(params.get("id") or "").split(",") if v]
+        if len(ids) > 50:
+            raise FakeHttpError(400, "invalidFilters", "videos.list admite como mucho 50 IDs")
+        return {"kind": "youtube#videoListResponse", "items": [self._video(v, parts) for v in ids]}
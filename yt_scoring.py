@@ -0,0 +1,194 @@
+# Motor de scoring de tendencias en columnas (usado por YTtool.yt_calc_trends)
+# Guarda views / fecha de publicación / keyword como arreglos y calcula scores, top-k y totales por
+# keyword sin copiar un dict por video. Con NumPy vectoriza (partition + bincount); sin NumPy
+# usa el mismo algoritmo en Python puro (heapq), con el mismo orden de resultados.
+# En modo velocity hay dos escalas: la velocidad medida entre snapshots (reciente) y, para videos
+# vistos una sola vez, views / edad (promedio de toda la vida, más alto en videos que ya decaen).
+# No se comparan entre sí: los medidos rankean primero y los estimados después (velocity_source).
+from __future__ import annotations
+
+import heapq
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_DEFAULT_AGE_H = 24.0  # publishedAt ausente o inválido
+
+
+def _epoch(iso: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(str(iso).replace("Z", "+00:00")).timestamp()
+    except Exception:
+        return math.nan
+
+
+def _epochs(values: List[Optional[str]]):
+    """publishedAt ISO -> epoch (NaN si no se puede leer)."""
+    if np is None:
+        return [_epoch(v) for v in values]
+    try:
+        # formato de la API ('YYYY-MM-DDTHH:MM:SSZ'): parseo vectorizado
+        dt = np.array([str(v or "")[:19] for v in values], dtype="datetime64[s]")
+        out = dt.astype("int64").astype("float64")
+        out[np.isnat(dt)] = np.nan
+        return out
+    except Exception:
+        return np.array([_epoch(v) for v in values], dtype="float64")
+
+
+class TrendTable:
+    """
+    Videos puntuados en columnas. `rows` son los dicts originales (no se copian);
+    los dicts de salida se arman solo para los índices devueltos (ver row()).
+    """
+    def __init__(self, rows: List[Dict[str, Any]], *, now: float, mode: str = "simple",
+                 velocity: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.rows = rows
+        self.mode = mode
+        # una sola pasada sobre los dicts; el resto es aritmética sobre columnas
+        codes: Dict[str, int] = {}
+        kw: List[int] = []
+        views: List[float] = []
+        published: List[Optional[str]] = []
+        for r in rows:
+            k = r.get("keyword")
+            kw.append(codes.setdefault(k, len(codes)) if k else -1)
+            views.append(r.get("views") or 0)
+            published.append(r.get("publishedAt"))
+        self.keywords: List[str] = list(codes)
+        vel = velocity or {}
+        snap = [vel.get(r.get("videoId")) for r in rows] if vel else [None] * len(rows)
+        self.velocity_window = [s["window_h"] if s else None for s in snap]
+        snap_vel = [s["velocity"] if s else math.nan for s in snap]
+        # nivel de ranking en modo velocity: 0 = velocidad medida, 1 = estimada (un solo snapshot)
+        self.tier = [0 if s else 1 for s in snap] if mode == "velocity" else None
+        if np is not None:
+            self.kw = np.array(kw, dtype="int64")
+            if self.tier is not None:
+                self.tier = np.array(self.tier, dtype="int64")
+            self.score = self._score_np(np.array(views, dtype="float64"), _epochs(published),
+                                        np.array(snap_vel, dtype="float64"), now)
+        else:
+            self.kw = kw
+            self.score = self._score_py([float(v) for v in views], _epochs(published), snap_vel, now)
+
+    #  scores
+
+    def _score_np(self, views, published, snap_vel, now: float):
+        hours = np.where(np.isnan(published), _DEFAULT_AGE_H, np.maximum(0.0, (now - published) / 3600.0))
+        if self.mode == "velocity":
+            self.velocity = np.round(np.where(np.isnan(snap_vel), views / np.maximum(1.0, hours), snap_vel), 3)
+            return self.velocity
+        self.velocity = None
+        return np.round(views / np.sqrt(hours + 1.0), 3)
+
+    def _score_py(self, views, published, snap_vel, now: float) -> List[float]:
+        hours = [_DEFAULT_AGE_H if math.isnan(p) else max(0.0, (now - p) / 3600.0) for p in published]
+        if self.mode == "velocity":
+            self.velocity = [round(v / max(1.0, h) if math.isnan(s) else s, 3)
+                             for v, h, s in zip(views, hours, snap_vel)]
+            return self.velocity
+        self.velocity = None
+        return [round(v / math.sqrt(h + 1.0), 3) for v, h in zip(views, hours)]
+
+    #  consultas
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def keyword_index(self, keyword: str) -> Optional[int]:
+        kwn = str(keyword).strip().lower()
+        for i, k in enumerate(self.keywords):
+            if str(k).strip().lower() == kwn:
+                return i
+        return None
+
+    def top(self, k: Optional[int] = None, keyword: Optional[int] = None) -> List[int]:
+        """
+        Índices de los k mejores scores (todos si k es None), de mayor a menor; empates en el
+        orden original, igual que un sort estable. keyword = código de keyword para filtrar.
+        En modo velocity van primero los de velocidad medida y después los estimados.
+        """
+        if self.tier is None:
+            return self._top(k, keyword, None)
+        out = self._top(k, keyword, 0)
+        if k is None or len(out) < k:
+            out += self._top(None if k is None else k - len(out), keyword, 1)
+        return out
+
+    def _top(self, k: Optional[int], keyword: Optional[int], tier: Optional[int]) -> List[int]:
+        if np is not None:
+            mask = np.ones(len(self.rows), dtype=bool)
+            if keyword is not None:
+                mask &= self.kw == keyword
+            if tier is not None:
+                mask &= self.tier == tier
+            idx = np.flatnonzero(mask)
+            s = self.score[idx]
+            if k is not None and k < len(idx):
+                if k <= 0:
+                    return []
+                # selección parcial: umbral del k-ésimo y solo se ordena lo que lo supera
+                kth = np.partition(s, len(s) - k)[len(s) - k]
+                sel = np.flatnonzero(s >= kth)
+                idx, s = idx[sel], s[sel]
+            order = np.lexsort((idx, -s))
+            return idx[order][:k].tolist()
+        idx = [i for i in range(len(self.rows))
+               if (keyword is None or self.kw[i] == keyword) and (tier is None or self.tier[i] == tier)]
+        key = lambda i: (-self.score[i], i)
+        if k is None:
+            return sorted(idx, key=key)
+        return heapq.nsmallest(max(0, k), idx, key=key)
+
+    def keyword_totals(self) -> List[Dict[str, Any]]:
+        """
+        Suma de scores por keyword (group-sum), de mayor a menor. En modo velocity "score" suma solo
+        velocidades medidas y "score_estimated" las estimadas (desempate), sin mezclar escalas.
+        """
+        n = len(self.keywords)
+        measured = self._group_sum(0 if self.tier is not None else None)
+        if self.tier is None:
+            ranked = sorted(range(n), key=lambda c: (-measured[c], c))
+            return [{"keyword": self.keywords[c], "score": round(measured[c], 3)} for c in ranked]
+        estimated = self._group_sum(1)
+        ranked = sorted(range(n), key=lambda c: (-measured[c], -estimated[c], c))
+        return [{"keyword": self.keywords[c], "score": round(measured[c], 3),
+                 "score_estimated": round(estimated[c], 3)} for c in ranked]
+
+    def _group_sum(self, tier: Optional[int]) -> List[float]:
+        n = len(self.keywords)
+        if np is not None:
+            mask = self.kw >= 0
+            if tier is not None:
+                mask &= self.tier == tier
+            return np.bincount(self.kw[mask], weights=self.score[mask], minlength=n).tolist()
+        totals = [0.0] * n
+        for i, (c, s) in enumerate(zip(self.kw, self.score)):
+            if c >= 0 and (tier is None or self.tier[i] == tier):
+                totals[c] += s
+        return totals
+
+    def row(self, i: int) -> Dict[str, Any]:
+        out = dict(self.rows[i])
+        if self.velocity is not None:
+            out["velocity"] = float(self.velocity[i])
+            out["velocity_source"] = "lifetime" if self.tier[i] else "snapshots"
+            if self.velocity_window[i] is not None:
+                out["velocity_window_h"] = self.velocity_window[i]
+        out["score"] = float(self.score[i])
+        return out
+
+    def rows_at(self, idx: List[int]) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in idx]
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Todos los videos por score, un dict a la vez (para exportar sin materializar la lista)."""
+        for i in self.top():
+            yield self.row(i)
+
@@ -0,0 +1,150 @@
+# Estado persistente de YouTube (keywords, resultados por keyword, marcas de agua, último cálculo)
+# en SQLite, en la misma base que los snapshots (YT_DB, ver yt_timeseries.py).
+# Cada entrada es una fila (ns, key) -> JSON: actualizar una keyword escribe solo esa fila, dentro de
+# una transacción (WAL, a prueba de cortes). Las lecturas salen de una caché en memoria que solo se
+# invalida cuando otro proceso hizo commit (PRAGMA data_version), sin volver a leer el disco.
+#
+# uso: python yt_state.py [--db PATH] [--ns NOMBRE]
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from yt_timeseries import DEFAULT_DB
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    ns      TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value   TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+"""
+
+
+class StateStore:
+    """Diccionarios persistentes por namespace: get / items / put_many / delete."""
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._con: Optional[sqlite3.Connection] = None
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._version: Optional[int] = None
+
+    def set_path(self, path: str) -> None:
+        """Cambia de base: cierra la conexión y descarta la caché."""
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+            self.path, self._con, self._version = path, None, None
+            self._cache.clear()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._con is None:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_SCHEMA)
+            self._con = con
+        return self._con
+
+    def _sync(self) -> None:
+        # data_version cambia solo si otra conexión hizo commit: entonces se descarta la caché
+        version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+    def _ns(self, ns: str) -> Dict[str, Any]:
+        self._sync()
+        data = self._cache.get(ns)
+        if data is None:
+            cur = self._conn().execute("SELECT key, value FROM state WHERE ns = ?", (ns,))
+            data = {k: json.loads(v) for k, v in cur}
+            self._cache[ns] = data
+        return data
+
+    def items(self, ns: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._ns(ns))
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._ns(ns).get(key, default)
+
+    def put_many(self, ns: str, values: Dict[str, Any]) -> int:
+        """Escribe solo las claves cuyo valor cambió; devuelve cuántas filas se escribieron."""
+        with self._lock:
+            cur = self._ns(ns)
+            changed = {k: v for k, v in values.items() if k not in cur or cur[k] != v}
+            if not changed:
+                return 0
+            now = time.time()
+            rows = [(ns, k, json.dumps(v, ensure_ascii=False), now) for k, v in changed.items()]
+            con = self._conn()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)", rows)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            cur.update(changed)
+            return len(changed)
+
+    def put(self, ns: str, key: str, value: Any) -> int:
+        return self.put_many(ns, {key: value})
+
+    def delete(self, ns: str, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock:
+            cur = self._ns(ns)
+            con = self._conn()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.executemany("DELETE FROM state WHERE ns = ? AND key = ?", [(ns, k) for k in keys])
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            for k in keys:
+                cur.pop(k, None)
+
+    def import_json(self, ns: str, path: str, convert=None) -> int:
+        """Migración única desde un archivo JSON viejo (solo si el namespace está vacío)."""
+        if not os.path.isfile(path) or self.items(ns):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            values = convert(data) if convert else data
+        except Exception:
+            return 0
+        return self.put_many(ns, values) if isinstance(values, dict) else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Muestra el estado persistente de YouTube.")
+    ap.add_argument("--db", default=DEFAULT_DB)
+    ap.add_argument("--ns", help="namespace a mostrar (sin esto: conteo por namespace)")
+    a = ap.parse_args()
+
+    store = StateStore(a.db)
+    if a.ns:
+        out: Any = store.items(a.ns)
+    else:
+        out = dict(store._conn().execute("SELECT ns, COUNT(*) FROM state GROUP BY ns").fetchall())
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
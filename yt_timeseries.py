@@ -0,0 +1,150 @@
+# Serie temporal de estadísticas de videos en SQLite (una fila por video y fetch)
+# YTtool guarda cada snapshot de statistics (search, mostPopular) y calcula la velocidad de vistas
+# (vistas/hora entre snapshots) con lookups por índice en vez de recorrer listas en memoria.
+#   YT_DB=<ruta>                     base SQLite (default .yt_state/yt.sqlite3)
+#   YT_VELOCITY_MIN_GAP_MIN=<min>    separación mínima entre snapshots para medir velocidad (default 10)
+#   YT_SNAPSHOT_RETENTION_DAYS=<d>   snapshots más viejos se borran al guardar (default 30; 0 = sin límite)
+#
+# uso: python yt_timeseries.py [--db PATH] [--video ID] [--top N]
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_DB = os.getenv("YT_DB") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yt_state", "yt.sqlite3")
+MIN_GAP = float(os.getenv("YT_VELOCITY_MIN_GAP_MIN", "10")) * 60  # segundos
+RETENTION = float(os.getenv("YT_SNAPSHOT_RETENTION_DAYS", "30")) * 86400  # segundos (0 = sin límite)
+_PRUNE_EVERY = 3600.0  # la poda corre como mucho una vez por hora por proceso
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    video_id TEXT NOT NULL,
+    ts       REAL NOT NULL,
+    views    INTEGER NOT NULL,
+    likes    INTEGER,
+    comments INTEGER,
+    PRIMARY KEY (video_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+"""
+
+# último snapshot de cada video y el anterior separado al menos `gap` segundos (todo por la PK)
+_VELOCITY_SQL = """
+WITH last AS (
+    SELECT video_id, MAX(ts) AS ts FROM snapshots WHERE video_id IN ({marks}) GROUP BY video_id
+)
+SELECT l.video_id, l.ts, cur.views, prev.ts, prev.views
+FROM last l
+JOIN snapshots cur ON cur.video_id = l.video_id AND cur.ts = l.ts
+LEFT JOIN snapshots prev ON prev.video_id = l.video_id AND prev.ts = (
+    SELECT MAX(p.ts) FROM snapshots p WHERE p.video_id = l.video_id AND p.ts < l.ts AND p.ts <= l.ts - ?
+)
+"""
+
+_MAX_VARS = 900  # por debajo del límite de parámetros de SQLite (999 en builds viejos)
+
+
+class SnapshotStore:
+    """
+    Snapshots (video_id, ts, views, likes, comments) con PK (video_id, ts).
+    Una conexión por hilo; WAL para que el servidor MCP y el chat escriban a la vez.
+    """
+    def __init__(self, path: str = DEFAULT_DB, retention: float = RETENTION):
+        self.path = path
+        self.retention = retention
+        self._pruned_at = 0.0
+        self._local = threading.local()
+
+    def set_path(self, path: str) -> None:
+        """Cambia de base (las conexiones abiertas de cada hilo se descartan)."""
+        self.path = path
+        self._pruned_at = 0.0
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=10)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_SCHEMA)
+            self._local.con = con
+        return con
+
+    def record(self, videos: Iterable[Dict[str, Any]], ts: Optional[float] = None) -> int:
+        """Guarda un snapshot por video ({"videoId","views","likes","comments"}); devuelve cuántos."""
+        ts = time.time() if ts is None else ts
+        rows = [(v["videoId"], ts, int(v.get("views") or 0), v.get("likes"), v.get("comments"))
+                for v in videos if v.get("videoId")]
+        if rows:
+            con = self._conn()
+            with con:
+                con.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)", rows)
+            if self.retention > 0 and ts - self._pruned_at >= _PRUNE_EVERY:
+                self.prune(ts - self.retention)
+                self._pruned_at = ts
+        return len(rows)
+
+    def prune(self, before: float) -> int:
+        """Borra los snapshots con ts < before (por el índice snapshots_ts); devuelve cuántos."""
+        con = self._conn()
+        with con:
+            return con.execute("DELETE FROM snapshots WHERE ts < ?", (before,)).rowcount
+
+    def velocity(self, ids: List[str], min_gap: float = MIN_GAP) -> Dict[str, Dict[str, Any]]:
+        """
+        video_id -> {"velocity": vistas/hora, "window_h": horas entre snapshots}.
+        Los videos con un solo snapshot (o todos demasiado juntos) no aparecen.
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        uniq = list(dict.fromkeys(ids))
+        con = self._conn()
+        for i in range(0, len(uniq), _MAX_VARS):
+            chunk = uniq[i:i + _MAX_VARS]
+            sql = _VELOCITY_SQL.format(marks=",".join("?" * len(chunk)))
+            for vid, ts, views, pts, pviews in con.execute(sql, (*chunk, min_gap)):
+                if pts is None:
+                    continue
+                hours = (ts - pts) / 3600.0
+                out[vid] = {"velocity": max(0.0, (views - pviews) / hours), "window_h": round(hours, 3)}
+        return out
+
+    def history(self, video_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        cur = self._conn().execute(
+            "SELECT ts, views, likes, comments FROM snapshots WHERE video_id = ? ORDER BY ts DESC LIMIT ?",
+            (video_id, limit))
+        return [{"ts": ts, "views": v, "likes": l, "comments": c} for ts, v, l, c in cur]
+
+    def stats(self) -> Dict[str, Any]:
+        n, videos, first, last = self._conn().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT video_id), MIN(ts), MAX(ts) FROM snapshots").fetchone()
+        return {"path": self.path, "snapshots": n, "videos": videos, "first": first, "last": last}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Consulta la serie temporal de estadísticas de videos.")
+    ap.add_argument("--db", default=DEFAULT_DB)
+    ap.add_argument("--video", help="historial de un video")
+    ap.add_argument("--top", type=int, default=0, help="videos con mayor velocidad de vistas")
+    a = ap.parse_args()
+
+    store = SnapshotStore(a.db)
+    if a.video:
+        out: Any = store.history(a.video)
+    elif a.top:
+        ids = [r[0] for r in store._conn().execute("SELECT DISTINCT video_id FROM snapshots")]
+        vel = store.velocity(ids)
+        out = sorted(({"videoId": k, **v} for k, v in vel.items()), key=lambda x: -x["velocity"])[:a.top]
+    else:
+        out = store.stats()
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()